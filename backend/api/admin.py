@@ -65,8 +65,8 @@ class ProblemAdmin(admin.ModelAdmin):
 class SubmissionAdmin(admin.ModelAdmin):
     list_display = ('user', 'problem', 'language', 'passed', 'rank', 'duration_display', 'submitted_at')
     list_filter = ('passed', 'language', 'rank')
-    search_fields = ('user__username', 'problem__title', 'code')
-    readonly_fields = ('created_at', 'raw_results_display')
+    search_fields = ('user__username', 'problem__title')
+    readonly_fields = ('created_at', 'code_display', 'raw_results_display')
     
     fieldsets = (
         (None, {
@@ -76,7 +76,7 @@ class SubmissionAdmin(admin.ModelAdmin):
             'fields': ('started_at', 'submitted_at', 'duration_ms')
         }),
         ('Code', {
-            'fields': ('code',),
+            'fields': ('code_display',),
             'classes': ('collapse',),
         }),
         ('Results', {
@@ -98,6 +98,13 @@ class SubmissionAdmin(admin.ModelAdmin):
         return "N/A"
     duration_display.short_description = "Duration"
     
+    def code_display(self, obj):
+        """Show the submitted code, decompressed from its blob"""
+        if obj.code_blob_id:
+            return format_html('<pre>{}</pre>', obj.code)
+        return "N/A"
+    code_display.short_description = "Code"
+    
     def raw_results_display(self, obj):
         """Format raw_results as pretty JSON"""
         if obj.raw_results:
@@ -3,4 +3,13 @@ from django.apps import AppConfig
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'api' 
\ No newline at end of file
+    name = 'api'
+
+    def ready(self):
+        # Connects the signals that invalidate cached problems and users and
+        # re-rank submissions when thresholds change.
+        from . import authentication, problem_cache, ranking  # noqa: F401
+
+        # Fail at startup, not on the first rejected submission.
+        from .rate_limit import get_submission_limits
+        get_submission_limits()
@@ -0,0 +1,102 @@
+"""
+JWT authentication that serves the request user from a short-lived cache.
+
+``JWTAuthentication`` loads the full ``User`` row on every request. Almost
+every view only needs the id, username and flags, so those are cached for
+``AUTH_USER_CACHE_TTL`` seconds and rebuilt into a ``User`` whose other
+fields are deferred (loaded on first access, as with ``.only()``). Saving or
+deleting a user drops its entry, so deactivation and revoked staff rights
+apply on the next request. That needs every worker to see the deletion, so
+users are only cached in a shared cache (``CACHE_URL``); with a per-process
+one each request loads the user from the database.
+
+``QuerySet.update()`` sends no signals: a user deactivated or demoted that way
+keeps their cached flags for up to the TTL. Call ``invalidate_cached_users``
+with the affected ids after such bulk updates.
+"""
+from typing import Iterable, Optional
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .metrics import Counter
+from .shared_cache import cache_is_shared
+
+CACHED_USER_FIELDS = ('id', 'username', 'is_staff', 'is_active')
+
+
+def _cache_key(user_id) -> str:
+    return f"auth-user:{user_id}"
+
+
+def get_cached_user(user_id) -> Optional[User]:
+    """
+    The user with this id, with only ``CACHED_USER_FIELDS`` loaded, or None.
+    """
+    shared = cache_is_shared()
+    values = cache.get(_cache_key(user_id)) if shared else None
+    auth_user_cache_requests_total.inc(result='miss' if values is None else 'hit')
+    if values is None:
+        values = User.objects.filter(pk=user_id).values_list(*CACHED_USER_FIELDS).first()
+        if values is None:
+            return None
+        if shared:
+            cache.set(_cache_key(user_id), values, getattr(settings, 'AUTH_USER_CACHE_TTL', 60))
+    return User.from_db(DEFAULT_DB_ALIAS, list(CACHED_USER_FIELDS), list(values))
+
+
+def invalidate_cached_user(user_id) -> None:
+    cache.delete(_cache_key(user_id))
+
+
+def invalidate_cached_users(user_ids: Iterable) -> None:
+    """
+    Drop the cached entries of several users, e.g. after
+    ``User.objects.filter(...).update(is_active=False)``.
+    """
+    cache.delete_many([_cache_key(user_id) for user_id in user_ids])
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def _user_changed(sender, instance, **kwargs):
+    # Covers deactivation, staff changes and password changes alike.
+    invalidate_cached_user(instance.pk)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    ``JWTAuthentication`` with the user lookup served by ``get_cached_user``.
+    Views that need fields beyond ``CACHED_USER_FIELDS``, or that save the
+    user, should load it fresh from the database.
+    """
+    def get_user(self, validated_token):
+        if api_settings.CHECK_REVOKE_TOKEN:
+            # Needs the password hash on every request; nothing to save.
+            return super().get_user(validated_token)
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        user = get_cached_user(user_id)
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return user
+
+
+auth_user_cache_requests_total = Counter(
+    'auth_user_cache_requests_total',
+    'Authenticated-user cache lookups by result (hit or miss).',
+    ('result',),
+)
@@ -0,0 +1,39 @@
+"""
+Content-addressed storage helpers for submission code.
+
+Code is stored once per SHA-256 of its UTF-8 bytes, zlib compressed when that
+actually saves space. The helpers are plain functions so migrations can use
+them without the model classes.
+"""
+import hashlib
+import zlib
+from typing import Tuple
+
+ZLIB = 'zlib'
+RAW = 'none'
+ZLIB_LEVEL = 6
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def compress(text: str) -> Tuple[str, bytes]:
+    """
+    Return ``(compression, data)``. Very short snippets often grow under
+    zlib, so they are kept raw.
+    """
+    raw = text.encode('utf-8')
+    packed = zlib.compress(raw, ZLIB_LEVEL)
+    if len(packed) < len(raw):
+        return ZLIB, packed
+    return RAW, raw
+
+
+def decompress(compression: str, data: bytes) -> str:
+    data = bytes(data)  # psycopg2 hands BinaryField values over as memoryview
+    if compression == ZLIB:
+        data = zlib.decompress(data)
+    elif compression != RAW:
+        raise ValueError(f"Unknown code blob compression: {compression}")
+    return data.decode('utf-8')
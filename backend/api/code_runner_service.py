@@ -1,12 +1,29 @@
-from typing import List, Dict, Any, Optional, TypedDict
+from typing import Callable, List, Dict, Any, Optional, Tuple, TypedDict
 import random
 import json
 import time 
 import requests
 import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from .engine_guard import EngineUnavailable, get_engine_guard
+from .hedging import get_hedging_policy
+from .metrics import Gauge, Histogram
 
 TIMEOUT_SECONDS = 2
 
+engine_run_duration_seconds = Histogram(
+    'engine_run_duration_seconds',
+    'Time to judge a submission on the execution engine, by language and outcome.',
+    ('language', 'outcome'),
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 10.0, 30.0),
+)
+judging_in_flight = Gauge(
+    'judging_in_flight',
+    'Submissions currently being judged.',
+)
+
 class ExecutionFile(TypedDict):
     """
     Represents a file to be made available during code execution.
@@ -33,23 +50,211 @@ class ExecutionResult(TypedDict):
     # or any other detailed engine-specific data for debugging or extended analysis.
     engine_specific_response: Dict[str, Any]
 
+def _post_to_engine(url: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Send one execution request to Piston and return its parsed response.
+    The guard fails fast with EngineUnavailable when the engine is unhealthy
+    or saturated.
+    """
+    with get_engine_guard().call():
+        response = requests.post(
+            url,
+            json=payload,
+            headers={"Content-Type": "application/json"},
+            timeout=1+TIMEOUT_SECONDS
+        )
+
+        # Check if the request was successful
+        response.raise_for_status()
+
+        # Parse the response
+        return response.json()
+
+def _to_result(piston_result: Dict[str, Any]) -> ExecutionResult:
+    """
+    Map a Piston response to our ExecutionResult format.
+    """
+    status = "success"
+    if piston_result.get("compile", {}).get("code", 0) != 0:
+        status = "compile_error"
+    elif "Time limit exceeded" in (piston_result.get("run", {}).get("message", None) or ""):
+        status = "timeout_error"
+    elif piston_result.get("run", {}).get("code") != 0:
+        status = "runtime_error"
+    elif 'Incorrect' in piston_result.get("run", {}).get("stdout", ""):
+        status = "Tests failed"
+    elif 'Correct' not in piston_result.get("run", {}).get("stdout", ""):
+        status = "Unknown"
+    return {
+        "status": status,
+        "stdout": piston_result.get("run", {}).get("stdout", ""),
+        "stderr": piston_result.get("run", {}).get("stderr", ""),
+        "output": piston_result.get("run", {}).get("output", ""),
+        "duration_ms": piston_result.get("run", {}).get("time", 0) * 1000,  # Convert to milliseconds
+        "memory_kb": piston_result.get("run", {}).get("memory", 0),
+        "exit_code": piston_result.get("run", {}).get("code", 0),
+        "error_message": piston_result.get("message", ""),
+        "engine_specific_response": piston_result
+    }
+
+def _run_payload(payload: Dict[str, Any], language: str, piston_url: str, hedge_url: str) -> ExecutionResult:
+    piston_result = get_hedging_policy().run(
+        lambda url: _post_to_engine(url, payload),
+        language=language,
+        primary_url=piston_url,
+        hedge_url=hedge_url,
+    )
+    print(f"Piston API Response: {json.dumps(piston_result, indent=2)}", flush=True)
+    return _to_result(piston_result)
+
+# Harness file listing test shards, e.g. ["small", "large-1", "large-2"]. Each
+# shard is a separate engine run with the shard name as the driver's first
+# argument (sys.argv[1] / argv[1]), so each gets its own TIMEOUT_SECONDS.
+SHARD_MANIFEST_FILENAME = 'test_shards.json'
+
+_shard_executor: Optional[ThreadPoolExecutor] = None
+_shard_executor_lock = threading.Lock()
+
+def get_shard_executor() -> ThreadPoolExecutor:
+    """
+    Pool shared by every request thread of the process. Each submission keeps
+    at most ENGINE_SHARD_PARALLELISM shards in it, so ENGINE_SHARD_POOL_SIZE
+    (default: request threads x parallelism) lets concurrent submissions run
+    side by side instead of queueing behind each other.
+    """
+    global _shard_executor
+    with _shard_executor_lock:
+        if _shard_executor is None:
+            from django.conf import settings
+            _shard_executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'ENGINE_SHARD_POOL_SIZE', 32),
+                thread_name_prefix='engine-shard',
+            )
+        return _shard_executor
+
+def find_eval_driver(language: str, harness_eval_files: Optional[List[ExecutionFile]]) -> Optional[ExecutionFile]:
+    """
+    The harness driver the engine runs for ``language``; None means the
+    submission is judged by the mock engine instead.
+    """
+    if language not in ["python", "cpp"]:
+        return None
+    eval_driver_file = None
+    for f in harness_eval_files or []:
+        if f['filename'] == 'eval_submission_codes.py' and language == "python":
+            eval_driver_file = f
+        if f['filename'] == 'eval_submission_codes.cpp' and language == "cpp":
+            eval_driver_file = f
+    return eval_driver_file
+
+def read_shards(harness_eval_files: Optional[List[ExecutionFile]]) -> List[str]:
+    """
+    Shard names declared by the harness, or [] to judge in a single run.
+    """
+    for f in harness_eval_files or []:
+        if f['filename'] == SHARD_MANIFEST_FILENAME:
+            shards = json.loads(f['content'])
+            if not isinstance(shards, list) or not shards:
+                raise ValueError(f"{SHARD_MANIFEST_FILENAME} must be a non-empty JSON list of shard names")
+            return [str(shard) for shard in shards]
+    return []
+
+def _run_shards(payload: Dict[str, Any], shards: List[str], language: str,
+                piston_url: str, hedge_url: str) -> ExecutionResult:
+    """
+    Judge the shards as parallel engine runs, stopping at the first failure.
+    """
+    from django.conf import settings
+    results, failed = run_windowed(
+        lambda index: _run_payload(dict(payload, args=[shards[index]]), language, piston_url, hedge_url),
+        len(shards), getattr(settings, 'ENGINE_SHARD_PARALLELISM', 4), get_shard_executor())
+    return merge_shard_results(shards, results, failed)
+
+def run_windowed(run: Callable[[int], ExecutionResult], count: int, parallelism: int,
+                 executor: ThreadPoolExecutor) -> Tuple[Dict[int, ExecutionResult], Optional[int]]:
+    """
+    Call run(0..count-1) on the executor with at most ``parallelism`` in
+    flight, stopping at the first unsuccessful result. Returns the results
+    by index and the failing index, if any.
+    """
+    pending = iter(range(count))
+    running = {}
+
+    def submit_next():
+        index = next(pending, None)
+        if index is not None:
+            running[executor.submit(run, index)] = index
+
+    for _ in range(max(1, parallelism)):
+        submit_next()
+    results: Dict[int, ExecutionResult] = {}
+    try:
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = running.pop(future)
+                results[index] = future.result()
+                if results[index]["status"] != "success":
+                    return results, index
+                submit_next()
+    finally:
+        # Unsubmitted shards are skipped; running ones finish unobserved.
+        for future in running:
+            future.cancel()
+    return results, None
+
+def merge_shard_results(shards: List[str], results: Dict[int, ExecutionResult],
+                        failed: Optional[int]) -> ExecutionResult:
+    """
+    One ExecutionResult for a sharded run: the failing shard's verdict (or
+    success), engine time summed over shards and peak memory. Output is
+    concatenated in shard order with a header per shard.
+    """
+    ordered = sorted(results.items())
+
+    def joined(key: str) -> str:
+        return "\n".join(f"--- shard {shards[index]} ---\n{result[key] or ''}" for index, result in ordered)
+
+    verdict = results[failed] if failed is not None else None
+    durations = [result["duration_ms"] or 0 for _, result in ordered]
+    return {
+        "status": verdict["status"] if verdict else "success",
+        "stdout": joined("stdout"),
+        "stderr": joined("stderr"),
+        "output": joined("output"),
+        "duration_ms": sum(durations),
+        "memory_kb": max((result["memory_kb"] or 0 for _, result in ordered), default=0),
+        "exit_code": verdict["exit_code"] if verdict else 0,
+        "error_message": verdict["error_message"] if verdict else "",
+        "engine_specific_response": {
+            "shards": [
+                {
+                    "shard": shards[index],
+                    "status": result["status"],
+                    "duration_ms": result["duration_ms"],
+                    "memory_kb": result["memory_kb"],
+                    "response": result["engine_specific_response"],
+                }
+                for index, result in ordered
+            ],
+            "skipped_shards": [shard for index, shard in enumerate(shards) if index not in results],
+            "max_shard_duration_ms": max(durations, default=0),
+        },
+    }
+
 def execute_code(
     language: str,
     version: Optional[str],
     code_to_execute: str,
-    harness_eval_files: Optional[List[ExecutionFile]]
+    harness_eval_files: Optional[List[ExecutionFile]],
+    args: Optional[List[str]] = None
 ) -> ExecutionResult:
+    """
+    Judge code against the problem harness. ``args`` are passed to the
+    harness driver and run it once, unsharded (e.g. a complexity benchmark).
+    """
     print(f"--- REAL PROD CODE RUNNER --- {language} {version} ---", flush=True)
-    if language not in ["python", "cpp"]:
-        return execute_code_mock(language, version, code_to_execute, harness_eval_files)
-
-    eval_driver_file = None 
-    if harness_eval_files is not None:
-        for f in harness_eval_files:
-            if f['filename'] == 'eval_submission_codes.py' and language == "python":
-                eval_driver_file = f
-            if f['filename'] == 'eval_submission_codes.cpp' and language == "cpp":
-                eval_driver_file = f
+    eval_driver_file = find_eval_driver(language, harness_eval_files)
     if eval_driver_file is None:
         return execute_code_mock(language, version, code_to_execute, harness_eval_files)
 
@@ -70,55 +275,33 @@ def execute_code(
             "content": code_to_execute
         }]
     }
+    if args:
+        payload["args"] = list(args)
 
+    started = time.perf_counter()
     try:
         # Get Piston service URL from settings or use default
         piston_url = getattr(settings, 'PISTON_API_URL', 'http://piston:2000/api/v2/execute')
+        # Hedged copies of slow runs go to this endpoint (see api/hedging.py)
+        hedge_url = getattr(settings, 'PISTON_HEDGE_API_URL', None) or piston_url
         
         print(f"Calling Piston API at {piston_url}", flush=True)
         print(f"Payload: {json.dumps(payload, indent=2)[:1000]}", flush=True)
         
-        # Make the API call to Piston
-        response = requests.post(
-            piston_url,
-            json=payload,
-            headers={"Content-Type": "application/json"},
-            timeout=1+TIMEOUT_SECONDS
-        )
-        
-        # Check if the request was successful
-        response.raise_for_status()
-        
-        # Parse the response
-        piston_result = response.json()
-        print(f"Piston API Response: {json.dumps(piston_result, indent=2)}", flush=True)
-        
-        # Map Piston response to our ExecutionResult format
-        status = "success"
-        if piston_result.get("compile", {}).get("code", 0) != 0:
-            status = "compile_error"
-        elif "Time limit exceeded" in (piston_result.get("run", {}).get("message", None) or ""):
-            status = "timeout_error"
-        elif piston_result.get("run", {}).get("code") != 0:
-            status = "runtime_error"
-        elif 'Incorrect' in piston_result.get("run", {}).get("stdout", ""):
-            status = "Tests failed"
-        elif 'Correct' not in piston_result.get("run", {}).get("stdout", ""):
-            status = "Unknown"
-        result: ExecutionResult = {
-            "status": status,
-            "stdout": piston_result.get("run", {}).get("stdout", ""),
-            "stderr": piston_result.get("run", {}).get("stderr", ""),
-            "output": piston_result.get("run", {}).get("output", ""),
-            "duration_ms": piston_result.get("run", {}).get("time", 0) * 1000,  # Convert to milliseconds
-            "memory_kb": piston_result.get("run", {}).get("memory", 0),
-            "exit_code": piston_result.get("run", {}).get("code", 0),
-            "error_message": piston_result.get("message", ""),
-            "engine_specific_response": piston_result
-        }
+        shards = [] if args else read_shards(harness_eval_files)
+        if shards:
+            result = _run_shards(payload, shards, language, piston_url, hedge_url)
+        else:
+            result = _run_payload(payload, language, piston_url, hedge_url)
+        engine_run_duration_seconds.observe(time.perf_counter() - started, language=language,
+                                            outcome=result["status"])
         return result
     
+    except EngineUnavailable:
+        engine_run_duration_seconds.observe(time.perf_counter() - started, language=language, outcome="unavailable")
+        raise
     except Exception as e:
+        engine_run_duration_seconds.observe(time.perf_counter() - started, language=language, outcome="internal_error")
         error_str = f"{type(e)} {str(e)}"
         return {
             "status": "internal_error",
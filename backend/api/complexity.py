@@ -0,0 +1,113 @@
+"""
+Complexity benchmarks for passing submissions.
+
+For a problem with ``complexity_sizes``, a passing submission is run once
+more with the harness driver's arguments set to ``complexity`` and the
+comma-separated sizes. The driver times the solution on inputs of each size
+and prints one ``COMPLEXITY <size> <seconds>`` line per size. The slope of
+log(time) against log(size) estimates the growth exponent: about 1 for
+O(n), 1.1-1.2 for O(n log n) over typical ladders, 2 for O(n^2).
+
+The reference solution is measured the same way once per problem version,
+language and runtime, and kept in ``complexity_baselines``. A submission
+whose exponent is within ``COMPLEXITY_TOLERANCE`` of the reference's
+"scales"; a steeper one "does_not_scale". A reference run that fails is
+stored too, with no exponent, so it is not retried on every passing
+submission until the problem changes. Sizes should be chosen so the whole
+ladder fits in one run's time limit. Submissions the mock engine judges
+are not benchmarked.
+"""
+import math
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import IntegrityError
+
+from .code_runner_service import execute_code, find_eval_driver
+from .models import ComplexityBaseline, Problem
+
+COMPLEXITY_LINE_RE = re.compile(r'^COMPLEXITY\s+(\d+)\s+([0-9.eE+-]+)\s*$', re.MULTILINE)
+SCALES = "scales"
+DOES_NOT_SCALE = "does_not_scale"
+
+
+def parse_timings(stdout: Optional[str]) -> List[Tuple[int, float]]:
+    return [(int(size), float(seconds)) for size, seconds in COMPLEXITY_LINE_RE.findall(stdout or '')]
+
+
+def fit_exponent(timings: List[Tuple[int, float]]) -> Optional[float]:
+    """
+    Least-squares slope of log(seconds) over log(size); None with fewer than
+    two distinct positive sizes or a non-positive timing.
+    """
+    points = [(math.log(size), math.log(seconds)) for size, seconds in timings if size > 0 and seconds > 0]
+    if len(points) < 2 or len(points) != len(timings):
+        return None
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    spread = sum((x - mean_x) ** 2 for x, _ in points)
+    if spread == 0:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / spread
+
+
+def _measure(problem: Problem, language: str, version: Optional[str], code: str) -> Dict[str, Any]:
+    sizes = ','.join(str(size) for size in problem.complexity_sizes)
+    result = execute_code(language=language, version=version, code_to_execute=code,
+                          harness_eval_files=problem.harness_eval_files or [],
+                          args=['complexity', sizes])
+    timings = parse_timings(result['stdout']) if result['status'] == 'success' else []
+    return {
+        'status': result['status'],
+        'timings': timings,
+        'exponent': fit_exponent(timings),
+    }
+
+
+def reference_exponent(problem: Problem, language: str, version: Optional[str]) -> Optional[float]:
+    """
+    The reference solution's exponent, measured on first use per problem
+    version, language and runtime.
+    """
+    baseline = ComplexityBaseline.objects.filter(
+        problem_id=problem.id, language=language, runtime_version=version or '',
+        problem_updated_at=problem.updated_at).first()
+    if baseline is not None:
+        return baseline.exponent
+    reference_code = (problem.reference_solutions or {}).get(language)
+    if not reference_code:
+        return None
+    measured = _measure(problem, language, version, reference_code)
+    if measured['exponent'] is None:
+        # Recorded anyway, so later submissions skip it until the problem changes.
+        print(f"Reference complexity run failed for problem {problem.id} ({language}): "
+              f"{measured['status']}", flush=True)
+    try:
+        ComplexityBaseline.objects.update_or_create(
+            problem_id=problem.id, language=language, runtime_version=version or '',
+            defaults={'problem_updated_at': problem.updated_at, 'exponent': measured['exponent'],
+                      'timings': measured['timings']})
+    except IntegrityError:
+        # Another worker measured it at the same time.
+        pass
+    return measured['exponent']
+
+
+def benchmark_submission(problem: Problem, language: str, version: Optional[str],
+                         code: str) -> Optional[Dict[str, Any]]:
+    """
+    Measure a passing submission against the reference. The result has
+    ``exponent``, ``reference_exponent`` and ``verdict`` (None when either
+    could not be measured), plus the raw ``timings``. None when the mock
+    engine judges this language, as it has nothing to time.
+    """
+    if find_eval_driver(language, problem.harness_eval_files) is None:
+        return None
+    measured = _measure(problem, language, version, code)
+    reference = reference_exponent(problem, language, version)
+    verdict = None
+    if measured['exponent'] is not None and reference is not None:
+        tolerance = getattr(settings, 'COMPLEXITY_TOLERANCE', 0.3)
+        verdict = SCALES if measured['exponent'] <= reference + tolerance else DOES_NOT_SCALE
+    return {**measured, 'reference_exponent': reference, 'verdict': verdict}
@@ -0,0 +1,62 @@
+"""
+Conditional GET support for the problem catalogue.
+
+Validators come from one aggregate query (``max(updated_at)`` and a row count,
+so deletions are noticed too) plus everything else that shapes the response
+body: the path, the query string and whether the caller is staff. A matching
+``If-None-Match``/``If-Modified-Since`` gets a 304 before any row is
+serialized.
+"""
+import datetime
+import hashlib
+from typing import Optional, Tuple
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+
+def catalogue_validators(request, queryset) -> Tuple[str, Optional[float]]:
+    """
+    Return ``(etag, last_modified_timestamp)`` for the rows ``queryset`` selects.
+    """
+    summary = queryset.order_by().aggregate(last_modified=Max('updated_at'), count=Count('id'))
+    return make_validators(request, summary['last_modified'], summary['count'])
+
+
+def make_validators(request, last_modified: Optional[datetime.datetime],
+                    count: int) -> Tuple[str, Optional[float]]:
+    """
+    Validators for a response built from ``count`` rows, the newest of which
+    was updated at ``last_modified``.
+    """
+    key = "|".join([
+        request.path,
+        "&".join(sorted(request.GET.urlencode().split("&"))),
+        "staff" if request.user.is_staff else "user",
+        last_modified.isoformat() if last_modified else "",
+        str(count),
+    ])
+    etag = 'W/"%s"' % hashlib.sha1(key.encode('utf-8')).hexdigest()
+    return etag, last_modified.timestamp() if last_modified else None
+
+
+def not_modified_response(request, etag: str, last_modified: Optional[float]):
+    """
+    The 304 (or 412) response if the request's validators match, else None.
+    """
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def set_validators(response, etag: str, last_modified: Optional[float]):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    # Clients may keep a copy but must revalidate it; staff and users see
+    # different fields for the same URL.
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ['Authorization'])
+    return response
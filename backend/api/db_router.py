@@ -0,0 +1,212 @@
+"""
+Read-replica routing.
+
+Replicas are configured with ``DATABASE_REPLICA_URLS`` (see settings). Reads
+only go to a replica inside views that opt in with ``ReplicaReadMixin``
+(problem browsing, scorecards, submission stats), for safe methods, and
+only while the user has not written recently. After a user's successful
+POST/PUT/PATCH/DELETE, ``ReplicaPinMiddleware`` pins them to the primary
+for ``REPLICA_PIN_SECONDS`` so they read their own writes. The pin lives
+in the shared cache, so whichever worker serves the next read sees it.
+Without a shared cache (no ``CACHE_URL``) a pin would only be seen by the
+worker that set it, so authenticated users always read from the primary.
+Each replica's replay lag is checked at most every
+``REPLICA_CHECK_INTERVAL`` seconds. Replicas further behind than
+``REPLICA_MAX_LAG_SECONDS``, or that fail, are skipped. Replica connections
+time out after ``REPLICA_CONNECT_TIMEOUT`` seconds and their statements
+after ``REPLICA_STATEMENT_TIMEOUT_MS``, so an unreachable replica costs a
+request seconds, not a TCP timeout. A request whose replica fails mid-way is
+re-run against the primary.
+"""
+import contextlib
+import itertools
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, InterfaceError, OperationalError, connections
+from rest_framework.permissions import SAFE_METHODS
+
+from .shared_cache import cache_is_shared
+
+# Replay lag in seconds; 0 when the replica has replayed everything it received.
+LAG_SQL = """
+SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+            ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END
+"""
+
+# Whether reads in the current request may use a replica, and which one it uses.
+_replica_reads: ContextVar[bool] = ContextVar('replica_reads', default=False)
+_request_replica: ContextVar[Optional[str]] = ContextVar('request_replica', default=None)
+
+# SQLSTATE of a statement cancelled by statement_timeout.
+QUERY_CANCELED = '57014'
+
+
+def replica_lag(alias: str) -> float:
+    with connections[alias].cursor() as cursor:
+        cursor.execute(LAG_SQL)
+        return float(cursor.fetchone()[0] or 0)
+
+
+class ReplicaSet:
+    """
+    Health and lag bookkeeping for the configured replicas of one process.
+    """
+    def __init__(self, aliases: List[str], lag_probe: Callable[[str], float] = replica_lag):
+        self.aliases = list(aliases)
+        self.lag_probe = lag_probe
+        self._down_until: Dict[str, float] = {}
+        self._checked_at: Dict[str, float] = {}
+        self._lag: Dict[str, float] = {}
+        self._turn = itertools.count()
+        self._lock = threading.Lock()
+
+    def mark_down(self, alias: str) -> None:
+        print(f"Database replica {alias} unavailable; reading from the primary", flush=True)
+        with self._lock:
+            self._down_until[alias] = time.monotonic() + getattr(settings, 'REPLICA_RETRY_SECONDS', 30)
+            self._checked_at.pop(alias, None)
+
+    def _usable(self, alias: str, now: float) -> bool:
+        if now < self._down_until.get(alias, 0):
+            return False
+        if now - self._checked_at.get(alias, float('-inf')) > getattr(settings, 'REPLICA_CHECK_INTERVAL', 5):
+            try:
+                lag = self.lag_probe(alias)
+            except DatabaseError:
+                self.mark_down(alias)
+                return False
+            with self._lock:
+                self._lag[alias], self._checked_at[alias] = lag, now
+        return self._lag[alias] <= getattr(settings, 'REPLICA_MAX_LAG_SECONDS', 5)
+
+    def pick(self) -> Optional[str]:
+        """
+        A healthy, caught-up replica, rotating between them; None if there is none.
+        """
+        if not self.aliases:
+            return None
+        now = time.monotonic()
+        start = next(self._turn)
+        for offset in range(len(self.aliases)):
+            alias = self.aliases[(start + offset) % len(self.aliases)]
+            if self._usable(alias, now):
+                return alias
+        return None
+
+
+_replicas: Optional[ReplicaSet] = None
+_replicas_lock = threading.Lock()
+
+
+def get_replicas() -> ReplicaSet:
+    global _replicas
+    with _replicas_lock:
+        if _replicas is None:
+            _replicas = ReplicaSet(getattr(settings, 'DATABASE_REPLICAS', []))
+        return _replicas
+
+
+@contextlib.contextmanager
+def replica_reads(enabled: bool = True) -> Iterator[None]:
+    """
+    Let ORM reads in this block go to a replica (one per block).
+    """
+    reads_token = _replica_reads.set(enabled)
+    replica_token = _request_replica.set(None)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(reads_token)
+        _request_replica.reset(replica_token)
+
+
+class ReadReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not _replica_reads.get():
+            return DEFAULT_DB_ALIAS
+        alias = _request_replica.get()
+        if alias is None:
+            alias = get_replicas().pick()
+            if alias is None:
+                return DEFAULT_DB_ALIAS
+            # Stay on one replica so the request sees a consistent snapshot.
+            _request_replica.set(alias)
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+def _pin_key(user_id) -> str:
+    return f"replica-pin:{user_id}"
+
+
+def is_pinned(user) -> bool:
+    if user is None or not user.is_authenticated:
+        return False
+    # A per-process cache can't tell whether another worker took a write.
+    return not cache_is_shared() or bool(cache.get(_pin_key(user.pk)))
+
+
+class ReplicaPinMiddleware:
+    """
+    Pin users who just wrote something to the primary for a while.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (request.method not in SAFE_METHODS and response.status_code < 400
+                and getattr(settings, 'DATABASE_REPLICAS', []) and cache_is_shared()):
+            # DRF copies the authenticated user onto the Django request.
+            user = getattr(request, 'user', None)
+            if user is not None and user.is_authenticated:
+                cache.set(_pin_key(user.pk), True, getattr(settings, 'REPLICA_PIN_SECONDS', 15))
+        return response
+
+
+class ReplicaReadMixin:
+    """
+    For DRF views: serve safe requests (restricted to ``replica_actions`` on
+    viewsets, if set) from a replica, re-running the request on the primary
+    if the replica fails during it.
+    """
+    replica_actions = None
+    replica_failed = False
+
+    def dispatch(self, request, *args, **kwargs):
+        with replica_reads(False):
+            try:
+                return super().dispatch(request, *args, **kwargs)
+            except (OperationalError, InterfaceError) as e:
+                alias = _request_replica.get()
+                if alias is None:
+                    raise
+                # A slow query says nothing about the replica's health.
+                if getattr(e.__cause__, 'pgcode', None) != QUERY_CANCELED:
+                    get_replicas().mark_down(alias)
+        # Read-only, so running it again on the primary is safe.
+        self.replica_failed = True
+        with replica_reads(False):
+            return super().dispatch(request, *args, **kwargs)
+
+    def initial(self, request, *args, **kwargs):
+        # Authentication runs here, so the pin check can see the user.
+        super().initial(request, *args, **kwargs)
+        if (request.method in SAFE_METHODS and not self.replica_failed
+                and (self.replica_actions is None or getattr(self, 'action', None) in self.replica_actions)
+                and not is_pinned(request.user)):
+            _replica_reads.set(True)
@@ -0,0 +1,247 @@
+"""
+Ingestion of editor interaction events (keystrokes, focus/blur, pauses, ...).
+
+Clients POST batches of events for one problem attempt, optionally gzip
+compressed. Validated rows go into a per-process ``EventBuffer`` and a
+background thread writes them to the append-only, daily-partitioned
+``editor_events`` table with ``COPY``. When the buffer is full (the database
+is not keeping up) new batches are refused so clients back off and retry.
+
+Buffered events are lost if the process dies before a flush; that is an
+accepted trade-off for telemetry.
+"""
+import atexit
+import csv
+import datetime
+import io
+import json
+import math
+import threading
+import uuid
+import zlib
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from .metrics import Counter, Gauge
+from .models import EditorEvent
+from .partitioning import ensure_partitions, period_start
+
+MAX_EVENT_TYPE_LENGTH = 32
+MAX_DECOMPRESSED_BYTES = 16 * 1024 * 1024
+# Events must be stamped within this window around the server clock.
+MAX_EVENT_AGE = datetime.timedelta(days=1)
+MAX_EVENT_SKEW = datetime.timedelta(minutes=5)
+
+COPY_COLUMNS = ('user_id', 'problem_id', 'attempt_id', 'event_type', 'occurred_at', 'payload')
+
+Row = Tuple[int, int, str, str, datetime.datetime, Optional[str]]
+
+
+class EventBatchError(ValueError):
+    pass
+
+
+def decode_body(body: bytes, content_encoding: str) -> Dict[str, Any]:
+    """
+    Decode a possibly gzip/deflate-compressed JSON request body, refusing
+    anything that inflates past ``MAX_DECOMPRESSED_BYTES``.
+    """
+    encoding = (content_encoding or '').strip().lower()
+    if encoding in ('gzip', 'deflate'):
+        wbits = 16 + zlib.MAX_WBITS if encoding == 'gzip' else zlib.MAX_WBITS
+        decompressor = zlib.decompressobj(wbits)
+        try:
+            body = decompressor.decompress(body, MAX_DECOMPRESSED_BYTES)
+        except zlib.error as e:
+            raise EventBatchError(f"Could not decompress body: {e}")
+        if decompressor.unconsumed_tail:
+            raise EventBatchError("Decompressed body is too large")
+    elif encoding not in ('', 'identity'):
+        raise EventBatchError(f"Unsupported Content-Encoding: {encoding}")
+    try:
+        data = json.loads(body)
+    except ValueError as e:
+        raise EventBatchError(f"Invalid JSON: {e}")
+    if not isinstance(data, dict):
+        raise EventBatchError("Body must be a JSON object")
+    return data
+
+
+def build_rows(data: Dict[str, Any], user_id: int, max_events: int) -> Tuple[int, List[Row]]:
+    """
+    Validate a batch ``{"problem": id, "attempt_id": uuid, "events": [...]}``
+    where each event is ``{"type": str, "t": epoch_ms, "data": {...}}``.
+    Returns the problem id and the rows to write.
+    """
+    problem_id = data.get('problem')
+    if not isinstance(problem_id, int) or isinstance(problem_id, bool):
+        raise EventBatchError("problem must be an integer id")
+    try:
+        attempt_id = str(uuid.UUID(str(data.get('attempt_id'))))
+    except ValueError:
+        raise EventBatchError("attempt_id must be a UUID")
+    events = data.get('events')
+    if not isinstance(events, list) or not events:
+        raise EventBatchError("events must be a non-empty list")
+    if len(events) > max_events:
+        raise EventBatchError(f"At most {max_events} events per batch")
+
+    now = timezone.now()
+    # Compared as epoch milliseconds so NaN or huge values never reach fromtimestamp().
+    oldest_ms = (now - MAX_EVENT_AGE).timestamp() * 1000
+    newest_ms = (now + MAX_EVENT_SKEW).timestamp() * 1000
+    rows: List[Row] = []
+    for index, event in enumerate(events):
+        if not isinstance(event, dict):
+            raise EventBatchError(f"events[{index}] must be an object")
+        event_type = event.get('type')
+        if not isinstance(event_type, str) or not 0 < len(event_type) <= MAX_EVENT_TYPE_LENGTH:
+            raise EventBatchError(f"events[{index}].type must be a short string")
+        timestamp_ms = event.get('t')
+        if not isinstance(timestamp_ms, (int, float)) or isinstance(timestamp_ms, bool):
+            raise EventBatchError(f"events[{index}].t must be epoch milliseconds")
+        if not math.isfinite(timestamp_ms) or not oldest_ms <= timestamp_ms <= newest_ms:
+            raise EventBatchError(f"events[{index}].t is too far from the server clock")
+        occurred_at = datetime.datetime.fromtimestamp(timestamp_ms / 1000, tz=datetime.timezone.utc)
+        payload = event.get('data')
+        if payload is not None and not isinstance(payload, dict):
+            raise EventBatchError(f"events[{index}].data must be an object")
+        rows.append((user_id, problem_id, attempt_id, event_type, occurred_at,
+                     json.dumps(payload, separators=(',', ':')) if payload is not None else None))
+    return problem_id, rows
+
+
+_known_partitions = set()
+
+
+def copy_rows(rows: Sequence[Row]) -> None:
+    """
+    Write rows with a single COPY, creating the day partitions they need first.
+    """
+    days = {period_start(row[4], 'day') for row in rows}
+    for day in days - _known_partitions:
+        ensure_partitions(EditorEvent._meta.db_table, 'day', ahead=1, now=day)
+        _known_partitions.add(day)
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(row)
+    buffer.seek(0)
+    with connection.cursor() as cursor:
+        cursor.copy_expert(
+            f"COPY {EditorEvent._meta.db_table} ({', '.join(COPY_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+            buffer,
+        )
+
+
+class EventBuffer:
+    """
+    Bounded in-memory buffer flushed by a background thread every
+    ``flush_interval`` seconds or as soon as ``flush_size`` rows are waiting.
+    Rows being written still count against ``max_rows`` so a slow database
+    pushes back on clients instead of growing memory.
+    """
+    def __init__(self, max_rows: int = 100000, flush_size: int = 5000, flush_interval: float = 1.0,
+                 writer: Callable[[Sequence[Row]], None] = copy_rows):
+        self.max_rows = max_rows
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._writer = writer
+        self._rows: List[Row] = []
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._rows) + self._in_flight
+
+    def offer(self, rows: Sequence[Row]) -> bool:
+        """
+        Queue rows for writing; returns False (and queues nothing) when full.
+        """
+        with self._lock:
+            if len(self._rows) + self._in_flight + len(rows) > self.max_rows:
+                editor_events_rejected_total.inc(len(rows))
+                return False
+            self._rows.extend(rows)
+            should_wake = len(self._rows) >= self.flush_size
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='editor-event-flusher', daemon=True)
+                self._thread.start()
+        editor_events_received_total.inc(len(rows))
+        if should_wake:
+            self._wakeup.set()
+        return True
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def flush(self) -> None:
+        with self._flush_lock:
+            with self._lock:
+                rows, self._rows = self._rows, []
+                self._in_flight = len(rows)
+            if not rows:
+                return
+            # The flusher keeps its connection between batches; only replace
+            # it once it has gone bad (e.g. the database restarted).
+            if connection.connection is not None and not connection.is_usable():
+                connection.close()
+            try:
+                for start in range(0, len(rows), self.flush_size):
+                    chunk = rows[start:start + self.flush_size]
+                    self._writer(chunk)
+                    editor_events_written_total.inc(len(chunk))
+                    with self._lock:
+                        self._in_flight -= len(chunk)
+            except Exception as e:
+                with self._lock:
+                    dropped, self._in_flight = self._in_flight, 0
+                editor_events_dropped_total.inc(dropped)
+                print(f"Dropped {dropped} editor events after a write error: {e}", flush=True)
+                # Don't reuse a connection left in a failed state.
+                connection.close()
+
+
+_buffer: Optional[EventBuffer] = None
+_buffer_lock = threading.Lock()
+
+
+def get_event_buffer() -> EventBuffer:
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = EventBuffer(
+                    max_rows=getattr(settings, 'EDITOR_EVENTS_BUFFER_MAX', 100000),
+                    flush_size=getattr(settings, 'EDITOR_EVENTS_FLUSH_SIZE', 5000),
+                    flush_interval=getattr(settings, 'EDITOR_EVENTS_FLUSH_INTERVAL', 1.0),
+                )
+                atexit.register(_buffer.flush)
+    return _buffer
+
+
+editor_events_received_total = Counter(
+    'editor_events_received_total', 'Editor events accepted into the ingestion buffer.')
+editor_events_written_total = Counter(
+    'editor_events_written_total', 'Editor events written to the database.')
+editor_events_rejected_total = Counter(
+    'editor_events_rejected_total', 'Editor events refused because the ingestion buffer was full.')
+editor_events_dropped_total = Counter(
+    'editor_events_dropped_total', 'Buffered editor events lost to database write errors.')
+Gauge(
+    'editor_event_buffer_rows',
+    'Editor events buffered or being written.',
+    function=lambda: get_event_buffer().pending,
+)
@@ -0,0 +1,233 @@
+"""
+Protection for calls to the code execution engine.
+
+``CircuitBreaker`` fails fast once the recent engine error rate crosses a
+threshold, and ``AdaptiveConcurrencyLimit`` caps the number of in-flight engine
+requests per process, growing the cap additively while the engine is healthy
+and halving it when calls fail or get slow (AIMD).
+"""
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+from django.conf import settings
+
+from .metrics import Counter, Gauge
+
+
+class EngineUnavailable(Exception):
+    """
+    Raised instead of dispatching to the engine when it is known to be
+    unhealthy or saturated. The caller should retry after ``retry_after`` seconds.
+    """
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(f"Execution engine unavailable ({reason})")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    HALF_OPEN = "half_open"
+    OPEN = "open"
+
+    def __init__(self, error_threshold: float = 0.5, window_size: int = 20,
+                 min_calls: int = 5, reset_timeout: float = 10.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.error_threshold = error_threshold
+        self.min_calls = min_calls
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._outcomes = deque(maxlen=window_size)
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+
+    def before_call(self) -> None:
+        """
+        Raise ``EngineUnavailable`` if the call must not go through. In the
+        half-open state a single probe call is let through at a time.
+        """
+        with self._lock:
+            state = self._current_state()
+            if state == self.OPEN:
+                retry_after = self.reset_timeout - (self._clock() - self._opened_at)
+                raise EngineUnavailable("circuit_open", max(retry_after, 1))
+            if state == self.HALF_OPEN:
+                if self._probe_in_flight:
+                    raise EngineUnavailable("circuit_half_open", 1)
+                self._probe_in_flight = True
+
+    def abandon(self) -> None:
+        """
+        Give back a half-open probe slot for a call that was never dispatched.
+        """
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record(self, success: bool) -> None:
+        with self._lock:
+            state = self._current_state()
+            if state == self.HALF_OPEN:
+                self._probe_in_flight = False
+                if success:
+                    self._state = self.CLOSED
+                    self._outcomes.clear()
+                else:
+                    self._trip()
+                return
+            self._outcomes.append(success)
+            if state == self.CLOSED and len(self._outcomes) >= self.min_calls:
+                failures = self._outcomes.count(False)
+                if failures / len(self._outcomes) >= self.error_threshold:
+                    self._trip()
+
+    def _trip(self) -> None:
+        self._state = self.OPEN
+        self._opened_at = self._clock()
+        self._outcomes.clear()
+
+
+class AdaptiveConcurrencyLimit:
+    """
+    AIMD limit on concurrent engine requests. A call that succeeds within
+    ``latency_target_ms`` raises the limit by ``1/limit`` (about +1 per full
+    window of calls); a failed or slow call multiplies it by ``backoff``.
+    """
+    def __init__(self, initial: float = 8, minimum: float = 1, maximum: float = 32,
+                 latency_target_ms: float = 2500, backoff: float = 0.5):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_target_ms = latency_target_ms
+        self.backoff = backoff
+        self._limit = float(initial)
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    @property
+    def limit(self) -> float:
+        return self._limit
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self._in_flight >= math.floor(self._limit):
+                return False
+            self._in_flight += 1
+            return True
+
+    def release(self, success: bool, latency_ms: float) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            if success and latency_ms <= self.latency_target_ms:
+                self._limit = min(self.maximum, self._limit + 1 / self._limit)
+            else:
+                self._limit = max(self.minimum, self._limit * self.backoff)
+
+
+class EngineGuard:
+    """
+    Combines the breaker and the concurrency limit around a single engine call.
+    """
+    def __init__(self, breaker: CircuitBreaker, limiter: AdaptiveConcurrencyLimit):
+        self.breaker = breaker
+        self.limiter = limiter
+
+    @classmethod
+    def from_settings(cls) -> "EngineGuard":
+        breaker = CircuitBreaker(
+            error_threshold=getattr(settings, 'ENGINE_BREAKER_ERROR_THRESHOLD', 0.5),
+            window_size=getattr(settings, 'ENGINE_BREAKER_WINDOW', 20),
+            min_calls=getattr(settings, 'ENGINE_BREAKER_MIN_CALLS', 5),
+            reset_timeout=getattr(settings, 'ENGINE_BREAKER_RESET_SECONDS', 10),
+        )
+        limiter = AdaptiveConcurrencyLimit(
+            initial=getattr(settings, 'ENGINE_CONCURRENCY_INITIAL', 8),
+            minimum=getattr(settings, 'ENGINE_CONCURRENCY_MIN', 1),
+            maximum=getattr(settings, 'ENGINE_CONCURRENCY_MAX', 32),
+            latency_target_ms=getattr(settings, 'ENGINE_LATENCY_TARGET_MS', 2500),
+        )
+        return cls(breaker, limiter)
+
+    @contextmanager
+    def call(self) -> Iterator[None]:
+        """
+        Guard one engine request. Any exception escaping the body (network
+        error, timeout, HTTP error, unparsable payload) counts as an engine
+        failure; a normal exit counts as a success.
+        """
+        try:
+            self.breaker.before_call()
+        except EngineUnavailable as e:
+            engine_rejections_total.inc(reason=e.reason)
+            raise
+        if not self.limiter.try_acquire():
+            self.breaker.abandon()
+            engine_rejections_total.inc(reason="concurrency_limit")
+            raise EngineUnavailable("concurrency_limit", 1)
+
+        success = False
+        started = time.monotonic()
+        try:
+            yield
+            success = True
+        finally:
+            latency_ms = (time.monotonic() - started) * 1000
+            self.breaker.record(success)
+            self.limiter.release(success, latency_ms)
+
+
+_guard: Optional[EngineGuard] = None
+_guard_lock = threading.Lock()
+
+
+def get_engine_guard() -> EngineGuard:
+    global _guard
+    if _guard is None:
+        with _guard_lock:
+            if _guard is None:
+                _guard = EngineGuard.from_settings()
+    return _guard
+
+
+_STATE_VALUES = {CircuitBreaker.CLOSED: 0, CircuitBreaker.HALF_OPEN: 1, CircuitBreaker.OPEN: 2}
+
+engine_rejections_total = Counter(
+    'engine_rejections_total',
+    'Engine calls rejected before dispatch, by reason.',
+    ('reason',),
+)
+Gauge(
+    'engine_circuit_state',
+    'Engine circuit breaker state (0=closed, 1=half_open, 2=open; worst across workers).',
+    function=lambda: _STATE_VALUES[get_engine_guard().breaker.state],
+    multiprocess_mode='max',
+)
+Gauge(
+    'engine_concurrency_limit',
+    'Current adaptive limit on in-flight engine requests, summed over workers.',
+    function=lambda: get_engine_guard().limiter.limit,
+)
+Gauge(
+    'engine_in_flight',
+    'Engine requests currently in flight.',
+    function=lambda: get_engine_guard().limiter.in_flight,
+)
@@ -0,0 +1,63 @@
+"""
+Dependency probes for startup and the ``/readyz`` endpoint.
+"""
+import time
+from typing import Any, Dict
+
+import requests
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.utils import OperationalError
+
+
+def _probe(fn) -> Dict[str, Any]:
+    started = time.perf_counter()
+    try:
+        fn()
+    except Exception as e:
+        return {'ok': False, 'latency_ms': round((time.perf_counter() - started) * 1000, 1), 'error': str(e)}
+    return {'ok': True, 'latency_ms': round((time.perf_counter() - started) * 1000, 1)}
+
+
+def probe_database(using: str = DEFAULT_DB_ALIAS) -> Dict[str, Any]:
+    def query():
+        with connections[using].cursor() as cursor:
+            cursor.execute("SELECT 1")
+    return _probe(query)
+
+
+def engine_probe_url() -> str:
+    """
+    Piston's runtime list, next to the configured execute endpoint.
+    """
+    execute_url = getattr(settings, 'PISTON_API_URL', 'http://piston:2000/api/v2/execute')
+    return execute_url.rsplit('/', 1)[0] + '/runtimes'
+
+
+def probe_engine() -> Dict[str, Any]:
+    # Bypasses the engine guard: probes must not trip or queue behind the breaker.
+    def get():
+        requests.get(engine_probe_url(), timeout=getattr(settings, 'ENGINE_PROBE_TIMEOUT', 1.0)).raise_for_status()
+    return _probe(get)
+
+
+def wait_for_database(timeout: float, initial_delay: float = 0.1, max_delay: float = 2.0,
+                      using: str = DEFAULT_DB_ALIAS) -> int:
+    """
+    Retry connecting with exponential backoff until the database answers or
+    ``timeout`` seconds pass. Returns the number of attempts; re-raises the
+    last error on timeout.
+    """
+    deadline = time.monotonic() + timeout
+    delay = initial_delay
+    attempts = 0
+    while True:
+        attempts += 1
+        try:
+            connections[using].ensure_connection()
+            return attempts
+        except OperationalError:
+            if time.monotonic() + delay > deadline:
+                raise
+            time.sleep(delay)
+            delay = min(delay * 2, max_delay)
@@ -0,0 +1,159 @@
+"""
+Hedged requests to the execution engine.
+
+When enabled, a run that has not returned within a configurable percentile of
+recent engine latency for its language is dispatched a second time to another
+engine endpoint. Whichever copy succeeds first wins and the other is
+cancelled. Hedges are capped at a fraction of recent calls so they cannot
+double the load on an engine that is already struggling.
+
+``requests`` cannot abort a request that is already on the wire, so a losing
+call that has started is simply abandoned; Piston kills the run itself once
+``run_timeout`` expires.
+"""
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Deque, Dict, Optional, TypeVar
+
+from django.conf import settings
+
+from .metrics import Counter, Gauge
+
+T = TypeVar('T')
+
+
+class HedgingPolicy:
+    def __init__(self, enabled: bool = False, percentile: float = 95, min_samples: int = 20,
+                 window_size: int = 200, max_hedge_rate: float = 0.1, min_delay_ms: float = 100,
+                 max_workers: int = 32):
+        self.enabled = enabled
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.max_hedge_rate = max_hedge_rate
+        self.min_delay_ms = min_delay_ms
+        self.max_workers = max_workers
+        self._latencies: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=window_size))
+        self._recent_calls: Deque[bool] = deque(maxlen=window_size)
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @classmethod
+    def from_settings(cls) -> "HedgingPolicy":
+        return cls(
+            enabled=getattr(settings, 'ENGINE_HEDGING_ENABLED', False),
+            percentile=getattr(settings, 'ENGINE_HEDGE_PERCENTILE', 95),
+            min_samples=getattr(settings, 'ENGINE_HEDGE_MIN_SAMPLES', 20),
+            window_size=getattr(settings, 'ENGINE_HEDGE_WINDOW', 200),
+            max_hedge_rate=getattr(settings, 'ENGINE_HEDGE_MAX_RATE', 0.1),
+            min_delay_ms=getattr(settings, 'ENGINE_HEDGE_MIN_DELAY_MS', 100),
+        )
+
+    def hedge_delay_ms(self, language: str) -> Optional[float]:
+        """
+        The configured percentile of recent latency for ``language``, or None
+        while there are too few samples to hedge safely.
+        """
+        with self._lock:
+            samples = sorted(self._latencies[language])
+        if len(samples) < self.min_samples:
+            return None
+        index = min(len(samples) - 1, int(len(samples) * self.percentile / 100))
+        return max(self.min_delay_ms, samples[index])
+
+    @property
+    def hedge_rate(self) -> float:
+        with self._lock:
+            if not self._recent_calls:
+                return 0.0
+            return sum(self._recent_calls) / len(self._recent_calls)
+
+    def _record_call(self, language: str, started: float, hedged: bool) -> None:
+        with self._lock:
+            self._latencies[language].append((time.monotonic() - started) * 1000)
+            self._recent_calls.append(hedged)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix='engine-hedge')
+            return self._executor
+
+    def run(self, call: Callable[[str], T], language: str, primary_url: str, hedge_url: str) -> T:
+        """
+        Run ``call(url)`` against ``primary_url``, hedging to ``hedge_url`` if
+        the primary is slow. Exceptions are re-raised only if no copy succeeds.
+        """
+        started = time.monotonic()
+        delay_ms = self.hedge_delay_ms(language) if self.enabled else None
+        if delay_ms is None:
+            result = call(primary_url)
+            self._record_call(language, started, hedged=False)
+            return result
+
+        primary = self._get_executor().submit(call, primary_url)
+        done, _ = wait([primary], timeout=delay_ms / 1000)
+        if done:
+            result = primary.result()
+            self._record_call(language, started, hedged=False)
+            return result
+        if self.hedge_rate >= self.max_hedge_rate:
+            engine_hedges_suppressed_total.inc()
+            result = primary.result()
+            self._record_call(language, started, hedged=False)
+            return result
+
+        engine_hedges_total.inc(language=language)
+        hedge = self._get_executor().submit(call, hedge_url)
+        pending = {primary, hedge}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            winner = next((f for f in done if f.exception() is None), None)
+            if winner is not None:
+                for loser in pending:
+                    loser.cancel()
+                if winner is hedge:
+                    engine_hedge_wins_total.inc(language=language)
+                self._record_call(language, started, hedged=True)
+                return winner.result()
+        # Both copies failed; report the primary's error.
+        with self._lock:
+            self._recent_calls.append(True)
+        return primary.result()
+
+
+_policy: Optional[HedgingPolicy] = None
+_policy_lock = threading.Lock()
+
+
+def get_hedging_policy() -> HedgingPolicy:
+    global _policy
+    if _policy is None:
+        with _policy_lock:
+            if _policy is None:
+                _policy = HedgingPolicy.from_settings()
+    return _policy
+
+
+engine_hedges_total = Counter(
+    'engine_hedges_total',
+    'Engine runs that were dispatched a second time because the first was slow.',
+    ('language',),
+)
+engine_hedge_wins_total = Counter(
+    'engine_hedge_wins_total',
+    'Hedged engine runs where the second dispatch returned first.',
+    ('language',),
+)
+engine_hedges_suppressed_total = Counter(
+    'engine_hedges_suppressed_total',
+    'Hedges skipped because the hedge budget was exhausted.',
+)
+Gauge(
+    'engine_hedge_rate',
+    'Fraction of recent engine runs that were hedged (highest across workers).',
+    function=lambda: get_hedging_policy().hedge_rate,
+    multiprocess_mode='max',
+)
@@ -0,0 +1,157 @@
+"""
+Idempotent submission creation.
+
+A POST to ``/api/submissions/`` is keyed by its ``Idempotency-Key`` header,
+or, without one, by (user, problem, code hash, started_at), which a
+double-click or client retry repeats exactly. The first request claims the
+key with an ``INSERT ... ON CONFLICT DO NOTHING``, so exactly one request
+across all workers judges it. Repeats within ``IDEMPOTENCY_WINDOW`` get the
+original submission back, waiting up to ``IDEMPOTENCY_WAIT_SECONDS`` while
+it is still being judged. A claim whose request failed is released so the
+client can retry. A claim left behind by a crashed worker can be taken over
+after ``IDEMPOTENCY_CLAIM_TIMEOUT``. Each key records a fingerprint of its
+payload, and reusing a client key for a different payload is rejected
+(``IdempotencyKeyReused``, 422) instead of replaying the unrelated original.
+Expired keys are deleted by ``prune_expired`` from ``maintain_partitions``.
+"""
+import datetime
+import hashlib
+import time
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from .code_blobs import content_hash
+from .metrics import Counter
+from .models import Submission, SubmissionIdempotencyKey
+
+IDEMPOTENCY_HEADER = 'HTTP_IDEMPOTENCY_KEY'
+MAX_KEY_LENGTH = 255
+POLL_INTERVAL_SECONDS = 0.2
+PRUNE_BATCH_SIZE = 10000
+
+_TABLE = SubmissionIdempotencyKey._meta.db_table
+
+
+class IdempotencyError(ValueError):
+    pass
+
+
+class IdempotencyKeyReused(IdempotencyError):
+    pass
+
+
+def _window() -> datetime.timedelta:
+    return datetime.timedelta(seconds=getattr(settings, 'IDEMPOTENCY_WINDOW', 24 * 60 * 60))
+
+
+def request_key(request, validated_data: Dict[str, Any]) -> str:
+    """
+    The key for a submission request, scoped to the user.
+    """
+    client_key = request.META.get(IDEMPOTENCY_HEADER)
+    if client_key is not None:
+        if not client_key or len(client_key) > MAX_KEY_LENGTH:
+            raise IdempotencyError(f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters")
+        source = f"{request.user.pk}:key:{client_key}"
+    else:
+        source = (f"{request.user.pk}:derived:{validated_data['problem'].pk}:{validated_data['language']}:"
+                  f"{content_hash(validated_data['code'])}:{validated_data['started_at'].isoformat()}")
+    return hashlib.sha256(source.encode('utf-8')).hexdigest()
+
+
+def request_fingerprint(validated_data: Dict[str, Any]) -> str:
+    source = (f"{validated_data['problem'].pk}:{validated_data['language']}:"
+              f"{content_hash(validated_data['code'])}:{validated_data['started_at'].isoformat()}")
+    return hashlib.sha256(source.encode('utf-8')).hexdigest()
+
+
+def claim(key: str, user_id: int, fingerprint: str = '') -> bool:
+    """
+    Try to become the request that judges ``key``. Expired keys and
+    abandoned claims are taken over. Raises IdempotencyKeyReused if the key
+    is live for a different payload.
+    """
+    now = timezone.now()
+    window = _window()
+    claim_timeout = datetime.timedelta(seconds=getattr(settings, 'IDEMPOTENCY_CLAIM_TIMEOUT', 120))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {_TABLE} AS k (key, user_id, submission_id, submitted_at, fingerprint, created_at)
+            VALUES (%s, %s, NULL, NULL, %s, %s)
+            ON CONFLICT (key) DO UPDATE SET submission_id = NULL, submitted_at = NULL,
+                                            fingerprint = EXCLUDED.fingerprint,
+                                            created_at = EXCLUDED.created_at
+            WHERE k.created_at < %s OR (k.submission_id IS NULL AND k.created_at < %s)
+            RETURNING 1
+            """,
+            [key, user_id, fingerprint, now, now - window, now - claim_timeout],
+        )
+        claimed = cursor.fetchone() is not None
+    if not claimed and fingerprint:
+        existing = SubmissionIdempotencyKey.objects.filter(key=key).values_list('fingerprint', flat=True).first()
+        if existing and existing != fingerprint:
+            idempotency_keys_total.inc(result='reused')
+            raise IdempotencyKeyReused("Idempotency-Key was already used for a different submission")
+    idempotency_keys_total.inc(result='claimed' if claimed else 'repeat')
+    return claimed
+
+
+def complete(key: str, submission: Submission) -> None:
+    SubmissionIdempotencyKey.objects.filter(key=key).update(
+        submission=submission, submitted_at=submission.submitted_at)
+
+
+def release(key: str) -> None:
+    SubmissionIdempotencyKey.objects.filter(key=key, submission__isnull=True).delete()
+
+
+def prune_expired(now=None) -> int:
+    """
+    Delete keys older than ``IDEMPOTENCY_WINDOW``, in batches so row locks
+    stay short. Returns the number deleted.
+    """
+    cutoff = (now or timezone.now()) - _window()
+    deleted = 0
+    while True:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                DELETE FROM {_TABLE} WHERE key IN (
+                    SELECT key FROM {_TABLE} WHERE created_at < %s LIMIT %s
+                )
+                """,
+                [cutoff, PRUNE_BATCH_SIZE],
+            )
+            deleted += cursor.rowcount
+            if cursor.rowcount < PRUNE_BATCH_SIZE:
+                return deleted
+
+
+def wait_for_submission(key: str, timeout: Optional[float] = None) -> Optional[Submission]:
+    """
+    The submission created under ``key``, polling while it is being judged.
+    None if it is still pending after ``timeout`` or its request failed.
+    """
+    if timeout is None:
+        timeout = getattr(settings, 'IDEMPOTENCY_WAIT_SECONDS', 10)
+    deadline = time.monotonic() + timeout
+    while True:
+        row = SubmissionIdempotencyKey.objects.filter(key=key).values('submission_id', 'submitted_at').first()
+        if row is None:
+            return None
+        if row['submission_id'] is not None:
+            return Submission.objects.filter(pk=row['submission_id'], submitted_at=row['submitted_at']).first()
+        if time.monotonic() >= deadline:
+            return None
+        time.sleep(POLL_INTERVAL_SECONDS)
+
+
+idempotency_keys_total = Counter(
+    'idempotency_keys_total',
+    'Submission requests by idempotency outcome (claimed, repeat or reused).',
+    ('result',),
+)
@@ -0,0 +1,256 @@
+"""
+Global leaderboard built from the same scores as the scorecard.
+
+A submission scores 0 when attempted and its rank's ``RANK_TO_SCORE`` when
+passed; only submissions of at least ``MIN_COUNTED_DURATION_MS`` count. Each
+user's best score per problem lives in ``user_problem_bests``. When a new
+submission raises one, the user's ``leaderboard`` row (average best score,
+problems attempted and passed, over enabled problems) is recomputed from at
+most one row per problem. Enabling or disabling a problem recomputes the
+rows of everyone with a best on it (see ``api.ranking``), as re-ranking its
+submissions does.
+
+Pages are read with a keyset cursor walking ``leaderboard_order_idx``
+backwards from the last row served, so no page counts or skips rows. Ties
+share a position; the cursor carries the position reached so far. Only a
+single user's position (``position_of``) counts the rows ahead of it.
+
+Unlike the scorecard, which looks at a user's latest 1000 submissions, the
+leaderboard counts all of them.
+"""
+import base64
+import json
+from typing import Iterable, List, Optional, Tuple
+
+from django.db import connection, transaction
+from django.db.models import BooleanField
+from django.db.models.expressions import RawSQL
+
+from .models import LeaderboardEntry, Problem, Submission, UserProblemBest
+
+RANK_TO_SCORE = {
+    'Wizard': 6,
+    'Senior Engineer': 5,
+    'Mid-Level Engineer': 4,
+    'New Grad': 3,
+    'Participation Trophy': 2,
+    'Newbie': 1,
+}
+# (minimum average rank score, minimum coverage, scorecard rank), best first.
+SCORECARD_RANKS = [
+    (5.5, 0.8, "Wizard"),
+    (4.5, 0.7, "Senior Engineer"),
+    (3.5, 0.5, "Mid-Level Engineer"),
+    (2.5, 0.3, "New Grad"),
+    (1.5, 0.1, "Participation Trophy"),
+]
+DEFAULT_SCORECARD_RANK = "Newbie"
+MIN_COUNTED_DURATION_MS = 5000
+
+# Best first; the leaderboard_order_idx is walked backwards.
+LEADERBOARD_ORDER = ('-avg_rank_score', '-attempted_count', '-passed_count', '-user_id')
+# (avg_rank_score, attempted_count, passed_count, user_id) of a row.
+EntryKey = Tuple[float, int, int, int]
+
+_BESTS = UserProblemBest._meta.db_table
+_BOARD = LeaderboardEntry._meta.db_table
+_PROBLEMS = Problem._meta.db_table
+_SUBMISSIONS = Submission._meta.db_table
+
+
+def submission_score(passed: bool, rank: Optional[str]) -> int:
+    return RANK_TO_SCORE.get(rank, 0) if passed else 0
+
+
+def scorecard_rank(avg_rank_score: float, coverage: float) -> str:
+    for min_score, min_coverage, rank in SCORECARD_RANKS:
+        if avg_rank_score >= min_score and coverage >= min_coverage:
+            return rank
+    return DEFAULT_SCORECARD_RANK
+
+
+def _score_sql() -> Tuple[str, List]:
+    whens, params = [], []
+    for rank, score in RANK_TO_SCORE.items():
+        whens.append("WHEN %s THEN %s")
+        params.extend([rank, score])
+    return f"CASE WHEN passed THEN CASE rank {' '.join(whens)} ELSE 0 END ELSE 0 END", params
+
+
+def _insert_bests(cursor, problem_id: Optional[int] = None) -> List[int]:
+    """
+    Aggregate ``user_problem_bests`` from submissions in one scan; returns
+    the user ids written.
+    """
+    score, params = _score_sql()
+    where = "user_id IS NOT NULL AND duration_ms >= %s"
+    params.append(MIN_COUNTED_DURATION_MS)
+    if problem_id is not None:
+        where += " AND problem_id = %s"
+        params.append(problem_id)
+    cursor.execute(
+        f"""
+        INSERT INTO {_BESTS} (user_id, problem_id, best_score, passed)
+        SELECT user_id, problem_id, MAX({score}), bool_or(passed)
+        FROM {_SUBMISSIONS}
+        WHERE {where}
+        GROUP BY user_id, problem_id
+        RETURNING user_id
+        """,
+        params,
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+
+def _upsert_totals(cursor, user_ids: Optional[List[int]] = None) -> None:
+    where, params = "p.enabled", []
+    if user_ids is not None:
+        where += " AND b.user_id = ANY(%s)"
+        params.append(user_ids)
+    cursor.execute(
+        f"""
+        INSERT INTO {_BOARD} (user_id, avg_rank_score, attempted_count, passed_count, updated_at)
+        SELECT b.user_id, AVG(b.best_score)::float8, COUNT(*), COUNT(*) FILTER (WHERE b.passed), now()
+        FROM {_BESTS} AS b JOIN {_PROBLEMS} AS p ON p.id = b.problem_id
+        WHERE {where}
+        GROUP BY b.user_id
+        ON CONFLICT (user_id) DO UPDATE SET
+            avg_rank_score = EXCLUDED.avg_rank_score,
+            attempted_count = EXCLUDED.attempted_count,
+            passed_count = EXCLUDED.passed_count,
+            updated_at = EXCLUDED.updated_at
+        """,
+        params,
+    )
+
+
+def refresh_users(user_ids: Iterable[int]) -> None:
+    """
+    Recompute the leaderboard rows of these users from their per-problem bests.
+    """
+    user_ids = sorted(set(user_ids))
+    if not user_ids:
+        return
+    with transaction.atomic(), connection.cursor() as cursor:
+        _upsert_totals(cursor, user_ids)
+        cursor.execute(
+            f"""
+            DELETE FROM {_BOARD} AS l
+            WHERE l.user_id = ANY(%s) AND NOT EXISTS (
+                SELECT 1 FROM {_BESTS} AS b JOIN {_PROBLEMS} AS p ON p.id = b.problem_id
+                WHERE b.user_id = l.user_id AND p.enabled
+            )
+            """,
+            [user_ids],
+        )
+
+
+def record_submission(submission: Submission) -> bool:
+    """
+    Fold a new submission into its user's bests, updating the leaderboard
+    if a best changed. Returns whether it did.
+    """
+    if submission.user_id is None or (submission.duration_ms or 0) < MIN_COUNTED_DURATION_MS:
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {_BESTS} AS b (user_id, problem_id, best_score, passed)
+            VALUES (%s, %s, %s, %s)
+            ON CONFLICT (user_id, problem_id) DO UPDATE SET
+                best_score = GREATEST(b.best_score, EXCLUDED.best_score),
+                passed = b.passed OR EXCLUDED.passed
+            WHERE EXCLUDED.best_score > b.best_score OR (EXCLUDED.passed AND NOT b.passed)
+            RETURNING 1
+            """,
+            [submission.user_id, submission.problem_id,
+             submission_score(submission.passed, submission.rank), submission.passed],
+        )
+        changed = cursor.fetchone() is not None
+    if changed:
+        refresh_users([submission.user_id])
+    return changed
+
+
+def refresh_problem_users(problem_id: int) -> None:
+    """
+    Recompute the leaderboard rows of everyone with a best on one problem,
+    e.g. after it was enabled or disabled.
+    """
+    refresh_users(UserProblemBest.objects.filter(problem_id=problem_id).values_list('user_id', flat=True))
+
+
+def refresh_problem(problem_id: int) -> None:
+    """
+    Recompute every user's best on one problem, e.g. after its submissions
+    were re-ranked, and the leaderboard rows of the users involved.
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {_BESTS} WHERE problem_id = %s RETURNING user_id", [problem_id])
+        user_ids = [row[0] for row in cursor.fetchall()]
+        user_ids += _insert_bests(cursor, problem_id)
+        refresh_users(user_ids)
+
+
+def rebuild() -> int:
+    """
+    Recompute all bests and the leaderboard from scratch: one aggregate scan
+    over submissions, then one over the bests. Readers see the old board
+    until it commits. Returns the number of leaderboard rows.
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"LOCK TABLE {_BESTS}, {_BOARD} IN EXCLUSIVE MODE")
+        cursor.execute(f"DELETE FROM {_BOARD}")
+        cursor.execute(f"DELETE FROM {_BESTS}")
+        _insert_bests(cursor)
+        _upsert_totals(cursor)
+        cursor.execute(f"SELECT COUNT(*) FROM {_BOARD}")
+        return cursor.fetchone()[0]
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def ordered_entries(after: Optional[EntryKey] = None):
+    """
+    Entries best first, starting below ``after`` if given.
+    """
+    entries = LeaderboardEntry.objects.order_by(*LEADERBOARD_ORDER)
+    if after is not None:
+        entries = entries.filter(RawSQL(
+            f"({_BOARD}.avg_rank_score, {_BOARD}.attempted_count, {_BOARD}.passed_count, {_BOARD}.user_id)"
+            " < (%s, %s, %s, %s)", list(after), output_field=BooleanField()))
+    return entries
+
+
+def encode_cursor(key: EntryKey, position: int, seen: int) -> str:
+    """
+    Cursor for the page after the row with ``key``, which had ``position``
+    and was the ``seen``-th row served.
+    """
+    payload = json.dumps([list(key), position, seen], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor: str) -> Tuple[EntryKey, int, int]:
+    try:
+        (score, attempted, passed, user_id), position, seen = json.loads(base64.urlsafe_b64decode(cursor))
+        return (float(score), int(attempted), int(passed), int(user_id)), int(position), int(seen)
+    except (ValueError, TypeError):
+        raise InvalidCursor("Invalid cursor")
+
+
+def position_of(entry: LeaderboardEntry) -> int:
+    """
+    1-based position of ``entry``; equal keys share a position.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT COUNT(*) FROM {_BOARD}
+            WHERE (avg_rank_score, attempted_count, passed_count) > (%s, %s, %s)
+            """,
+            [entry.avg_rank_score, entry.attempted_count, entry.passed_count],
+        )
+        return cursor.fetchone()[0] + 1
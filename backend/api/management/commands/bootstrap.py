@@ -0,0 +1,57 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import IntegrityError, connection
+from django.db.migrations.executor import MigrationExecutor
+
+from api.health import wait_for_database
+from api.models import EditorEvent, Submission
+from api.partitioning import ensure_partitions
+
+# pg_advisory_lock key held while migrating, so replicas starting together
+# do not run the same migrations concurrently.
+MIGRATION_LOCK_KEY = 7218300412
+
+
+class Command(BaseCommand):
+    help = ("Prepare the backend to serve: wait for the database, apply pending migrations, "
+            "create the current and next partitions and the default superuser. Run by "
+            "entrypoint.sh; retention, pruning and statement re-rendering are left to the "
+            "scheduled maintain_partitions and render_statements runs.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--db-timeout', type=float, default=getattr(settings, 'DB_WAIT_TIMEOUT', 60),
+                            help="Seconds to wait for the database before giving up.")
+
+    def handle(self, *args, **options):
+        attempts = wait_for_database(options['db_timeout'])
+        self.stdout.write(f"Database ready after {attempts} attempt(s).")
+
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_lock(%s)", [MIGRATION_LOCK_KEY])
+            try:
+                executor = MigrationExecutor(connection)
+                plan = executor.migration_plan(executor.loader.graph.leaf_nodes())
+                if plan:
+                    self.stdout.write(f"Applying {len(plan)} migration(s)...")
+                    call_command('migrate', interactive=False)
+                else:
+                    self.stdout.write("No migrations to apply.")
+            finally:
+                cursor.execute("SELECT pg_advisory_unlock(%s)", [MIGRATION_LOCK_KEY])
+
+        # Enough to accept writes until the scheduled maintain_partitions run,
+        # which also archives old partitions; that must not race across replicas.
+        ensure_partitions(Submission._meta.db_table, 'month', ahead=1)
+        ensure_partitions(EditorEvent._meta.db_table, 'day', ahead=1)
+
+        try:
+            if User.objects.filter(username='admin').exists():
+                self.stdout.write("Superuser already exists.")
+            else:
+                User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+                self.stdout.write("Superuser created.")
+        except IntegrityError:
+            # Another replica created it first.
+            self.stdout.write("Superuser already exists.")
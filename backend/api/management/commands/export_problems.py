@@ -0,0 +1,26 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from api.problem_io import iter_problems_ndjson
+
+
+class Command(BaseCommand):
+    help = "Stream all problems (including harness files and reference solutions) as NDJSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', '-o', help="File to write to (defaults to stdout).")
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help="Rows fetched per round trip from the server-side cursor.")
+
+    def handle(self, *args, **options):
+        out = open(options['output'], 'w', encoding='utf-8') if options['output'] else sys.stdout
+        count = 0
+        try:
+            for line in iter_problems_ndjson(chunk_size=options['chunk_size']):
+                out.write(line)
+                count += 1
+        finally:
+            if out is not sys.stdout:
+                out.close()
+        self.stderr.write(f"Exported {count} problems.")
@@ -0,0 +1,31 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.problem_io import import_problems_ndjson
+
+
+class Command(BaseCommand):
+    help = "Upsert problems by slug from an NDJSON file (one problem per line, '-' for stdin)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="NDJSON file produced by export_problems, or '-' for stdin.")
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help="Problems written per bulk_create/bulk_update batch.")
+
+    def handle(self, *args, **options):
+        source = sys.stdin if options['path'] == '-' else open(options['path'], encoding='utf-8')
+        try:
+            summary = import_problems_ndjson(source, batch_size=options['batch_size'])
+        finally:
+            if source is not sys.stdin:
+                source.close()
+
+        for error in summary['errors']:
+            self.stderr.write(f"line {error['line']}: {error['error']}")
+        self.stdout.write(
+            f"Created {summary['created']}, updated {summary['updated']}, "
+            f"skipped {summary['error_count']} invalid lines."
+        )
+        if summary['error_count']:
+            raise CommandError("Some lines could not be imported.")
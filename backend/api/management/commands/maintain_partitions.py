@@ -0,0 +1,60 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.idempotency import prune_expired
+from api.models import CodeBlob, EditorEvent, Submission
+from api.partitioning import (
+    archive_partition,
+    drop_partition,
+    ensure_partitions,
+    list_partitions,
+    partition_range,
+    period_start,
+)
+
+
+class Command(BaseCommand):
+    help = ("Create upcoming submissions/editor_events partitions, archive submission "
+            "partitions older than SUBMISSION_RETENTION_MONTHS (with their code), delete the code "
+            "blobs they leave unreferenced and expired idempotency keys. Meant to run daily "
+            "(e.g. from cron).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Only report which partitions would be archived.")
+
+    def handle(self, *args, **options):
+        submissions = Submission._meta.db_table
+        created = ensure_partitions(submissions, 'month', ahead=getattr(settings, 'SUBMISSION_PARTITIONS_AHEAD', 3))
+        created += ensure_partitions(EditorEvent._meta.db_table, 'day', ahead=7)
+        self.stdout.write(f"Ensured partitions: {', '.join(created)}")
+        if not options['dry_run']:
+            self.stdout.write(f"Deleted {prune_expired()} expired idempotency key(s)")
+
+        retention_months = getattr(settings, 'SUBMISSION_RETENTION_MONTHS', None)
+        if not retention_months:
+            return
+
+        cutoff = period_start(timezone.now(), 'month')
+        for _ in range(retention_months):
+            cutoff = (cutoff - datetime.timedelta(days=1)).replace(day=1)
+        archive_dir = settings.SUBMISSION_ARCHIVE_DIR
+        code_column = Submission._meta.get_field('code_blob').column
+
+        dropped = False
+        for name in list_partitions(submissions):
+            bounds = partition_range(submissions, name)
+            if bounds is None or bounds[1] > cutoff:
+                continue
+            if options['dry_run']:
+                self.stdout.write(f"Would archive {name}")
+                continue
+            path = archive_partition(name, archive_dir, code_column=code_column)
+            drop_partition(submissions, name)
+            dropped = True
+            self.stdout.write(f"Archived {name} to {path}")
+        if dropped:
+            self.stdout.write(f"Deleted {CodeBlob.objects.delete_orphans()} unreferenced code blob(s)")
@@ -0,0 +1,15 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.leaderboard import rebuild
+
+
+class Command(BaseCommand):
+    help = ("Recompute per-problem bests and the global leaderboard from all submissions. "
+            "Run after editing submissions or problems outside the app.")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        entries = rebuild()
+        self.stdout.write(f"Rebuilt leaderboard: {entries} user(s) in {time.monotonic() - started:.1f}s")
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from api.models import Problem
+from api.problem_cache import bump_catalogue_version
+from api.statements import refresh_statement
+
+
+class Command(BaseCommand):
+    help = ("Re-render problem statements whose Markdown or renderer configuration changed. "
+            "Run after deploys that change the renderer configuration.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Re-render every problem.")
+        parser.add_argument('--batch-size', type=int, default=200)
+
+    def handle(self, *args, **options):
+        problems = Problem.objects.only('id', 'description_md', 'description_html', 'description_hash')
+        stale = []
+        for problem in problems.order_by('id').iterator(chunk_size=options['batch_size']):
+            if options['force']:
+                problem.description_hash = None
+            if refresh_statement(problem):
+                # New content must also change conditional-GET validators.
+                problem.updated_at = timezone.now()
+                stale.append(problem)
+        if stale:
+            with transaction.atomic():
+                Problem.objects.bulk_update(stale, ['description_html', 'description_hash', 'updated_at'],
+                                            batch_size=options['batch_size'])
+                bump_catalogue_version()
+        self.stdout.write(f"Rendered {len(stale)} problem statement(s).")
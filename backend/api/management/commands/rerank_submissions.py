@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from api.models import Problem
+from api.ranking import RERANK_CHUNK_SIZE, rerank_problem
+
+
+class Command(BaseCommand):
+    help = ("Recompute the stored rank of passed submissions from current problem thresholds. "
+            "Runs automatically when thresholds change; use this after manual data fixes.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--problem', type=int, action='append', dest='problems',
+                            help="Problem id to re-rank (repeatable). Defaults to every problem.")
+        parser.add_argument('--chunk-size', type=int, default=RERANK_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        problem_ids = options['problems'] or list(Problem.objects.order_by('id').values_list('id', flat=True))
+        for problem_id in problem_ids:
+            changed = rerank_problem(problem_id, chunk_size=options['chunk_size'])
+            self.stdout.write(f"Problem {problem_id}: {changed} submission(s) re-ranked")
@@ -0,0 +1,40 @@
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.models import Submission
+from api.partitioning import iter_archive, restore_archive
+
+
+class Command(BaseCommand):
+    help = "List, read or restore submission partitions archived by maintain_partitions."
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['list', 'show', 'restore'])
+        parser.add_argument('partition', nargs='?',
+                            help="Partition name, e.g. submissions_p202401 (for show/restore).")
+
+    def handle(self, *args, **options):
+        archive_dir = settings.SUBMISSION_ARCHIVE_DIR
+        if options['action'] == 'list':
+            if os.path.isdir(archive_dir):
+                for filename in sorted(os.listdir(archive_dir)):
+                    if filename.endswith('.csv.gz'):
+                        self.stdout.write(filename[:-len('.csv.gz')])
+            return
+
+        if not options['partition']:
+            raise CommandError("A partition name is required")
+        path = os.path.join(archive_dir, f"{options['partition']}.csv.gz")
+        if not os.path.exists(path):
+            raise CommandError(f"No archive at {path}")
+
+        if options['action'] == 'show':
+            # One JSON object per row; values are the raw column text from COPY.
+            for row in iter_archive(path):
+                self.stdout.write(json.dumps(row, ensure_ascii=False))
+        else:
+            name = restore_archive(Submission._meta.db_table, 'month', path)
+            self.stdout.write(f"Restored {name}; its rows are queryable again.")
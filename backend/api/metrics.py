@@ -0,0 +1,326 @@
+"""
+Lightweight in-process metrics.
+
+Collectors register themselves in a module-level registry and are rendered in
+the Prometheus text exposition format by ``MetricsView``.
+
+Under gunicorn every worker has its own registry. ``Registry.share()`` (called
+from gunicorn.conf.py) makes a worker write a snapshot of its samples to a
+shared directory every few seconds and on exit; ``render()`` then merges the
+snapshots of all workers. Counters and histograms are summed, including those
+of workers that have since exited: when a worker exits the gunicorn master
+folds them into ``metrics_dead.json`` and deletes the worker's file, so the
+directory holds one file per live worker plus that one. Gauges only come from
+live workers and are combined according to their ``multiprocess_mode``.
+"""
+import contextlib
+import glob
+import json
+import math
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for key, value in labels.items():
+        escaped = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{key}="{escaped}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Registry:
+    """
+    Holds every collector created in this process.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, "Metric"] = {}
+        self._directory: Optional[str] = None
+        self._writer: Optional[threading.Thread] = None
+
+    def register(self, metric: "Metric") -> None:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+
+    def collect(self) -> Iterator["Metric"]:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return iter(metrics)
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """
+        This process's metrics as JSON-serializable dicts.
+        """
+        snapshot = []
+        for metric in self.collect():
+            try:
+                samples = [[name, labels, value] for name, labels, value in metric.samples()]
+            except Exception as e:
+                # A callback gauge whose dependencies are not ready yet.
+                print(f"Skipping metric {metric.name}: {e}", flush=True)
+                continue
+            snapshot.append({
+                'name': metric.name,
+                'type': metric.type,
+                'documentation': metric.documentation,
+                'mode': getattr(metric, 'multiprocess_mode', None),
+                'samples': samples,
+            })
+        return snapshot
+
+    def share(self, directory: str, interval: float = 5.0) -> None:
+        """
+        Publish this process's metrics to ``directory`` every ``interval``
+        seconds so any process sharing it can render the merged view.
+        """
+        self._directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._writer = threading.Thread(target=self._write_periodically, args=(interval,),
+                                        name='metrics-writer', daemon=True)
+        self._writer.start()
+
+    def _write_periodically(self, interval: float) -> None:
+        while True:
+            time.sleep(interval)
+            self.write_snapshot()
+
+    def write_snapshot(self) -> None:
+        if self._directory is None:
+            return
+        _write_json(os.path.join(self._directory, f"metrics_{os.getpid()}.json"), self.snapshot())
+
+    def render(self) -> str:
+        if self._directory is None:
+            return render_snapshots([self.snapshot()])
+        self.write_snapshot()
+        snapshots = []
+        for path in glob.glob(os.path.join(self._directory, "metrics_*.json")):
+            # A worker may exit (and its file be rewritten) while we read.
+            with contextlib.suppress(OSError, ValueError):
+                with open(path) as f:
+                    snapshots.append(json.load(f))
+        return render_snapshots(snapshots)
+
+
+def _write_json(path: str, data: Any) -> None:
+    # Written under a temporary name so readers never see half a file.
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+
+def _read_json(path: str, default: Any) -> Any:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def mark_process_dead(directory: str, pid: int) -> None:
+    """
+    Fold an exited worker's counters and histograms into ``metrics_dead.json``
+    and delete its snapshot; its gauges are dropped. Called by the gunicorn
+    master when a worker exits.
+    """
+    path = os.path.join(directory, f"metrics_{pid}.json")
+    snapshot = _read_json(path, None)
+    if snapshot is None:
+        return
+    dead_path = os.path.join(directory, "metrics_dead.json")
+    totals = [m for m in snapshot if m['type'] != 'gauge']
+    aggregate = []
+    for metric in _merge_samples([_read_json(dead_path, []), totals]).values():
+        values = metric.pop('values')
+        metric['samples'] = [[name, dict(labels), sum(v)] for (name, labels), v in values.items()]
+        aggregate.append(metric)
+    _write_json(dead_path, aggregate)
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(path)
+
+
+_GAUGE_MERGE = {'sum': sum, 'max': max, 'min': min}
+
+
+def _merge_samples(snapshots: List[List[Dict[str, Any]]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Metrics by name, each with the values of every snapshot grouped by sample
+    name and labels under ``values``.
+    """
+    merged: Dict[str, Dict[str, Any]] = {}
+    for snapshot in snapshots:
+        for metric in snapshot:
+            entry = merged.setdefault(metric['name'], {**metric, 'values': {}})
+            for name, labels, value in metric['samples']:
+                key = (name, tuple(labels.items()))
+                entry['values'].setdefault(key, []).append(value)
+    return merged
+
+
+def render_snapshots(snapshots: List[List[Dict[str, Any]]]) -> str:
+    merged = _merge_samples(snapshots)
+    lines = []
+    for metric in merged.values():
+        lines.append(f"# HELP {metric['name']} {metric['documentation']}")
+        lines.append(f"# TYPE {metric['name']} {metric['type']}")
+        combine = _GAUGE_MERGE[metric['mode'] or 'sum'] if metric['type'] == 'gauge' else sum
+        for (name, labels), values in metric['values'].items():
+            lines.append(f"{name}{_format_labels(dict(labels))} {_format_value(combine(values))}")
+    return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], Any] = {}
+        registry.register(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> Iterator[Tuple[str, Dict[str, str], float]]:
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield self.name, dict(zip(self.labelnames, key)), value
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """
+    A value that can go up and down. If ``function`` is given the gauge is
+    read from it at collection time instead of being set explicitly.
+    ``multiprocess_mode`` ('sum', 'max' or 'min') says how values from
+    several workers are combined.
+    """
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 function: Optional[Callable[[], float]] = None, multiprocess_mode: str = 'sum'):
+        if multiprocess_mode not in _GAUGE_MERGE:
+            raise ValueError(f"multiprocess_mode must be one of {tuple(_GAUGE_MERGE)}")
+        super().__init__(name, documentation, labelnames)
+        self._function = function
+        self.multiprocess_mode = multiprocess_mode
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    @contextlib.contextmanager
+    def track_in_progress(self, **labels):
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def samples(self) -> Iterator[Tuple[str, Dict[str, str], float]]:
+        if self._function is not None:
+            yield self.name, {}, self._function()
+            return
+        yield from super().samples()
+
+    def value(self, **labels) -> float:
+        if self._function is not None:
+            return self._function()
+        return super().value(**labels)
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram(Metric):
+    """
+    Counts observations into cumulative ``le`` buckets, plus their sum and count.
+    """
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = next(i for i, bound in enumerate(self.buckets) if value <= bound)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                # One count per bucket, then the sum of observed values.
+                counts = self._values[key] = [0] * len(self.buckets) + [0.0]
+            counts[index] += 1
+            counts[-1] += value
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self) -> Iterator[Tuple[str, Dict[str, str], float]]:
+        with self._lock:
+            items = [(key, list(counts)) for key, counts in self._values.items()]
+        for key, counts in items:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                yield f"{self.name}_bucket", {**labels, 'le': _format_value(bound)}, cumulative
+            yield f"{self.name}_sum", labels, counts[-1]
+            yield f"{self.name}_count", labels, cumulative
+
+    def value(self, **labels) -> float:
+        """
+        The number of observations.
+        """
+        with self._lock:
+            counts = self._values.get(self._key(labels))
+        return sum(counts[:-1]) if counts else 0
@@ -0,0 +1,75 @@
+"""
+Request-level metrics: latency per route and the database work behind it.
+"""
+import contextlib
+import time
+
+from django.db import connections
+
+from .metrics import Counter, Histogram
+
+http_request_duration_seconds = Histogram(
+    'http_request_duration_seconds',
+    'Time to produce a response, by method, route and status code.',
+    ('method', 'route', 'status'),
+)
+db_queries_total = Counter(
+    'db_queries_total',
+    'Database queries executed while handling requests, by route.',
+    ('route',),
+)
+db_query_duration_seconds_total = Counter(
+    'db_query_duration_seconds_total',
+    'Time spent in database queries while handling requests, by route.',
+    ('route',),
+)
+
+
+class QueryStats:
+    """
+    ``execute_wrapper`` hook counting queries and the time spent in them.
+    """
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - started
+
+
+def route_name(request) -> str:
+    """
+    The matched URL pattern's name (e.g. ``problem-detail``), which keeps
+    label cardinality bounded unlike the raw path.
+    """
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match.view_name or match.route or 'unnamed'
+
+
+class RequestMetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = QueryStats()
+        started = time.perf_counter()
+        with contextlib.ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(queries))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        route = route_name(request)
+        http_request_duration_seconds.observe(elapsed, method=request.method, route=route,
+                                              status=str(response.status_code))
+        if queries.count:
+            db_queries_total.inc(queries.count, route=route)
+            db_query_duration_seconds_total.inc(queries.seconds, route=route)
+        return response
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.10 on 2026-10-19 04:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_initial_data'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RateLimitBucket',
+            fields=[
+                ('key', models.TextField(primary_key=True, serialize=False)),
+                ('tokens', models.FloatField()),
+                ('allowed', models.BooleanField(default=True)),
+                ('updated_at', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'rate_limit_buckets',
+            },
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.10 on 2026-10-19 04:33
+
+from django.db import migrations, models
+
+
+CREATE_EDITOR_EVENTS = """
+CREATE TABLE editor_events (
+    id bigint GENERATED BY DEFAULT AS IDENTITY,
+    user_id integer NOT NULL,
+    problem_id bigint NOT NULL,
+    attempt_id uuid NOT NULL,
+    event_type text NOT NULL,
+    occurred_at timestamptz NOT NULL,
+    payload jsonb,
+    received_at timestamptz NOT NULL DEFAULT now(),
+    PRIMARY KEY (id, occurred_at)
+) PARTITION BY RANGE (occurred_at);
+
+-- Catches rows for days whose partition has not been created yet.
+CREATE TABLE editor_events_default PARTITION OF editor_events DEFAULT;
+
+CREATE INDEX editor_events_attempt_idx ON editor_events (attempt_id, occurred_at);
+CREATE INDEX editor_events_user_problem_idx ON editor_events (user_id, problem_id, occurred_at);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_rate_limit_buckets'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_EDITOR_EVENTS, reverse_sql="DROP TABLE editor_events;"),
+        migrations.CreateModel(
+            name='EditorEvent',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('attempt_id', models.UUIDField()),
+                ('event_type', models.TextField()),
+                ('occurred_at', models.DateTimeField()),
+                ('payload', models.JSONField(blank=True, null=True)),
+                ('received_at', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'editor_events',
+                'managed': False,
+            },
+        ),
+    ]
@@ -0,0 +1,96 @@
+"""
+Turn ``submissions`` into a table range partitioned by month on ``submitted_at``.
+
+Postgres requires the partition key in every unique constraint, so the
+primary key becomes ``(id, submitted_at)``; ``id`` stays unique through its
+identity sequence and Django keeps treating it as the primary key.
+"""
+import datetime
+
+from django.db import migrations
+from django.utils import timezone
+
+from api.partitioning import create_partitions
+
+COLUMNS = ("id, language, code, started_at, submitted_at, status, duration_ms, memory_kb, "
+           "passed, rank, raw_results, created_at, problem_id, user_id")
+
+COLUMN_DEFINITIONS = """
+    language text NOT NULL,
+    code text NOT NULL,
+    started_at timestamp with time zone NOT NULL,
+    submitted_at timestamp with time zone NOT NULL,
+    status text NULL,
+    duration_ms integer NULL,
+    memory_kb integer NULL,
+    passed boolean NOT NULL,
+    rank text NULL,
+    raw_results jsonb NULL,
+    created_at timestamp with time zone NOT NULL,
+    problem_id bigint NOT NULL REFERENCES problems (id) DEFERRABLE INITIALLY DEFERRED,
+    user_id integer NULL REFERENCES auth_user (id) DEFERRABLE INITIALLY DEFERRED,
+"""
+
+CREATE_PARTITIONED = f"""
+ALTER TABLE submissions RENAME TO submissions_unpartitioned;
+
+CREATE TABLE submissions (
+    id bigint GENERATED BY DEFAULT AS IDENTITY,
+    {COLUMN_DEFINITIONS}
+    PRIMARY KEY (id, submitted_at)
+) PARTITION BY RANGE (submitted_at);
+
+-- Catches rows for months whose partition has not been created yet.
+CREATE TABLE submissions_default PARTITION OF submissions DEFAULT;
+
+CREATE INDEX submissions_submitted_at_idx ON submissions (submitted_at);
+CREATE INDEX submissions_user_submitted_at_idx ON submissions (user_id, submitted_at);
+CREATE INDEX submissions_problem_submitted_at_idx ON submissions (problem_id, submitted_at);
+"""
+
+COPY_ROWS = f"""
+INSERT INTO submissions ({COLUMNS}) SELECT {COLUMNS} FROM submissions_unpartitioned;
+SELECT setval(pg_get_serial_sequence('submissions', 'id'),
+              COALESCE((SELECT max(id) FROM submissions), 0) + 1, false);
+DROP TABLE submissions_unpartitioned;
+"""
+
+REVERSE = f"""
+CREATE TABLE submissions_unpartitioned (
+    id bigint GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    {COLUMN_DEFINITIONS.rstrip().rstrip(',')}
+);
+INSERT INTO submissions_unpartitioned ({COLUMNS}) SELECT {COLUMNS} FROM submissions;
+SELECT setval(pg_get_serial_sequence('submissions_unpartitioned', 'id'),
+              COALESCE((SELECT max(id) FROM submissions_unpartitioned), 0) + 1, false);
+DROP TABLE submissions;
+ALTER TABLE submissions_unpartitioned RENAME TO submissions;
+CREATE INDEX submissions_problem_id_idx ON submissions (problem_id);
+CREATE INDEX submissions_user_id_idx ON submissions (user_id);
+"""
+
+
+def create_monthly_partitions(apps, schema_editor):
+    """
+    Create a partition for every month that has submissions, up to three
+    months ahead, so existing rows never land in the default partition.
+    """
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT min(submitted_at) FROM submissions_unpartitioned")
+        oldest = cursor.fetchone()[0]
+    now = timezone.now()
+    last = now + datetime.timedelta(days=31 * 3)
+    create_partitions('submissions', 'month', oldest or now, last, using=schema_editor.connection.alias)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_editor_events'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_PARTITIONED, reverse_sql=REVERSE),
+        migrations.RunPython(create_monthly_partitions, migrations.RunPython.noop),
+        migrations.RunSQL(COPY_ROWS, reverse_sql=migrations.RunSQL.noop),
+    ]
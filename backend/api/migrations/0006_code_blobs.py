@@ -0,0 +1,105 @@
+"""
+Move submission code into the deduplicated, compressed ``code_blobs`` table.
+
+Existing rows are backfilled in chunks before ``submissions.code`` is dropped.
+"""
+from django.db import migrations, models
+import django.db.models.deletion
+
+from api.code_blobs import compress, content_hash, decompress
+
+BATCH_SIZE = 2000
+
+
+def backfill_code_blobs(apps, schema_editor):
+    CodeBlob = apps.get_model('api', 'CodeBlob')
+    Submission = apps.get_model('api', 'Submission')
+
+    def flush(batch):
+        blobs = {}
+        for _, code in batch:
+            digest = content_hash(code)
+            if digest not in blobs:
+                compression, data = compress(code)
+                blobs[digest] = CodeBlob(sha256=digest, compression=compression, data=data,
+                                         size=len(code.encode('utf-8')))
+        CodeBlob.objects.bulk_create(blobs.values(), ignore_conflicts=True)
+        Submission.objects.bulk_update(
+            [Submission(id=pk, code_blob_id=content_hash(code)) for pk, code in batch],
+            ['code_blob'],
+        )
+
+    batch = []
+    rows = Submission.objects.filter(code_blob__isnull=True).values_list('id', 'code')
+    for row in rows.iterator(chunk_size=BATCH_SIZE):
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+
+
+def restore_inline_code(apps, schema_editor):
+    Submission = apps.get_model('api', 'Submission')
+    batch = []
+    rows = Submission.objects.values_list('id', 'code_blob__compression', 'code_blob__data')
+    for pk, compression, data in rows.iterator(chunk_size=BATCH_SIZE):
+        batch.append(Submission(id=pk, code=decompress(compression, data)))
+        if len(batch) >= BATCH_SIZE:
+            Submission.objects.bulk_update(batch, ['code'])
+            batch = []
+    if batch:
+        Submission.objects.bulk_update(batch, ['code'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_partition_submissions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CodeBlob',
+            fields=[
+                ('sha256', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('compression', models.TextField()),
+                ('data', models.BinaryField()),
+                ('size', models.IntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'code_blobs',
+            },
+        ),
+        # The data is already compressed; stop TOAST from trying again.
+        migrations.RunSQL(
+            "ALTER TABLE code_blobs ALTER COLUMN data SET STORAGE EXTERNAL;",
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='code_blob',
+            field=models.ForeignKey(db_column='code_sha256', null=True, on_delete=django.db.models.deletion.PROTECT,
+                                    related_name='submissions', to='api.codeblob'),
+        ),
+        migrations.RunPython(backfill_code_blobs, restore_inline_code),
+        # The FK is deferrable, so the backfill leaves trigger events queued
+        # until commit, and Postgres refuses to ALTER a table that has them.
+        # Fire them now, in both directions.
+        migrations.RunSQL(
+            "SET CONSTRAINTS ALL IMMEDIATE;",
+            reverse_sql="SET CONSTRAINTS ALL IMMEDIATE;",
+        ),
+        migrations.AlterField(
+            model_name='submission',
+            name='code_blob',
+            field=models.ForeignKey(db_column='code_sha256', on_delete=django.db.models.deletion.PROTECT,
+                                    related_name='submissions', to='api.codeblob'),
+        ),
+        migrations.RemoveField(
+            model_name='submission',
+            name='code',
+        ),
+    ]
@@ -0,0 +1,25 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_code_blobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogueVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'problem_catalogue_version',
+            },
+        ),
+        migrations.RunSQL(
+            "INSERT INTO problem_catalogue_version (id, version) VALUES (1, 0);",
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,42 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('api', '0007_catalogue_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='leaderboard_entry', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('avg_rank_score', models.FloatField()),
+                ('attempted_count', models.IntegerField()),
+                ('passed_count', models.IntegerField()),
+                ('updated_at', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'leaderboard',
+                'indexes': [models.Index(fields=['avg_rank_score', 'attempted_count', 'passed_count', 'user'], name='leaderboard_order_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='UserProblemBest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('best_score', models.SmallIntegerField()),
+                ('passed', models.BooleanField()),
+                ('problem', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.problem')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'user_problem_bests',
+                'constraints': [models.UniqueConstraint(fields=('user', 'problem'), name='user_problem_bests_user_problem_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    Partial index matching the per-problem leaderboard's DISTINCT ON
+    (user_id) ... ORDER BY user_id, duration_ms, submitted_at over passed
+    submissions (see api/problem_leaderboard.py).
+    """
+
+    dependencies = [
+        ('api', '0008_leaderboard'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            """
+            CREATE INDEX submissions_fastest_passed_idx
+                ON submissions (problem_id, user_id, duration_ms, submitted_at)
+                INCLUDE (language)
+                WHERE passed AND user_id IS NOT NULL;
+            """,
+            reverse_sql="DROP INDEX IF EXISTS submissions_fastest_passed_idx;",
+        ),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_submission_idempotency_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submission',
+            name='runtime_version',
+            field=models.TextField(blank=True, null=True),
+        ),
+    ]
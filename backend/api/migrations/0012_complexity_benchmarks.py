@@ -0,0 +1,50 @@
+# Generated by Django 4.2.10 on 2026-10-19 04:58
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_submission_runtime_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='problem',
+            name='complexity_sizes',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), blank=True, null=True, size=None),
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='complexity_exponent',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='complexity_verdict',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='ComplexityBaseline',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('language', models.TextField()),
+                ('runtime_version', models.TextField()),
+                ('problem_updated_at', models.DateTimeField()),
+                ('exponent', models.FloatField()),
+                ('timings', models.JSONField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('problem', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.problem')),
+            ],
+            options={
+                'db_table': 'complexity_baselines',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='complexitybaseline',
+            constraint=models.UniqueConstraint(fields=('problem', 'language', 'runtime_version'), name='complexity_baselines_problem_language_runtime_uniq'),
+        ),
+    ]
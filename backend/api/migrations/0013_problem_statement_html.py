@@ -0,0 +1,23 @@
+# Generated by Django 4.2.10 on 2026-10-19 05:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_complexity_benchmarks'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='problem',
+            name='description_hash',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='problem',
+            name='description_html',
+            field=models.TextField(blank=True, null=True),
+        ),
+    ]
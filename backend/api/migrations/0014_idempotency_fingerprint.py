@@ -0,0 +1,22 @@
+# Generated by Django 4.2.10 on 2026-10-19 05:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_problem_statement_html'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submissionidempotencykey',
+            name='fingerprint',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='submissionidempotencykey',
+            index=models.Index(fields=['created_at'], name='idempotency_created_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.10 on 2026-10-19 05:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_idempotency_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='complexitybaseline',
+            name='exponent',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,27 @@
+"""
+Render the statements of problems saved before ``description_html`` existed.
+Startup no longer runs ``render_statements``, so do it once here.
+"""
+from django.db import migrations
+
+from api.statements import refresh_statement
+
+
+def render_missing_statements(apps, schema_editor):
+    Problem = apps.get_model('api', 'Problem')
+    stale = []
+    for problem in Problem.objects.filter(description_html__isnull=True).iterator(chunk_size=200):
+        if refresh_statement(problem):
+            stale.append(problem)
+    Problem.objects.bulk_update(stale, ['description_html', 'description_hash'], batch_size=200)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_complexity_baseline_failures'),
+    ]
+
+    operations = [
+        migrations.RunPython(render_missing_statements, migrations.RunPython.noop),
+    ]
@@ -1,12 +1,23 @@
-from django.db import models
+import copy
+import datetime
+
+from django.db import connection, models
 from django.contrib.auth.models import User
 from django.contrib.postgres.fields import ArrayField
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from .code_blobs import compress, content_hash, decompress
+from .statements import refresh_statement
 
 
 class Problem(models.Model):
     title = models.TextField(null=False)
     slug = models.TextField(null=False, unique=True)
     description_md = models.TextField(null=False)
+    # Sanitized HTML rendered from description_md on save (see api.statements)
+    description_html = models.TextField(null=True, blank=True)
+    description_hash = models.CharField(max_length=64, null=True, blank=True)
     tags = ArrayField(models.TextField(), default=list)
     difficulty = models.TextField(null=True, blank=True)
     time_thresholds = models.JSONField(null=False)
@@ -14,21 +25,125 @@ class Problem(models.Model):
     reference_solutions = models.JSONField(null=False)
     harness_eval_files = models.JSONField(null=True, blank=True)
     enabled = models.BooleanField(default=False)
+    # Input sizes for the complexity benchmark of passing submissions (see api.complexity)
+    complexity_sizes = ArrayField(models.IntegerField(), null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # time_thresholds and enabled as loaded from the database, so a save can
+    # tell whether stored ranks or leaderboard totals need recomputing (see
+    # api.ranking).
+    loaded_time_thresholds = None
+    loaded_enabled = None
+
     class Meta:
         db_table = 'problems'
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'description_md' in update_fields:
+            if refresh_statement(self) and update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'description_html', 'description_hash'}
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.loaded_time_thresholds = copy.deepcopy(instance.__dict__.get('time_thresholds'))
+        instance.loaded_enabled = instance.__dict__.get('enabled')
+        return instance
+
+
+class CatalogueVersion(models.Model):
+    """
+    Single-row counter bumped whenever a problem changes. Per-process caches
+    compare it with the version they were filled at (see ``api.problem_cache``).
+    """
+    version = models.BigIntegerField(default=0)
+
+    class Meta:
+        db_table = 'problem_catalogue_version'
+
+    def __str__(self):
+        return f"catalogue v{self.version}"
+
+
+class CodeBlobManager(models.Manager):
+    def store(self, text: str) -> 'CodeBlob':
+        """
+        Return the blob for ``text``, inserting it unless an identical one
+        is already stored. Safe to call concurrently for the same text.
+        """
+        compression, data = compress(text)
+        blob = self.model(sha256=content_hash(text), compression=compression, data=data,
+                          size=len(text.encode('utf-8')))
+        self.bulk_create([blob], ignore_conflicts=True)
+        return blob
+
+    def delete_orphans(self, batch_size: int = 1000,
+                       grace: datetime.timedelta = datetime.timedelta(days=1)) -> int:
+        """
+        Delete blobs no submission references any more (e.g. once their
+        partition was archived and dropped), walking the table in batches.
+        Blobs younger than ``grace`` are kept, since the submission that
+        stored one may not be committed yet. Returns how many were deleted.
+        """
+        blobs = self.model._meta.db_table
+        submissions = Submission._meta.db_table
+        column = Submission._meta.get_field('code_blob').column
+        cutoff = timezone.now() - grace
+        deleted, last = 0, ''
+        with connection.cursor() as cursor:
+            while True:
+                cursor.execute(f"SELECT sha256 FROM {blobs} WHERE sha256 > %s ORDER BY sha256 LIMIT %s",
+                               [last, batch_size])
+                keys = [row[0] for row in cursor.fetchall()]
+                if not keys:
+                    return deleted
+                cursor.execute(
+                    f"""
+                    DELETE FROM {blobs} b WHERE b.sha256 = ANY(%s) AND b.created_at < %s
+                    AND NOT EXISTS (SELECT 1 FROM {submissions} s WHERE s.{column} = b.sha256)
+                    """,
+                    [keys, cutoff],
+                )
+                deleted += cursor.rowcount
+                last = keys[-1]
+
+
+class CodeBlob(models.Model):
+    """
+    Deduplicated, compressed submission code keyed by content hash.
+    """
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    compression = models.TextField()
+    data = models.BinaryField()
+    size = models.IntegerField()  # Uncompressed size in bytes
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = CodeBlobManager()
+
+    class Meta:
+        db_table = 'code_blobs'
+
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.size} bytes)"
+
+    @cached_property
+    def text(self) -> str:
+        return decompress(self.compression, self.data)
+
 
 class Submission(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
     problem = models.ForeignKey(Problem, on_delete=models.CASCADE)
     language = models.TextField(null=False)
-    code = models.TextField(null=False)
+    runtime_version = models.TextField(null=True, blank=True)  # Engine version that judged it
+    code_blob = models.ForeignKey(CodeBlob, on_delete=models.PROTECT, db_column='code_sha256',
+                                  related_name='submissions')
     started_at = models.DateTimeField(null=False)
     submitted_at = models.DateTimeField(null=False)
     status = models.TextField(null=True, blank=True)
@@ -36,11 +151,171 @@ class Submission(models.Model):
     memory_kb = models.IntegerField(null=True, blank=True)
     passed = models.BooleanField(null=False)
     rank = models.TextField(null=True, blank=True)
+    complexity_exponent = models.FloatField(null=True, blank=True)  # Fitted growth exponent, see api.complexity
+    complexity_verdict = models.TextField(null=True, blank=True)
     raw_results = models.JSONField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
+        # Range partitioned by month on submitted_at (migration 0005); filter
+        # on submitted_at where possible so Postgres can prune partitions.
         db_table = 'submissions'
 
     def __str__(self):
-        return f"{self.user.username if self.user else 'Anonymous'} - {self.problem.title} - {self.language}" 
\ No newline at end of file
+        return f"{self.user.username if self.user else 'Anonymous'} - {self.problem.title} - {self.language}"
+
+    @property
+    def code(self) -> str:
+        """
+        The submitted source, decompressed from its blob on first access.
+        """
+        pending = getattr(self, '_pending_code', None)
+        if pending is not None:
+            return pending
+        return self.code_blob.text
+
+    @code.setter
+    def code(self, value: str):
+        # Stored as a blob on save(); also lets Submission(code=...) work.
+        self._pending_code = value
+
+    def save(self, *args, **kwargs):
+        pending = getattr(self, '_pending_code', None)
+        if pending is not None:
+            self.code_blob = CodeBlob.objects.store(pending)
+            self._pending_code = None
+        super().save(*args, **kwargs) 
+
+class RateLimitBucket(models.Model):
+    """
+    Token-bucket state shared by all workers, see ``api.rate_limit``.
+    """
+    key = models.TextField(primary_key=True)
+    tokens = models.FloatField()
+    allowed = models.BooleanField(default=True)
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'rate_limit_buckets'
+
+    def __str__(self):
+        return f"{self.key} ({self.tokens:.2f} tokens)"
+
+
+class EditorEvent(models.Model):
+    """
+    Append-only editor interaction telemetry. The table is range partitioned
+    by day on ``occurred_at`` and written with COPY (see ``api.editor_events``),
+    so Django does not manage its schema and the foreign keys are not enforced.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.DO_NOTHING, db_constraint=False)
+    problem = models.ForeignKey(Problem, on_delete=models.DO_NOTHING, db_constraint=False)
+    attempt_id = models.UUIDField()
+    event_type = models.TextField()
+    occurred_at = models.DateTimeField()
+    payload = models.JSONField(null=True, blank=True)
+    received_at = models.DateTimeField()
+
+    class Meta:
+        managed = False
+        db_table = 'editor_events'
+
+    def __str__(self):
+        return f"{self.event_type} @ {self.occurred_at}"
+
+
+class UserProblemBest(models.Model):
+    """
+    A user's best scorecard score on one problem: 0 for an attempt, the rank
+    score for a pass. Maintained by ``api.leaderboard``.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    problem = models.ForeignKey(Problem, on_delete=models.CASCADE)
+    best_score = models.SmallIntegerField()
+    passed = models.BooleanField()
+
+    class Meta:
+        db_table = 'user_problem_bests'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'problem'], name='user_problem_bests_user_problem_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} / {self.problem_id}: {self.best_score}"
+
+
+class LeaderboardEntry(models.Model):
+    """
+    A user's scorecard totals over enabled problems, ordered by the index for
+    the global leaderboard. Coverage is ``attempted_count`` over the number of
+    enabled problems, so it orders the same as ``attempted_count``.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True,
+                                related_name='leaderboard_entry')
+    avg_rank_score = models.FloatField()
+    attempted_count = models.IntegerField()
+    passed_count = models.IntegerField()
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'leaderboard'
+        indexes = [
+            models.Index(fields=['avg_rank_score', 'attempted_count', 'passed_count', 'user'],
+                         name='leaderboard_order_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}: {self.avg_rank_score:.2f}"
+
+
+class SubmissionIdempotencyKey(models.Model):
+    """
+    A claimed submission request key, so a repeated POST gets the original
+    submission back instead of a second judging run. See ``api.idempotency``.
+    ``submission`` is null while the first request is still being judged.
+    """
+    key = models.CharField(max_length=64, primary_key=True)  # sha256 of user and request key
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    # submissions is partitioned, so its rows cannot be referenced by a foreign key.
+    submission = models.ForeignKey(Submission, on_delete=models.SET_NULL, null=True, blank=True,
+                                   db_constraint=False, related_name='+')
+    submitted_at = models.DateTimeField(null=True, blank=True)  # Of the submission, for partition pruning
+    # sha256 of the request payload, so a key reused for another payload is
+    # rejected; empty for keys claimed before it was recorded.
+    fingerprint = models.CharField(max_length=64, default='', blank=True)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'submission_idempotency_keys'
+        indexes = [
+            models.Index(fields=['created_at'], name='idempotency_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.key[:12]} -> {self.submission_id}"
+
+
+class ComplexityBaseline(models.Model):
+    """
+    The reference solution's fitted growth exponent for a problem, language
+    and runtime, measured once per problem version (see ``api.complexity``).
+    """
+    problem = models.ForeignKey(Problem, on_delete=models.CASCADE)
+    language = models.TextField()
+    runtime_version = models.TextField()  # '' when the engine chose the version
+    problem_updated_at = models.DateTimeField()
+    exponent = models.FloatField(null=True, blank=True)  # None: the reference run failed
+    timings = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'complexity_baselines'
+        constraints = [
+            models.UniqueConstraint(fields=['problem', 'language', 'runtime_version'],
+                                    name='complexity_baselines_problem_language_runtime_uniq'),
+        ]
+
+    def __str__(self):
+        exponent = 'failed' if self.exponent is None else f"n^{self.exponent:.2f}"
+        return f"{self.problem_id} {self.language} {self.runtime_version}: {exponent}"
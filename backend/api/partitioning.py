@@ -0,0 +1,272 @@
+"""
+Helpers for Postgres declarative range partitioning by time.
+
+Partitions are named ``<table>_pYYYYMMDD`` (daily) or ``<table>_pYYYYMM``
+(monthly) and cover ``[start, next start)`` in UTC. Rows outside every
+partition land in the table's DEFAULT partition; when a partition is created
+for a range that already has such rows, they are moved into it.
+
+Archives are gzipped CSV in the format of ``COPY ... WITH (FORMAT csv,
+HEADER)``. A partition whose rows point at ``code_blobs`` is archived with the
+decompressed source in an extra ``code`` column, so the archive stays
+readable once the partition is dropped and its blobs are cleaned up.
+"""
+import csv
+import datetime
+import gzip
+import os
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.utils import timezone
+
+from .code_blobs import decompress
+from .models import CodeBlob
+
+INTERVALS = ('day', 'month')
+# Archive column holding the source of a row's code blob.
+ARCHIVE_CODE_COLUMN = 'code'
+
+
+def period_start(moment: datetime.datetime, interval: str) -> datetime.datetime:
+    moment = moment.astimezone(datetime.timezone.utc)
+    if interval == 'day':
+        return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if interval == 'month':
+        return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    raise ValueError(f"interval must be one of {INTERVALS}")
+
+
+def next_period_start(start: datetime.datetime, interval: str) -> datetime.datetime:
+    if interval == 'day':
+        return start + datetime.timedelta(days=1)
+    if start.month == 12:
+        return start.replace(year=start.year + 1, month=1)
+    return start.replace(month=start.month + 1)
+
+
+def partition_name(table: str, start: datetime.datetime, interval: str) -> str:
+    return f"{table}_p{start:%Y%m%d}" if interval == 'day' else f"{table}_p{start:%Y%m}"
+
+
+def _partition_key(cursor, table: str) -> str:
+    cursor.execute(
+        """
+        SELECT attname FROM pg_partitioned_table
+        JOIN pg_attribute ON attrelid = partrelid AND attnum = partattrs[0]
+        WHERE partrelid = %s::regclass
+        """,
+        [table],
+    )
+    return cursor.fetchone()[0]
+
+
+def _default_partition(cursor, table: str) -> Optional[str]:
+    cursor.execute(
+        """
+        SELECT relname FROM pg_partitioned_table
+        JOIN pg_class ON pg_class.oid = partdefid
+        WHERE partrelid = %s::regclass
+        """,
+        [table],
+    )
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def _create_partition(conn, table: str, name: str, start: datetime.datetime,
+                      end: datetime.datetime) -> None:
+    """
+    Create one partition. Postgres refuses to while the DEFAULT partition
+    holds rows in its range, so those are moved in with the DEFAULT partition
+    detached. Runs in a transaction that blocks writes to ``table``.
+    """
+    quote = conn.ops.quote_name
+    with transaction.atomic(using=conn.alias), conn.cursor() as cursor:
+        cursor.execute(f"LOCK TABLE {quote(table)} IN SHARE ROW EXCLUSIVE MODE")
+        cursor.execute("SELECT to_regclass(%s)", [quote(name)])
+        if cursor.fetchone()[0] is not None:
+            return
+        default = _default_partition(cursor, table)
+        stray = False
+        if default is not None:
+            key = quote(_partition_key(cursor, table))
+            in_range = f"{key} >= %s AND {key} < %s"
+            cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {quote(default)} WHERE {in_range})", [start, end])
+            stray = cursor.fetchone()[0]
+        if stray:
+            cursor.execute(f"ALTER TABLE {quote(table)} DETACH PARTITION {quote(default)}")
+        cursor.execute(
+            f"CREATE TABLE {quote(name)} PARTITION OF {quote(table)} FOR VALUES FROM (%s) TO (%s)",
+            [start, end],
+        )
+        if stray:
+            cursor.execute(f"INSERT INTO {quote(name)} SELECT * FROM {quote(default)} WHERE {in_range}",
+                           [start, end])
+            cursor.execute(f"DELETE FROM {quote(default)} WHERE {in_range}", [start, end])
+            print(f"Moved {cursor.rowcount} rows from {default} into {name}", flush=True)
+            cursor.execute(f"ALTER TABLE {quote(table)} ATTACH PARTITION {quote(default)} DEFAULT")
+
+
+def create_partitions(table: str, interval: str, first: datetime.datetime,
+                      last: datetime.datetime, using: str = DEFAULT_DB_ALIAS) -> List[str]:
+    """
+    Create (if missing) every partition from the one containing ``first`` to
+    the one containing ``last``. Returns their names.
+    """
+    conn = connections[using]
+    start, stop = period_start(first, interval), period_start(last, interval)
+    names = []
+    while start <= stop:
+        end = next_period_start(start, interval)
+        name = partition_name(table, start, interval)
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT to_regclass(%s)", [conn.ops.quote_name(name)])
+            exists = cursor.fetchone()[0] is not None
+        if not exists:
+            _create_partition(conn, table, name, start, end)
+        names.append(name)
+        start = end
+    return names
+
+
+def ensure_partitions(table: str, interval: str, ahead: int = 3,
+                      now: Optional[datetime.datetime] = None) -> List[str]:
+    """
+    Create the partition covering ``now`` and the next ``ahead`` ones if they
+    do not exist yet. Returns the names of every partition in that range.
+    """
+    start = period_start(now or timezone.now(), interval)
+    last = start
+    for _ in range(ahead):
+        last = next_period_start(last, interval)
+    return create_partitions(table, interval, start, last)
+
+
+def list_partitions(table: str) -> List[str]:
+    """
+    Names of the partitions currently attached to ``table``, oldest first.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = %s
+            ORDER BY child.relname
+            """,
+            [table],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def partition_range(table: str, name: str) -> Optional[Tuple[datetime.datetime, datetime.datetime]]:
+    """
+    The ``[start, end)`` range of a partition created by this module, or None
+    for partitions it did not name (e.g. the default partition).
+    """
+    suffix = name[len(table) + 2:] if name.startswith(f"{table}_p") else ''
+    for interval, fmt, length in (('day', '%Y%m%d', 8), ('month', '%Y%m', 6)):
+        if len(suffix) == length:
+            try:
+                start = datetime.datetime.strptime(suffix, fmt).replace(tzinfo=datetime.timezone.utc)
+            except ValueError:
+                return None
+            return start, next_period_start(start, interval)
+    return None
+
+
+def _csv_field(value: Optional[str]) -> str:
+    # As COPY writes CSV: NULL is an empty unquoted field, text is always quoted.
+    return '' if value is None else '"' + value.replace('"', '""') + '"'
+
+
+def _write_rows_with_code(out, name: str, code_column: str) -> None:
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT * FROM {quote(name)} LIMIT 0")
+        columns = [column.name for column in cursor.description]
+    out.write(','.join(columns + [ARCHIVE_CODE_COLUMN]) + '\n')
+    # Columns are read as text so the file matches what COPY would write.
+    selected = ', '.join(f"p.{quote(column)}::text" for column in columns)
+    with connection.chunked_cursor() as cursor:
+        cursor.execute(
+            f"SELECT {selected}, b.compression, b.data FROM {quote(name)} p "
+            f"LEFT JOIN {quote(CodeBlob._meta.db_table)} b ON b.sha256 = p.{quote(code_column)}"
+        )
+        for *values, compression, data in cursor:
+            code = decompress(compression, data) if compression is not None else None
+            out.write(','.join(_csv_field(value) for value in (*values, code)) + '\n')
+
+
+def archive_partition(name: str, directory: str, code_column: Optional[str] = None) -> str:
+    """
+    Write a partition's rows to ``<directory>/<name>.csv.gz`` and return the
+    path. With ``code_column`` (a column of code blob hashes) each row also
+    carries its decompressed code. The file is written under a temporary name
+    first, so a crash never leaves a truncated archive behind.
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{name}.csv.gz")
+    tmp_path = f"{path}.tmp"
+    with gzip.open(tmp_path, 'wt', encoding='utf-8', newline='') as out:
+        if code_column is None:
+            with connection.cursor() as cursor:
+                cursor.copy_expert(
+                    f"COPY {connection.ops.quote_name(name)} TO STDOUT WITH (FORMAT csv, HEADER)", out
+                )
+        else:
+            _write_rows_with_code(out, name, code_column)
+    os.replace(tmp_path, path)
+    return path
+
+
+def drop_partition(table: str, name: str) -> None:
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"ALTER TABLE {connection.ops.quote_name(table)} "
+            f"DETACH PARTITION {connection.ops.quote_name(name)}"
+        )
+        cursor.execute(f"DROP TABLE {connection.ops.quote_name(name)}")
+
+
+def iter_archive(path: str) -> Iterator[Dict[str, str]]:
+    """
+    Stream the rows of an archive file as dicts of column name to raw text
+    (empty string for NULL).
+    """
+    with gzip.open(path, 'rt', encoding='utf-8', newline='') as f:
+        yield from csv.DictReader(f)
+
+
+def restore_archive(table: str, interval: str, path: str) -> str:
+    """
+    Re-create the partition an archive came from and load its rows back,
+    re-creating the code blobs of an archive with a ``code`` column.
+    """
+    name = os.path.basename(path)[:-len('.csv.gz')]
+    bounds = partition_range(table, name)
+    if bounds is None:
+        raise ValueError(f"{path} is not an archive of a {table} partition")
+    create_partitions(table, interval, bounds[0], bounds[0])
+    quote = connection.ops.quote_name
+    with gzip.open(path, 'rt', encoding='utf-8', newline='') as f, \
+            transaction.atomic(), connection.cursor() as cursor:
+        header = f.readline().strip()
+        columns = header.split(',')
+        if columns[-1] != ARCHIVE_CODE_COLUMN:
+            cursor.copy_expert(f"COPY {quote(name)} ({header}) FROM STDIN WITH (FORMAT csv)", f)
+            return name
+        cursor.execute(f"CREATE TEMP TABLE archive_restore (LIKE {quote(name)}, "
+                       f"{ARCHIVE_CODE_COLUMN} text) ON COMMIT DROP")
+        cursor.copy_expert(f"COPY archive_restore ({header}) FROM STDIN WITH (FORMAT csv)", f)
+        # The blobs may have been deleted once the partition was dropped.
+        cursor.execute(f"SELECT DISTINCT {ARCHIVE_CODE_COLUMN} FROM archive_restore "
+                       f"WHERE {ARCHIVE_CODE_COLUMN} IS NOT NULL")
+        for (code,) in cursor.fetchall():
+            CodeBlob.objects.store(code)
+        kept = ', '.join(columns[:-1])
+        cursor.execute(f"INSERT INTO {quote(name)} ({kept}) SELECT {kept} FROM archive_restore")
+    return name
@@ -0,0 +1,203 @@
+"""
+Per-process LRU cache of problem snapshots.
+
+Submissions, problem detail views and the scorecard keep loading the same
+problems, each time pulling every JSONB column. This cache keeps immutable
+snapshots keyed by id and slug. Every lookup first reads the single-row
+catalogue version, and the whole cache is dropped when it has moved. The
+version is bumped right after a problem save, delete or bulk import commits,
+never before and not at all if it rolls back, so no reader can cache the old
+row under the new version. A worker may only serve the previous snapshot in
+the moment between that commit and the bump. The version and the rows
+cached under it are always read from the primary, even in views that route
+reads to a replica, so a lagging replica can neither move the version back
+nor fill the cache with rows older than it.
+"""
+import copy
+import datetime
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .metrics import Counter, Gauge
+from .models import CatalogueVersion, Problem
+
+CATALOGUE_VERSION_ID = 1
+
+
+def current_catalogue_version() -> int:
+    return (CatalogueVersion.objects.using(DEFAULT_DB_ALIAS)
+            .values_list('version', flat=True).get(pk=CATALOGUE_VERSION_ID))
+
+
+def _increment_catalogue_version() -> None:
+    CatalogueVersion.objects.filter(pk=CATALOGUE_VERSION_ID).update(version=F('version') + 1)
+
+
+def bump_catalogue_version() -> None:
+    """
+    Invalidate every process's problem cache once the current transaction
+    commits (immediately outside one). Call after changing problems without
+    ``save()``/``delete()`` (bulk operations, ``QuerySet.update``).
+    """
+    transaction.on_commit(_increment_catalogue_version)
+
+
+@receiver(post_save, sender=Problem)
+@receiver(post_delete, sender=Problem)
+def _problem_changed(sender, **kwargs):
+    bump_catalogue_version()
+
+
+@dataclass(frozen=True)
+class ProblemSnapshot:
+    """
+    Read-only copy of one problem row. Use ``to_instance()`` to get a
+    ``Problem`` that can be serialized or modified without touching the cache.
+    """
+    id: int
+    slug: str
+    title: str
+    enabled: bool
+    updated_at: datetime.datetime
+    fields: Mapping[str, Any]
+
+    @classmethod
+    def from_instance(cls, problem: Problem) -> 'ProblemSnapshot':
+        fields = {f.attname: copy.deepcopy(getattr(problem, f.attname)) for f in Problem._meta.concrete_fields}
+        return cls(id=problem.id, slug=problem.slug, title=problem.title, enabled=problem.enabled,
+                   updated_at=problem.updated_at, fields=MappingProxyType(fields))
+
+    def to_instance(self) -> Problem:
+        names = list(self.fields)
+        return Problem.from_db(DEFAULT_DB_ALIAS, names, [copy.deepcopy(self.fields[n]) for n in names])
+
+
+class ProblemCache:
+    """
+    Size-bounded LRU of ``ProblemSnapshot``s plus the list of enabled
+    problems, all valid for one catalogue version.
+    """
+    def __init__(self, max_entries: int = 256, version_source: Callable[[], int] = current_catalogue_version):
+        self.max_entries = max_entries
+        self._version_source = version_source
+        self._version: Optional[int] = None
+        self._entries: 'OrderedDict[int, ProblemSnapshot]' = OrderedDict()
+        self._slugs: Dict[str, int] = {}
+        self._enabled: Optional[Tuple[ProblemSnapshot, ...]] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def _sync(self) -> int:
+        version = self._version_source()
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._slugs.clear()
+                self._enabled = None
+                self._version = version
+        return version
+
+    def _record(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        problem_cache_requests_total.inc(result='hit' if hit else 'miss')
+
+    def _store(self, version: int, snapshot: ProblemSnapshot) -> None:
+        # Caller holds the lock. Results loaded under an older version are dropped.
+        if version != self._version:
+            return
+        self._entries[snapshot.id] = snapshot
+        self._entries.move_to_end(snapshot.id)
+        self._slugs[snapshot.slug] = snapshot.id
+        while len(self._entries) > self.max_entries:
+            _, evicted = self._entries.popitem(last=False)
+            self._slugs.pop(evicted.slug, None)
+
+    def get(self, pk: Optional[int] = None, slug: Optional[str] = None) -> Optional[ProblemSnapshot]:
+        """
+        The snapshot of the problem with this id or slug, or None if there is none.
+        """
+        version = self._sync()
+        with self._lock:
+            key = pk if pk is not None else self._slugs.get(slug)
+            snapshot = self._entries.get(key)
+            if snapshot is not None:
+                self._entries.move_to_end(key)
+        self._record(snapshot is not None)
+        if snapshot is not None:
+            return snapshot
+
+        lookup = {'pk': pk} if pk is not None else {'slug': slug}
+        problem = Problem.objects.using(DEFAULT_DB_ALIAS).filter(**lookup).first()
+        if problem is None:
+            return None
+        snapshot = ProblemSnapshot.from_instance(problem)
+        with self._lock:
+            self._store(version, snapshot)
+        return snapshot
+
+    def enabled_problems(self) -> Tuple[ProblemSnapshot, ...]:
+        """
+        Snapshots of every enabled problem, ordered by id.
+        """
+        version = self._sync()
+        with self._lock:
+            enabled = self._enabled
+        self._record(enabled is not None)
+        if enabled is not None:
+            return enabled
+
+        problems = Problem.objects.using(DEFAULT_DB_ALIAS).filter(enabled=True).order_by('id')
+        enabled = tuple(ProblemSnapshot.from_instance(p) for p in problems)
+        with self._lock:
+            if version == self._version:
+                self._enabled = enabled
+                for snapshot in enabled[-self.max_entries:]:
+                    self._store(version, snapshot)
+        return enabled
+
+
+_cache: Optional[ProblemCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_problem_cache() -> ProblemCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ProblemCache(max_entries=getattr(settings, 'PROBLEM_CACHE_MAX_ENTRIES', 256))
+    return _cache
+
+
+problem_cache_requests_total = Counter(
+    'problem_cache_requests_total',
+    'Problem cache lookups by result (hit or miss).',
+    ('result',),
+)
+Gauge(
+    'problem_cache_entries',
+    'Problem snapshots cached, summed over workers.',
+    function=lambda: len(get_problem_cache()),
+)
@@ -0,0 +1,186 @@
+"""
+Streaming NDJSON import/export of problems.
+
+One problem per line, keyed by ``slug``. Export walks the table through a
+server-side cursor and import upserts in fixed-size batches, so memory use
+does not grow with the size of the catalogue. Each imported line is checked
+field by field first, and a batch the database still rejects is retried line
+by line, so a bad line is reported with its number instead of failing its
+whole batch. Used by the ``export_problems``
+and ``import_problems`` management commands and the staff endpoints on
+``ProblemViewSet``.
+"""
+import json
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+
+from .models import Problem
+from .problem_cache import bump_catalogue_version
+from .ranking import schedule_leaderboard_refresh, schedule_rerank
+from .statements import refresh_statement
+
+PROBLEM_EXPORT_FIELDS = [
+    'slug', 'title', 'description_md', 'tags', 'difficulty', 'enabled',
+    'time_thresholds', 'solution_templates', 'reference_solutions', 'harness_eval_files',
+    'complexity_sizes',
+]
+REQUIRED_FIELDS = ['slug', 'title', 'description_md', 'time_thresholds',
+                   'solution_templates', 'reference_solutions']
+UPDATE_FIELDS = [f for f in PROBLEM_EXPORT_FIELDS if f != 'slug'] + [
+    'description_html', 'description_hash', 'updated_at']
+
+MAX_REPORTED_ERRORS = 100
+
+
+def iter_problems_ndjson(queryset=None, chunk_size: int = 500) -> Iterator[str]:
+    """
+    Yield one NDJSON line per problem.
+    """
+    if queryset is None:
+        queryset = Problem.objects.all()
+    rows = queryset.order_by('id').values(*PROBLEM_EXPORT_FIELDS).iterator(chunk_size=chunk_size)
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + "\n"
+
+
+def _is_str_list(value: Any) -> bool:
+    return isinstance(value, list) and all(isinstance(v, str) for v in value)
+
+
+def _is_str_map(value: Any) -> bool:
+    return isinstance(value, dict) and all(isinstance(v, str) for v in value.values())
+
+
+def _is_threshold(value: Any) -> bool:
+    if not isinstance(value, dict) or not isinstance(value.get('rank'), str):
+        return False
+    max_minutes = value.get('max_minutes')
+    return max_minutes is None or (isinstance(max_minutes, (int, float)) and not isinstance(max_minutes, bool))
+
+
+def _is_size(value: Any) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool) and value > 0
+
+
+# Field -> (check, description); absent and null optional fields get defaults.
+FIELD_CHECKS = {
+    'slug': (lambda v: isinstance(v, str), "a string"),
+    'title': (lambda v: isinstance(v, str), "a string"),
+    'description_md': (lambda v: isinstance(v, str), "a string"),
+    'tags': (_is_str_list, "a list of strings"),
+    'difficulty': (lambda v: isinstance(v, str), "a string"),
+    'enabled': (lambda v: isinstance(v, bool), "true or false"),
+    'time_thresholds': (lambda v: isinstance(v, list) and all(_is_threshold(t) for t in v),
+                        'a list of {"rank": str, "max_minutes": number} objects'),
+    'solution_templates': (_is_str_map, "an object mapping languages to code"),
+    'reference_solutions': (_is_str_map, "an object mapping languages to code"),
+    'harness_eval_files': (lambda v: isinstance(v, list) and all(isinstance(f, dict) for f in v),
+                           "a list of file objects"),
+    'complexity_sizes': (lambda v: isinstance(v, list) and all(_is_size(n) for n in v),
+                         "a list of positive integers"),
+}
+
+
+def _parse_line(line: Any) -> Dict[str, Any]:
+    if isinstance(line, bytes):
+        line = line.decode('utf-8')
+    record = json.loads(line)
+    if not isinstance(record, dict):
+        raise ValueError("expected a JSON object")
+    missing = [f for f in REQUIRED_FIELDS if record.get(f) in (None, '')]
+    if missing:
+        raise ValueError(f"missing required fields: {', '.join(missing)}")
+    unknown = set(record) - set(PROBLEM_EXPORT_FIELDS)
+    if unknown:
+        raise ValueError(f"unknown fields: {', '.join(sorted(unknown))}")
+    invalid = [f"{field} must be {expected}" for field, (check, expected) in FIELD_CHECKS.items()
+               if record.get(field) is not None and not check(record[field])]
+    if invalid:
+        raise ValueError("; ".join(invalid))
+    return {field: value for field, value in record.items() if value is not None}
+
+
+def _upsert_batch(records: List[Dict[str, Any]]) -> Dict[str, int]:
+    # Later lines win if a slug appears twice in one batch.
+    by_slug = {r['slug']: r for r in records}
+    now = timezone.now()
+    with transaction.atomic():
+        existing = {slug: (pk, thresholds, enabled) for slug, pk, thresholds, enabled in
+                    Problem.objects.filter(slug__in=by_slug).values_list('slug', 'id', 'time_thresholds', 'enabled')}
+        to_create, to_update = [], []
+        for slug, record in by_slug.items():
+            fields = {
+                'tags': [],
+                'enabled': False,
+                'difficulty': None,
+                'harness_eval_files': None,
+                'complexity_sizes': None,
+                **record,
+            }
+            problem = Problem(**fields)
+            # bulk_create/bulk_update skip save(), which renders the statement.
+            refresh_statement(problem)
+            if slug in existing:
+                pk, thresholds, enabled = existing[slug]
+                problem.id, problem.updated_at = pk, now
+                to_update.append(problem)
+                if fields['time_thresholds'] != thresholds:
+                    schedule_rerank(pk)
+                if fields['enabled'] != enabled:
+                    schedule_leaderboard_refresh(pk)
+            else:
+                to_create.append(problem)
+        Problem.objects.bulk_create(to_create)
+        Problem.objects.bulk_update(to_update, UPDATE_FIELDS)
+        # Bulk writes send no signals.
+        bump_catalogue_version()
+    return {'created': len(to_create), 'updated': len(to_update)}
+
+
+def import_problems_ndjson(lines: Iterable[Any], batch_size: int = 500) -> Dict[str, Any]:
+    """
+    Upsert problems by slug from an iterable of NDJSON lines (str or bytes).
+
+    Invalid lines are skipped and reported with their 1-based line number;
+    valid lines are committed batch by batch.
+    """
+    summary: Dict[str, Any] = {'created': 0, 'updated': 0, 'error_count': 0, 'errors': []}
+    batch: List[Tuple[int, Dict[str, Any]]] = []
+
+    def report(line_number: int, error: str):
+        summary['error_count'] += 1
+        if len(summary['errors']) < MAX_REPORTED_ERRORS:
+            summary['errors'].append({'line': line_number, 'error': error})
+
+    def upsert(records: List[Dict[str, Any]]):
+        counts = _upsert_batch(records)
+        summary['created'] += counts['created']
+        summary['updated'] += counts['updated']
+
+    def flush():
+        try:
+            upsert([record for _, record in batch])
+        except DatabaseError:
+            # Find the lines the database rejects; the rest still go in.
+            for line_number, record in batch:
+                try:
+                    upsert([record])
+                except DatabaseError as e:
+                    report(line_number, str(e).strip())
+        batch.clear()
+
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            batch.append((line_number, _parse_line(line)))
+        except ValueError as e:  # json.JSONDecodeError and UnicodeDecodeError are ValueErrors
+            report(line_number, str(e))
+            continue
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    return summary
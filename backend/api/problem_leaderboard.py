@@ -0,0 +1,132 @@
+"""
+Per-problem fastest-solve leaderboards.
+
+Each user's best passed ``duration_ms`` on a problem comes from one
+``DISTINCT ON (user_id)`` query walking ``submissions_fastest_passed_idx``
+(migration 0009) in (user, duration, submitted_at) order. The top
+``PROBLEM_LEADERBOARD_SIZE`` rows of each (problem, language, window) are
+cached. A problem's cached boards are dropped only when a new passed
+submission is at least as fast as the slowest cached entry, i.e. could enter
+some top N. Every worker must see that, so boards are only cached in a
+shared cache (``CACHE_URL``); with a per-process one they are queried on
+each request. ``PROBLEM_LEADERBOARD_CACHE_TTL`` ages out rows leaving a
+time window.
+"""
+import datetime
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.utils import timezone
+
+from .models import Submission
+from .shared_cache import cache_is_shared
+
+WINDOWS = {
+    'day': datetime.timedelta(days=1),
+    'week': datetime.timedelta(days=7),
+    'month': datetime.timedelta(days=30),
+    'all': None,
+}
+FIELDS = ('user_id', 'username', 'duration_ms', 'language', 'rank', 'submitted_at')
+
+
+class LeaderboardQueryError(ValueError):
+    pass
+
+
+def board_size() -> int:
+    return getattr(settings, 'PROBLEM_LEADERBOARD_SIZE', 100)
+
+
+def _generation_key(problem_id: int) -> str:
+    return f"problem-leaderboard-gen:{problem_id}"
+
+
+def _cutoff_key(problem_id: int) -> str:
+    return f"problem-leaderboard-cutoff:{problem_id}"
+
+
+def fastest_solves(problem_id: int, language: Optional[str], window: str, limit: int) -> List[Dict[str, Any]]:
+    """
+    Best passed solve per user, fastest first (earlier submission wins ties).
+    """
+    where, params = ["s.problem_id = %s", "s.passed", "s.user_id IS NOT NULL"], [problem_id]
+    if language:
+        where.append("s.language = %s")
+        params.append(language)
+    if WINDOWS[window] is not None:
+        # Also lets Postgres prune old partitions.
+        where.append("s.submitted_at >= %s")
+        params.append(timezone.now() - WINDOWS[window])
+    params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT best.user_id, u.username, best.duration_ms, best.language, best.rank, best.submitted_at
+            FROM (
+                SELECT DISTINCT ON (s.user_id)
+                       s.user_id, s.duration_ms, s.language, s.rank, s.submitted_at
+                FROM {Submission._meta.db_table} AS s
+                WHERE {' AND '.join(where)}
+                ORDER BY s.user_id, s.duration_ms, s.submitted_at
+            ) AS best
+            JOIN {User._meta.db_table} AS u ON u.id = best.user_id
+            ORDER BY best.duration_ms, best.submitted_at
+            LIMIT %s
+            """,
+            params,
+        )
+        return [dict(zip(FIELDS, row)) for row in cursor.fetchall()]
+
+
+def _ranked_solves(problem_id: int, language: Optional[str], window: str, limit: int) -> List[Dict[str, Any]]:
+    rows = fastest_solves(problem_id, language, window, limit)
+    for position, row in enumerate(rows, start=1):
+        row['position'] = position
+    return rows
+
+
+def get_leaderboard(problem_id: int, language: Optional[str] = None, window: str = 'all',
+                    limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    The cached top of a problem's board, with 1-based positions.
+    Raises LeaderboardQueryError for an unknown window.
+    """
+    if window not in WINDOWS:
+        raise LeaderboardQueryError(f"window must be one of: {', '.join(WINDOWS)}")
+    size = board_size()
+    if not cache_is_shared():
+        return _ranked_solves(problem_id, language, window, min(limit, size) if limit else size)
+    generation = cache.get_or_set(_generation_key(problem_id), 0, None)
+    key = f"problem-leaderboard:{problem_id}:{generation}:{window}:{language or ''}"
+    rows = cache.get(key)
+    if rows is None:
+        rows = _ranked_solves(problem_id, language, window, size)
+        ttl = getattr(settings, 'PROBLEM_LEADERBOARD_CACHE_TTL', 60)
+        cache.set(key, rows, ttl)
+        # A board with room left is entered by any new solve.
+        cutoff = rows[-1]['duration_ms'] if len(rows) >= size else float('inf')
+        cache.set(_cutoff_key(problem_id), max(cutoff, cache.get(_cutoff_key(problem_id), -1)), ttl)
+    return rows[:limit] if limit else rows
+
+
+def note_submission(submission: Submission) -> None:
+    """
+    Drop a problem's cached boards if this submission could enter one.
+    """
+    if not submission.passed or submission.user_id is None or submission.duration_ms is None:
+        return
+    if not cache_is_shared():
+        return
+    cutoff = cache.get(_cutoff_key(submission.problem_id))
+    if cutoff is None or submission.duration_ms > cutoff:
+        return
+    cache.delete(_cutoff_key(submission.problem_id))
+    try:
+        cache.incr(_generation_key(submission.problem_id))
+    except ValueError:
+        # The generation expired, and with it every board keyed on it.
+        pass
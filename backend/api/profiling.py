@@ -0,0 +1,216 @@
+"""
+On-demand request profiling.
+
+A staff user adds ``?profile=1`` or an ``X-Profile: 1`` header to any request;
+it then runs under ``cProfile`` with every SQL query recorded (with its
+duration and the application frame that issued it). The report is saved
+under ``PROFILE_DIR`` and the response carries ``X-Profile-Id`` pointing at
+``/api/profiles/<id>/``. ``PROFILE_SAMPLE_RATE`` additionally profiles that
+fraction of all requests and keeps the ones slower than ``PROFILE_SLOW_MS``.
+
+Only the request thread is profiled. Work the request hands to the judging
+executors (hedged engine calls in ``api.hedging``, sharded test runs in
+``api.code_runner_service``) runs on pool threads: it shows up in the report
+only as time the request thread spent waiting, and its queries are not
+recorded. Every report says so in its ``scope`` field.
+"""
+import contextlib
+import cProfile
+import json
+import os
+import pstats
+import random
+import re
+import sys
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+
+from .authentication import CachedJWTAuthentication
+
+PROFILE_ID_RE = re.compile(r'^[0-9]{8}T[0-9]{6}-[0-9a-f]{8}$')
+TOP_FUNCTIONS = 40
+PROFILE_SCOPE = ("request thread only: work on the judging executor threads (hedged engine calls, "
+                 "sharded test runs) appears as waiting time, and their SQL is not recorded")
+_THIS_FILE = os.path.abspath(__file__)
+
+
+def profile_dir() -> str:
+    return getattr(settings, 'PROFILE_DIR', os.path.join(settings.BASE_DIR, 'profiles'))
+
+
+def artifact_path(profile_id: str, extension: str) -> Optional[str]:
+    """
+    Path of a stored report (``json``) or raw profile (``prof``), or None if
+    the id is malformed.
+    """
+    if not PROFILE_ID_RE.match(profile_id):
+        return None
+    return os.path.join(profile_dir(), f"{profile_id}.{extension}")
+
+
+def _application_frame() -> str:
+    """
+    The innermost caller inside this project, e.g. ``api/views.py:452 in get``.
+    """
+    base_dir = str(settings.BASE_DIR)
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = os.path.abspath(frame.f_code.co_filename)
+        if filename.startswith(base_dir) and filename != _THIS_FILE and 'site-packages' not in filename:
+            return f"{os.path.relpath(filename, base_dir)}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return ''
+
+
+class SqlRecorder:
+    """
+    ``execute_wrapper`` hook keeping every query with its timing and caller.
+    """
+    def __init__(self):
+        self.queries: List[Dict[str, Any]] = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'sql': sql,
+                'duration_ms': round((time.perf_counter() - started) * 1000, 3),
+                'many': many,
+                'caller': _application_frame(),
+            })
+
+
+def _top_functions(profiler: cProfile.Profile) -> List[Dict[str, Any]]:
+    stats = pstats.Stats(profiler).stats
+    rows = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:TOP_FUNCTIONS]
+    return [
+        {
+            'function': f"{filename}:{line}({name})",
+            'calls': calls,
+            'own_ms': round(own * 1000, 3),
+            'cumulative_ms': round(cumulative * 1000, 3),
+        }
+        for (filename, line, name), (_, calls, own, cumulative, _) in rows
+    ]
+
+
+def save_profile(request, response, profiler: cProfile.Profile, sql: SqlRecorder,
+                 duration_ms: float, sampled: bool) -> str:
+    """
+    Write the report (JSON) and the raw ``pstats`` dump; returns the profile id.
+    """
+    directory = profile_dir()
+    os.makedirs(directory, exist_ok=True)
+    profile_id = f"{timezone.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+    report = {
+        'id': profile_id,
+        'method': request.method,
+        'path': request.path,
+        'query_string': request.META.get('QUERY_STRING', ''),
+        'status': response.status_code,
+        'created_at': timezone.now().isoformat(),
+        'duration_ms': round(duration_ms, 3),
+        'sampled': sampled,
+        'scope': PROFILE_SCOPE,
+        'sql': {
+            'count': len(sql.queries),
+            'total_ms': round(sum(q['duration_ms'] for q in sql.queries), 3),
+            'queries': sql.queries,
+        },
+        'top_functions': _top_functions(profiler),
+    }
+    profiler.dump_stats(artifact_path(profile_id, 'prof'))
+    with open(artifact_path(profile_id, 'json'), 'w') as f:
+        json.dump(report, f, indent=1)
+    _prune(directory, getattr(settings, 'PROFILE_MAX_ARTIFACTS', 200))
+    return profile_id
+
+
+def _prune(directory: str, keep: int) -> None:
+    reports = sorted(name for name in os.listdir(directory) if name.endswith('.json'))
+    for name in reports[:-keep] if keep else reports:
+        for extension in ('json', 'prof'):
+            try:
+                os.remove(os.path.join(directory, f"{name[:-len('.json')]}.{extension}"))
+            except FileNotFoundError:
+                pass
+
+
+def list_profiles() -> List[Dict[str, Any]]:
+    """
+    Summaries of stored reports, newest first.
+    """
+    directory = profile_dir()
+    if not os.path.isdir(directory):
+        return []
+    summaries = []
+    for name in sorted((n for n in os.listdir(directory) if n.endswith('.json')), reverse=True):
+        try:
+            with open(os.path.join(directory, name)) as f:
+                report = json.load(f)
+        except (OSError, ValueError):
+            continue
+        summaries.append({key: report.get(key) for key in
+                          ('id', 'method', 'path', 'status', 'created_at', 'duration_ms', 'sampled')})
+        summaries[-1]['sql_count'] = report.get('sql', {}).get('count')
+    return summaries
+
+
+def _requested_by_staff(request) -> bool:
+    if request.GET.get('profile') != '1' and request.META.get('HTTP_X_PROFILE') != '1':
+        return False
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return user.is_staff
+    # API clients authenticate with JWTs, which DRF only checks inside the view.
+    try:
+        authenticated = CachedJWTAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return False
+    return authenticated is not None and authenticated[0].is_staff
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        requested = _requested_by_staff(request)
+        sampled = not requested and random.random() < getattr(settings, 'PROFILE_SAMPLE_RATE', 0.0)
+        if not (requested or sampled):
+            return self.get_response(request)
+
+        profiler = cProfile.Profile()
+        sql = SqlRecorder()
+        started = time.perf_counter()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is active on this thread.
+            return self.get_response(request)
+        try:
+            with contextlib.ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(sql))
+                response = self.get_response(request)
+        finally:
+            profiler.disable()
+        duration_ms = (time.perf_counter() - started) * 1000
+
+        if sampled and duration_ms < getattr(settings, 'PROFILE_SLOW_MS', 1000):
+            return response
+        profile_id = save_profile(request, response, profiler, sql, duration_ms, sampled)
+        if requested:
+            response['X-Profile-Id'] = profile_id
+        else:
+            print(f"Profiled slow request {request.method} {request.path} "
+                  f"({duration_ms:.0f} ms): {profile_id}", flush=True)
+        return response
@@ -0,0 +1,203 @@
+"""
+Submission ranks from a problem's ``time_thresholds``.
+
+Thresholds look like ``[{"max_minutes": 3, "rank": "Wizard"}, ...]``: a passed
+submission gets the rank of the tightest threshold its duration fits in, and
+everything else gets ``DEFAULT_RANK``. ``RankTable`` compiles them once per
+problem version for bisect lookups on the submission path. When staff change
+a problem's thresholds, ``schedule_rerank`` rewrites the stored ranks of its
+passed submissions in the background, chunk by chunk, with one set-based
+``UPDATE ... CASE`` per chunk. Enabling or disabling a problem likewise
+refreshes, in the background, the leaderboard rows of its solvers.
+"""
+import bisect
+import copy
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from django.db import close_old_connections, connection, transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .leaderboard import refresh_problem, refresh_problem_users
+from .models import Problem, Submission
+
+DEFAULT_RANK = "VP of Engineering"
+MS_PER_MINUTE = 60 * 1000
+RERANK_CHUNK_SIZE = 5000
+# First key of the pg_advisory_lock(int, int) pair serializing re-ranks of a problem.
+RERANK_LOCK_NAMESPACE = 4101
+
+
+class RankTable:
+    """
+    ``time_thresholds`` compiled into ascending duration bounds (ms) and the
+    rank for each bound.
+    """
+    def __init__(self, bounds_ms: Sequence[float], ranks: Sequence[str]):
+        self.bounds_ms = list(bounds_ms)
+        self.ranks = list(ranks)
+
+    @classmethod
+    def compile(cls, thresholds: Optional[List[Dict[str, Any]]]) -> 'RankTable':
+        # sorted() is stable, so the first of several equal bounds wins, as before.
+        ordered = sorted(thresholds or [], key=lambda t: t.get('max_minutes', float('inf')))
+        return cls(
+            [t.get('max_minutes', float('inf')) * MS_PER_MINUTE for t in ordered],
+            [t.get('rank', DEFAULT_RANK) for t in ordered],
+        )
+
+    def rank_for(self, passed: bool, duration_ms: Optional[int]) -> str:
+        if not passed or duration_ms is None:
+            return DEFAULT_RANK
+        index = bisect.bisect_left(self.bounds_ms, duration_ms)
+        return self.ranks[index] if index < len(self.ranks) else DEFAULT_RANK
+
+    def case_sql(self, column: str = 'duration_ms') -> Tuple[str, List[Any]]:
+        """
+        A SQL ``CASE`` expression computing the rank of a passed submission
+        from ``column``, with its parameters.
+        """
+        whens, params = [], []
+        for bound, rank in zip(self.bounds_ms, self.ranks):
+            if bound == float('inf'):
+                whens.append(f"WHEN {column} IS NOT NULL THEN %s")
+                params.append(rank)
+                break
+            whens.append(f"WHEN {column} <= %s THEN %s")
+            params.extend([bound, rank])
+        return f"CASE {' '.join(whens)} ELSE %s END", params + [DEFAULT_RANK]
+
+
+_tables: 'OrderedDict[Tuple[int, Any], RankTable]' = OrderedDict()
+_tables_lock = threading.Lock()
+MAX_CACHED_TABLES = 1024
+
+
+def rank_table(problem: Problem) -> RankTable:
+    """
+    The compiled table for this version (id, updated_at) of ``problem``.
+    """
+    key = (problem.id, problem.updated_at)
+    with _tables_lock:
+        table = _tables.get(key)
+        if table is not None:
+            _tables.move_to_end(key)
+            return table
+    table = RankTable.compile(problem.time_thresholds)
+    with _tables_lock:
+        _tables[key] = table
+        while len(_tables) > MAX_CACHED_TABLES:
+            _tables.popitem(last=False)
+    return table
+
+
+def rerank_problem(problem_id: int, chunk_size: int = RERANK_CHUNK_SIZE) -> int:
+    """
+    Recompute the rank of every passed submission of a problem from its
+    current thresholds. Each chunk commits on its own so row locks are short.
+    Returns the number of submissions whose rank changed.
+    """
+    with connection.cursor() as cursor:
+        # Serialize with other re-ranks of this problem, here or in another
+        # worker; whichever runs last reads the latest thresholds.
+        cursor.execute("SELECT pg_advisory_lock(%s, %s)", [RERANK_LOCK_NAMESPACE, problem_id])
+        try:
+            thresholds = Problem.objects.values_list('time_thresholds', flat=True).get(pk=problem_id)
+            case, case_params = RankTable.compile(thresholds).case_sql('s.duration_ms')
+            table = Submission._meta.db_table
+            passed = Submission.objects.filter(problem_id=problem_id, passed=True).order_by('id')
+            changed, last_id = 0, 0
+            while True:
+                with transaction.atomic():
+                    ids = list(passed.filter(id__gt=last_id).values_list('id', flat=True)[:chunk_size])
+                    if not ids:
+                        break
+                    cursor.execute(
+                        f"""
+                        UPDATE {table} AS t SET rank = new.rank
+                        FROM (
+                            SELECT s.id, s.submitted_at, {case} AS rank
+                            FROM {table} AS s
+                            WHERE s.id = ANY(%s) AND s.problem_id = %s AND s.passed
+                        ) AS new
+                        WHERE t.id = new.id AND t.submitted_at = new.submitted_at
+                          AND t.rank IS DISTINCT FROM new.rank
+                        """,
+                        case_params + [ids, problem_id],
+                    )
+                    changed += cursor.rowcount
+                last_id = ids[-1]
+            if changed:
+                # Per-problem bests (and so the leaderboard) follow the ranks.
+                refresh_problem(problem_id)
+        finally:
+            cursor.execute("SELECT pg_advisory_unlock(%s, %s)", [RERANK_LOCK_NAMESPACE, problem_id])
+    return changed
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _rerank_in_background(problem_id: int) -> None:
+    try:
+        changed = rerank_problem(problem_id)
+        print(f"Re-ranked problem {problem_id}: {changed} submission(s) changed", flush=True)
+    except Exception as e:
+        print(f"Re-ranking problem {problem_id} failed: {e}", flush=True)
+    finally:
+        close_old_connections()
+
+
+def _refresh_leaderboard_in_background(problem_id: int) -> None:
+    try:
+        refresh_problem_users(problem_id)
+    except Exception as e:
+        print(f"Refreshing the leaderboard for problem {problem_id} failed: {e}", flush=True)
+    finally:
+        close_old_connections()
+
+
+def _run_after_commit(job, problem_id: int) -> None:
+    # Jobs in one process run one at a time, in order.
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='rerank')
+        executor = _executor
+    transaction.on_commit(lambda: executor.submit(job, problem_id))
+
+
+def schedule_rerank(problem_id: int) -> None:
+    """
+    Re-rank a problem's submissions on a background thread once the current
+    transaction commits.
+    """
+    _run_after_commit(_rerank_in_background, problem_id)
+
+
+def schedule_leaderboard_refresh(problem_id: int) -> None:
+    """
+    Recompute the leaderboard rows of a problem's solvers on a background
+    thread once the current transaction commits.
+    """
+    _run_after_commit(_refresh_leaderboard_in_background, problem_id)
+
+
+@receiver(post_save, sender=Problem)
+def _problem_saved(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        # Nobody has submitted to it yet.
+        return
+    if ((update_fields is None or 'enabled' in update_fields)
+            and instance.enabled != instance.loaded_enabled):
+        instance.loaded_enabled = instance.enabled
+        schedule_leaderboard_refresh(instance.id)
+    if ((update_fields is None or 'time_thresholds' in update_fields)
+            and instance.time_thresholds != instance.loaded_time_thresholds):
+        # Re-ranking refreshes the leaderboard itself if any rank changed.
+        instance.loaded_time_thresholds = copy.deepcopy(instance.time_thresholds)
+        schedule_rerank(instance.id)
@@ -0,0 +1,109 @@
+"""
+Token-bucket admission control for submission creation.
+
+Bucket state lives in the ``rate_limit_buckets`` table so limits hold across
+all gunicorn workers. Refilling and consuming a token is a single
+``INSERT ... ON CONFLICT DO UPDATE`` statement, so concurrent requests for the
+same bucket serialize on the row lock and can never overdraw it.
+"""
+from typing import Optional, Tuple
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DatabaseError, connection, transaction
+from rest_framework.throttling import BaseThrottle
+
+from .models import RateLimitBucket
+
+# Default limits: a burst of ``capacity`` submissions, refilled at
+# ``refill_per_second``. A value of None disables that bucket.
+DEFAULT_SUBMISSION_RATE_LIMITS = {
+    'regular': {'capacity': 10, 'refill_per_second': 0.2},
+    'staff': {'capacity': 60, 'refill_per_second': 2.0},
+    'global': {'capacity': 200, 'refill_per_second': 20.0},
+}
+
+_REFILLED = (
+    f"LEAST(%(capacity)s, {RateLimitBucket._meta.db_table}.tokens"
+    f" + EXTRACT(EPOCH FROM (clock_timestamp() - {RateLimitBucket._meta.db_table}.updated_at))"
+    f" * %(rate)s)"
+)
+
+_CONSUME_SQL = f"""
+    INSERT INTO {RateLimitBucket._meta.db_table} (key, tokens, allowed, updated_at)
+    VALUES (%(key)s, %(capacity)s - 1, TRUE, clock_timestamp())
+    ON CONFLICT (key) DO UPDATE SET
+        tokens = CASE WHEN {_REFILLED} >= 1 THEN {_REFILLED} - 1 ELSE {_REFILLED} END,
+        allowed = {_REFILLED} >= 1,
+        updated_at = clock_timestamp()
+    RETURNING tokens, allowed
+"""
+
+
+def consume(key: str, capacity: float, refill_per_second: float) -> Tuple[bool, float]:
+    """
+    Take one token from the bucket ``key``.
+
+    Returns ``(allowed, retry_after_seconds)``; ``retry_after_seconds`` is 0
+    when the request is allowed.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(_CONSUME_SQL, {'key': key, 'capacity': capacity, 'rate': refill_per_second})
+        tokens, allowed = cursor.fetchone()
+    if allowed:
+        return True, 0.0
+    return False, (1 - tokens) / refill_per_second
+
+
+def get_submission_limits() -> dict:
+    """
+    The configured limits; raises ImproperlyConfigured for a bucket that
+    could never refill (its Retry-After would be infinite).
+    """
+    limits = dict(DEFAULT_SUBMISSION_RATE_LIMITS)
+    limits.update(getattr(settings, 'SUBMISSION_RATE_LIMITS', {}))
+    for name, limit in limits.items():
+        if limit is not None and not (limit['capacity'] >= 1 and limit['refill_per_second'] > 0):
+            raise ImproperlyConfigured(
+                f"SUBMISSION_RATE_LIMITS['{name}'] needs capacity >= 1 and refill_per_second > 0; "
+                f"use None to disable it")
+    return limits
+
+
+class SubmissionRateThrottle(BaseThrottle):
+    """
+    Per-user then global token buckets for submission creation. Rejections
+    become 429 responses with Retry-After through DRF's ``Throttled``. The
+    buckets are debited in one transaction, so a request rejected by the
+    global bucket does not cost the user a token.
+
+    If the bucket table cannot be reached the request is let through: a rate
+    limiter outage must not take submissions down with it.
+    """
+    def __init__(self):
+        self._wait: Optional[float] = None
+
+    def get_buckets(self, request):
+        limits = get_submission_limits()
+        user_limit = limits['staff'] if request.user.is_staff else limits['regular']
+        if user_limit is not None:
+            yield f"submissions:user:{request.user.pk}", user_limit
+        if limits['global'] is not None:
+            yield "submissions:global", limits['global']
+
+    def allow_request(self, request, view):
+        try:
+            with transaction.atomic():
+                for key, limit in self.get_buckets(request):
+                    allowed, retry_after = consume(key, limit['capacity'], limit['refill_per_second'])
+                    if not allowed:
+                        # Give back the tokens already taken from earlier buckets.
+                        transaction.set_rollback(True)
+                        self._wait = retry_after
+                        return False
+        except DatabaseError as e:
+            print(f"Rate limiter unavailable, admitting request: {e}", flush=True)
+        return True
+
+    def wait(self):
+        return self._wait
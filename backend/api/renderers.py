@@ -0,0 +1,28 @@
+"""
+JSON rendering with orjson, which encodes several times faster than the
+stdlib encoder DRF's ``JSONRenderer`` uses.
+"""
+import orjson
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+_fallback = JSONEncoder().default
+
+
+class ORJSONRenderer(BaseRenderer):
+    """
+    Drop-in for ``JSONRenderer``: types orjson does not know (lazy strings,
+    Decimal, timedelta, querysets...) go through DRF's encoder. Datetimes
+    are encoded natively in the same ISO 8601 form with ``Z`` for UTC.
+    """
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        option = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+        if JSONRenderer().get_indent(accepted_media_type or '', renderer_context or {}):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=_fallback, option=option)
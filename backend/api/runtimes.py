@@ -0,0 +1,128 @@
+"""
+The execution engine's runtimes, resolved to one concrete version per language.
+
+Piston's ``/runtimes`` list is fetched when a worker starts and refreshed in
+the background every ``ENGINE_RUNTIMES_REFRESH_SECONDS``. Each language
+(or alias) resolves to its ``ENGINE_PINNED_VERSIONS`` entry if set, else
+the newest installed version. Submissions in languages the engine does not
+have are rejected before dispatch. If the list cannot be fetched,
+resolution returns None and the engine picks the version (``"*"``), as it
+did before, so an engine hiccup never blocks submissions by itself.
+"""
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+from django.conf import settings
+
+from .health import engine_probe_url
+
+# Seconds to wait before refetching after a failed fetch.
+FETCH_RETRY_SECONDS = 30
+
+
+class UnsupportedLanguage(Exception):
+    pass
+
+
+def _version_key(version: str) -> Tuple[int, ...]:
+    return tuple(int(part) if part.isdigit() else 0 for part in version.split('.'))
+
+
+def resolve_versions(runtimes: List[Dict[str, Any]], pinned: Dict[str, str]) -> Dict[str, Optional[str]]:
+    """
+    Map each language and alias to the version it judges with; None for a
+    language whose pinned version is not installed.
+    """
+    installed: Dict[str, List[str]] = {}
+    names: Dict[str, str] = {}
+    for runtime in runtimes:
+        language = runtime['language']
+        installed.setdefault(language, []).append(runtime['version'])
+        for name in [language, *runtime.get('aliases', [])]:
+            names.setdefault(name, language)
+    resolved = {}
+    for name, language in names.items():
+        pin = pinned.get(name) or pinned.get(language)
+        if pin is not None:
+            resolved[name] = pin if pin in installed[language] else None
+        else:
+            resolved[name] = max(installed[language], key=_version_key)
+    return resolved
+
+
+class RuntimeCatalogue:
+    def __init__(self):
+        self._versions: Optional[Dict[str, Optional[str]]] = None
+        self._fetched_at = 0.0
+        self._retry_at = 0.0
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def load(self, runtimes: List[Dict[str, Any]]) -> None:
+        versions = resolve_versions(runtimes, getattr(settings, 'ENGINE_PINNED_VERSIONS', {}))
+        for name, version in versions.items():
+            if version is None:
+                print(f"Pinned runtime for {name} is not installed on the engine; rejecting it", flush=True)
+        self._versions = versions
+        self._fetched_at = time.monotonic()
+
+    def refresh(self) -> bool:
+        """
+        Fetch the runtime list now; returns whether it succeeded.
+        """
+        try:
+            response = requests.get(engine_probe_url(), timeout=getattr(settings, 'ENGINE_RUNTIMES_TIMEOUT', 2.0))
+            response.raise_for_status()
+            self.load(response.json())
+            return True
+        except Exception as e:
+            self._retry_at = time.monotonic() + FETCH_RETRY_SECONDS
+            print(f"Could not fetch engine runtimes: {e}", flush=True)
+            return False
+
+    def refresh_in_background(self) -> None:
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                self.refresh()
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=run, name='engine-runtimes', daemon=True).start()
+
+    def resolve(self, language: str) -> Optional[str]:
+        """
+        The version to judge ``language`` with, or None if the runtime list
+        is unavailable. Raises UnsupportedLanguage if the engine lacks it.
+        """
+        now = time.monotonic()
+        if self._versions is None:
+            if now >= self._retry_at:
+                self.refresh()
+        elif now - self._fetched_at > getattr(settings, 'ENGINE_RUNTIMES_REFRESH_SECONDS', 300):
+            self.refresh_in_background()
+        versions = self._versions
+        if versions is None:
+            return None
+        version = versions.get(language)
+        if version is None:
+            raise UnsupportedLanguage(f"Language '{language}' is not supported by the execution engine")
+        return version
+
+
+_catalogue: Optional[RuntimeCatalogue] = None
+_catalogue_lock = threading.Lock()
+
+
+def get_runtime_catalogue() -> RuntimeCatalogue:
+    global _catalogue
+    with _catalogue_lock:
+        if _catalogue is None:
+            _catalogue = RuntimeCatalogue()
+        return _catalogue
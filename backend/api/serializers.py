@@ -1,6 +1,9 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from django.db.models import F
 from .models import Problem, Submission
+from .problem_cache import get_problem_cache
+from .runtimes import UnsupportedLanguage, get_runtime_catalogue
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -29,7 +32,38 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         return user
 
 
-class ProblemListSerializer(serializers.ModelSerializer):
+_datetime_representation = serializers.DateTimeField().to_representation
+
+
+class ValuesRowsMixin:
+    """
+    Read-only fast path for hot list endpoints: builds the same dicts as
+    ``serializer.data`` from ``queryset.values()``, skipping model instances
+    and per-field serializer calls. ``value_sources`` maps output fields that
+    are not plain model fields to lookups; ``datetime_fields`` are formatted
+    as ``DateTimeField`` does.
+    """
+    value_sources = {}
+    datetime_fields = ()
+
+    @classmethod
+    def values_queryset(cls, queryset):
+        fields = cls.Meta.fields
+        aliased = {f: F(cls.value_sources[f]) for f in fields if f in cls.value_sources}
+        return queryset.values(*[f for f in fields if f not in aliased], **aliased)
+
+    @classmethod
+    def represent(cls, rows):
+        fields = cls.Meta.fields
+        datetime_fields = cls.datetime_fields
+        return [
+            {f: _datetime_representation(row[f]) if f in datetime_fields and row[f] is not None else row[f]
+             for f in fields}
+            for row in rows
+        ]
+
+
+class ProblemListSerializer(ValuesRowsMixin, serializers.ModelSerializer):
     """
     Serializer for listing problems - excludes sensitive information
     """
@@ -47,7 +81,16 @@ class ProblemDetailSerializer(serializers.ModelSerializer):
         model = Problem
         fields = ['id', 'title', 'slug', 'description_md', 'tags', 
                   'difficulty', 'time_thresholds', 'solution_templates',
-                  'reference_solutions']
+                  'reference_solutions', 'complexity_sizes', 'description_hash']
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        request = self.context.get('request')
+        # The rendered statement is opt-in; it is also served on its own
+        # (and cached for good) at /api/problems/{id}/statement/?v=<description_hash>.
+        if request is not None and request.query_params.get('html') == '1':
+            data['description_html'] = instance.description_html
+        return data
 
 
 class ProblemAdminSerializer(serializers.ModelSerializer):
@@ -59,6 +102,7 @@ class ProblemAdminSerializer(serializers.ModelSerializer):
     class Meta:
         model = Problem
         fields = '__all__'
+        read_only_fields = ['description_html', 'description_hash']
         
     def to_internal_value(self, data):
         # Ensure tags is always a list, even if it comes as null or empty string
@@ -68,28 +112,64 @@ class ProblemAdminSerializer(serializers.ModelSerializer):
         return super().to_internal_value(data)
 
 
+class CachedProblemField(serializers.PrimaryKeyRelatedField):
+    """
+    Resolves a problem id through the per-process problem cache instead of
+    loading the row on every request.
+    """
+    def __init__(self, **kwargs):
+        kwargs.setdefault('queryset', Problem.objects.all())
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            snapshot = get_problem_cache().get(pk=int(data))
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if snapshot is None:
+            self.fail('does_not_exist', pk_value=data)
+        return snapshot.to_instance()
+
+
 class SubmissionCreateSerializer(serializers.ModelSerializer):
     """
     Serializer for creating a new submission
     """
+    problem = CachedProblemField()
+    # Not a model field: Submission.code stores the text as a deduplicated blob on save.
+    code = serializers.CharField(trim_whitespace=False)
+
     class Meta:
         model = Submission
         fields = ['problem', 'language', 'code', 'started_at']
+
+    def validate_language(self, value):
+        # Fail before dispatch rather than burning a sandbox run.
+        try:
+            get_runtime_catalogue().resolve(value)
+        except UnsupportedLanguage as e:
+            raise serializers.ValidationError(str(e))
+        return value
         
 
-class SubmissionResultSerializer(serializers.ModelSerializer):
+class SubmissionResultSerializer(ValuesRowsMixin, serializers.ModelSerializer):
     """
     Serializer for returning submission results
     """
     problem_title = serializers.CharField(source='problem.title', read_only=True)
+    value_sources = {'problem_title': 'problem__title'}
+    datetime_fields = ('started_at', 'submitted_at')
     
     class Meta:
         model = Submission
-        fields = ['id', 'problem', 'problem_title', 'language', 'started_at', 
+        fields = ['id', 'problem', 'problem_title', 'language', 'runtime_version', 'started_at', 
                   'submitted_at', 'status', 'duration_ms', 'memory_kb', 
-                  'passed', 'rank']
-        read_only_fields = ['id', 'submitted_at', 'status', 'duration_ms', 
-                            'memory_kb', 'passed', 'rank', 'problem_title']
+                  'passed', 'rank', 'complexity_exponent', 'complexity_verdict']
+        read_only_fields = ['id', 'runtime_version', 'submitted_at', 'status', 'duration_ms', 
+                            'memory_kb', 'passed', 'rank', 'complexity_exponent', 'complexity_verdict',
+                            'problem_title']
 
 
 class SubmissionDetailSerializer(serializers.ModelSerializer):
@@ -98,12 +178,14 @@ class SubmissionDetailSerializer(serializers.ModelSerializer):
     """
     problem_title = serializers.CharField(source='problem.title', read_only=True)
     username = serializers.CharField(source='user.username', read_only=True)
+    code = serializers.CharField(read_only=True)
     
     class Meta:
         model = Submission
-        fields = ['id', 'problem', 'problem_title', 'user', 'username', 'language', 
+        fields = ['id', 'problem', 'problem_title', 'user', 'username', 'language', 'runtime_version',
                   'code', 'started_at', 'submitted_at', 'status', 'duration_ms', 
-                  'memory_kb', 'passed', 'rank', 'raw_results']
+                  'memory_kb', 'passed', 'rank', 'complexity_exponent', 'complexity_verdict',
+                  'raw_results']
         read_only_fields = ['id', 'submitted_at', 'status', 'duration_ms', 
                             'memory_kb', 'passed', 'rank', 'problem_title', 
                             'username', 'raw_results'] 
\ No newline at end of file
@@ -0,0 +1,20 @@
+"""
+Whether the default cache is shared by every worker process.
+
+``CACHE_URL`` points the default cache at Redis (see settings). Without it
+Django uses a per-process ``LocMemCache``, which is fine for one process but
+lets workers disagree: a write seen by one is invisible to the others. State
+that every worker must see at once (read-your-writes pins, cached users,
+leaderboard invalidation) is only kept in the cache when it is shared;
+otherwise those callers go to the database instead.
+"""
+from django.conf import settings
+
+PROCESS_LOCAL_BACKENDS = frozenset([
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+])
+
+
+def cache_is_shared() -> bool:
+    return settings.CACHES['default']['BACKEND'] not in PROCESS_LOCAL_BACKENDS
@@ -0,0 +1,134 @@
+"""
+Problem statements rendered from Markdown to sanitized HTML on save.
+
+``description_html`` is rendered from ``description_md`` whenever a problem
+is saved or imported, and ``description_hash`` identifies the source plus
+the renderer configuration. Clients fetch
+``/api/problems/{id}/statement/?v=<hash>``, which is cacheable forever
+because a new statement gets a new hash. Changing ``MARKDOWN_EXTENSIONS``
+or the sanitizer changes every hash; ``manage.py render_statements`` then
+re-renders the stale problems.
+
+Markdown passes raw HTML through, so the output is rebuilt through an
+allowlist of tags and attributes. Everything else is dropped, including the
+contents of script-like elements, and links may only use safe schemes.
+"""
+import hashlib
+import html
+import re
+from html.parser import HTMLParser
+from typing import List, Optional, Tuple
+
+import markdown
+
+MARKDOWN_EXTENSIONS = ['fenced_code', 'tables', 'sane_lists']
+# Bump when the sanitizer or rendering changes in a way the extensions don't show.
+RENDERER_VERSION = 1
+
+ALLOWED_TAGS = {
+    'a', 'b', 'blockquote', 'br', 'code', 'del', 'div', 'em', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+    'hr', 'i', 'img', 'li', 'ol', 'p', 'pre', 'span', 'strong', 'sub', 'sup', 'table', 'tbody',
+    'td', 'th', 'thead', 'tr', 'ul',
+}
+VOID_TAGS = {'br', 'hr', 'img'}
+# Dropped together with everything inside them.
+DROP_CONTENT_TAGS = {'script', 'style', 'iframe', 'object', 'embed', 'template', 'noscript', 'svg', 'math'}
+ALLOWED_ATTRIBUTES = {
+    'a': {'href', 'title'},
+    'img': {'src', 'alt', 'title'},
+    'code': {'class'},
+    'th': {'style'},
+    'td': {'style'},
+}
+SAFE_URL_SCHEMES = {'http', 'https', 'mailto'}
+CODE_CLASS_RE = re.compile(r'^language-[\w+#.-]+$')
+ALIGN_STYLE_RE = re.compile(r'^text-align:\s*(left|right|center);?$')
+URL_SCHEME_RE = re.compile(r'^([a-zA-Z][a-zA-Z0-9+.-]*):')
+
+
+def _safe_attribute(tag: str, name: str, value: str) -> bool:
+    if name not in ALLOWED_ATTRIBUTES.get(tag, ()):
+        return False
+    if name in ('href', 'src'):
+        # Browsers ignore whitespace and control characters inside schemes.
+        compact = re.sub(r'[\x00-\x20]+', '', value)
+        scheme = URL_SCHEME_RE.match(compact)
+        return scheme is None or scheme.group(1).lower() in SAFE_URL_SCHEMES
+    if name == 'class':
+        return bool(CODE_CLASS_RE.match(value))
+    if name == 'style':
+        return bool(ALIGN_STYLE_RE.match(value.strip()))
+    return True
+
+
+class _Sanitizer(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.out: List[str] = []
+        self.open: List[str] = []
+        self.dropping = 0
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        if tag in DROP_CONTENT_TAGS:
+            self.dropping += 1
+            return
+        if self.dropping or tag not in ALLOWED_TAGS:
+            return
+        kept = ''.join(f' {name}="{html.escape(value or "", quote=True)}"'
+                       for name, value in attrs if _safe_attribute(tag, name, value or ''))
+        self.out.append(f'<{tag}{kept}>')
+        if tag not in VOID_TAGS:
+            self.open.append(tag)
+
+    def handle_startendtag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS and tag not in DROP_CONTENT_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in DROP_CONTENT_TAGS:
+            self.dropping = max(0, self.dropping - 1)
+            return
+        if self.dropping or tag not in self.open:
+            return
+        while self.open:
+            closed = self.open.pop()
+            self.out.append(f'</{closed}>')
+            if closed == tag:
+                break
+
+    def handle_data(self, data: str) -> None:
+        if not self.dropping:
+            self.out.append(html.escape(data, quote=False))
+
+    def result(self) -> str:
+        self.close()
+        return ''.join(self.out) + ''.join(f'</{tag}>' for tag in reversed(self.open))
+
+
+def sanitize_html(source: str) -> str:
+    sanitizer = _Sanitizer()
+    sanitizer.feed(source)
+    return sanitizer.result()
+
+
+def statement_hash(description_md: str) -> str:
+    config = f"{RENDERER_VERSION}:{','.join(MARKDOWN_EXTENSIONS)}:"
+    return hashlib.sha256((config + description_md).encode('utf-8')).hexdigest()
+
+
+def render_statement(description_md: str) -> str:
+    return sanitize_html(markdown.markdown(description_md, extensions=MARKDOWN_EXTENSIONS))
+
+
+def refresh_statement(problem) -> bool:
+    """
+    Re-render ``problem.description_html`` if its source or the renderer
+    changed; returns whether it did.
+    """
+    digest = statement_hash(problem.description_md or '')
+    if problem.description_hash == digest and problem.description_html is not None:
+        return False
+    problem.description_html = render_statement(problem.description_md or '')
+    problem.description_hash = digest
+    return True
@@ -0,0 +1,143 @@
+"""
+Streaming CSV/NDJSON export of submissions for analytics.
+
+Rows are read with ``.values(...).iterator(chunk_size=...)`` so Postgres hands
+them over through a server-side cursor, and written out one at a time through
+a ``StreamingHttpResponse``; memory use stays flat however many rows match.
+"""
+import csv
+import json
+from typing import Dict, Iterator, List, Optional
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import QuerySet
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .code_blobs import decompress
+from .models import Submission
+
+# Exported column name -> ORM lookup
+EXPORT_COLUMNS: Dict[str, str] = {
+    'id': 'id',
+    'user_id': 'user_id',
+    'username': 'user__username',
+    'problem_id': 'problem_id',
+    'problem_slug': 'problem__slug',
+    'language': 'language',
+    'runtime_version': 'runtime_version',
+    'code': 'code_blob__data',  # decompressed on the way out, see iter_export
+    'started_at': 'started_at',
+    'submitted_at': 'submitted_at',
+    'status': 'status',
+    'duration_ms': 'duration_ms',
+    'memory_kb': 'memory_kb',
+    'passed': 'passed',
+    'rank': 'rank',
+    'raw_results': 'raw_results',
+    'created_at': 'created_at',
+}
+# The large columns are opt-in.
+DEFAULT_COLUMNS = [c for c in EXPORT_COLUMNS if c not in ('code', 'raw_results')]
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+class ExportError(ValueError):
+    pass
+
+
+def _filter_bound(queryset, value: str, name: str, datetime_lookup: str, date_lookup: str):
+    """
+    Filter ``submitted_at`` by a date (whole day, inclusive) or a datetime.
+    """
+    try:
+        moment = parse_datetime(value)
+        day = None if moment else parse_date(value)
+    except ValueError:
+        moment = day = None
+    if moment is not None:
+        if timezone.is_naive(moment):
+            moment = timezone.make_aware(moment)
+        return queryset.filter(**{f'submitted_at__{datetime_lookup}': moment})
+    if day is not None:
+        return queryset.filter(**{f'submitted_at__date__{date_lookup}': day})
+    raise ExportError(f"{name} must be an ISO 8601 date or datetime")
+
+
+def parse_columns(raw: Optional[str]) -> List[str]:
+    if not raw:
+        return list(DEFAULT_COLUMNS)
+    columns = [c.strip() for c in raw.split(',') if c.strip()]
+    unknown = [c for c in columns if c not in EXPORT_COLUMNS]
+    if unknown:
+        raise ExportError(f"Unknown columns: {', '.join(unknown)}. "
+                          f"Available: {', '.join(EXPORT_COLUMNS)}")
+    return columns
+
+
+def filter_submissions(params) -> QuerySet:
+    """
+    Apply the export filters (``since``, ``until``, ``problem_id``,
+    ``user_id``, ``username``) from a query-parameter mapping.
+    """
+    queryset = Submission.objects.all()
+    if params.get('since'):
+        queryset = _filter_bound(queryset, params['since'], 'since', 'gte', 'gte')
+    if params.get('until'):
+        queryset = _filter_bound(queryset, params['until'], 'until', 'lt', 'lte')
+    problem_id = params.get('problem_id')
+    if problem_id:
+        if not problem_id.isdigit():
+            raise ExportError("problem_id must be an integer")
+        queryset = queryset.filter(problem_id=int(problem_id))
+    user_id = params.get('user_id')
+    if user_id:
+        if not user_id.isdigit():
+            raise ExportError("user_id must be an integer")
+        queryset = queryset.filter(user_id=int(user_id))
+    # Separate from user_id: usernames may be all digits.
+    if params.get('username'):
+        queryset = queryset.filter(user__username=params['username'])
+    return queryset
+
+
+class _Echo:
+    """
+    File-like object whose write() returns the value, so csv.writer can be
+    used to format single rows for streaming.
+    """
+    def write(self, value):
+        return value
+
+
+def iter_export(queryset, columns: List[str], export_format: str, chunk_size: int = 2000) -> Iterator[str]:
+    lookups = [EXPORT_COLUMNS[c] for c in columns]
+    code_index = columns.index('code') if 'code' in columns else None
+    if code_index is not None:
+        lookups.append('code_blob__compression')
+    rows = queryset.order_by('id').values_list(*lookups).iterator(chunk_size=chunk_size)
+    if code_index is not None:
+        rows = _with_decompressed_code(rows, code_index)
+
+    if export_format == 'csv':
+        writer = csv.writer(_Echo())
+        yield writer.writerow(columns)
+        for row in rows:
+            yield writer.writerow(
+                json.dumps(v, cls=DjangoJSONEncoder) if isinstance(v, (dict, list)) else v for v in row
+            )
+    else:
+        encoder = DjangoJSONEncoder(ensure_ascii=False)
+        for row in rows:
+            yield encoder.encode(dict(zip(columns, row))) + "\n"
+
+
+def _with_decompressed_code(rows, code_index: int):
+    for row in rows:
+        *values, compression = row
+        values[code_index] = decompress(compression, values[code_index])
+        yield values
@@ -1,6 +1,72 @@
-from django.test import TestCase
+import datetime
+import gzip
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.cache.backends.filebased import FileBasedCache
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
 from django.contrib.auth.models import User
-from .models import Problem, Submission
+from django.db import OperationalError, connection
+from django.utils import timezone
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken
+from .authentication import CachedJWTAuthentication, invalidate_cached_users
+from .serializers import ProblemListSerializer, SubmissionResultSerializer
+from .models import CodeBlob, LeaderboardEntry, Problem, RateLimitBucket, Submission
+from .complexity import benchmark_submission, fit_exponent, parse_timings
+from .code_runner_service import merge_shard_results, read_shards, run_windowed
+from .engine_guard import (
+    AdaptiveConcurrencyLimit,
+    CircuitBreaker,
+    EngineGuard,
+    EngineUnavailable,
+)
+from .db_router import ReadReplicaRouter, ReplicaPinMiddleware, ReplicaSet, is_pinned, replica_reads
+from .editor_events import EventBatchError, EventBuffer, build_rows, decode_body
+from .hedging import HedgingPolicy
+from .metrics import mark_process_dead, render_snapshots
+from .idempotency import (
+    IdempotencyKeyReused,
+    claim,
+    complete,
+    prune_expired,
+    release,
+    request_key,
+    wait_for_submission,
+)
+from .leaderboard import (
+    position_of,
+    rebuild,
+    record_submission,
+    refresh_problem_users,
+    scorecard_rank,
+    submission_score,
+)
+from .partitioning import (
+    archive_partition,
+    create_partitions,
+    drop_partition,
+    iter_archive,
+    partition_name,
+    period_start,
+    restore_archive,
+)
+from .problem_cache import ProblemCache
+from .problem_leaderboard import get_leaderboard, note_submission
+from .problem_io import import_problems_ndjson, iter_problems_ndjson
+from .ranking import DEFAULT_RANK, RankTable, rerank_problem
+from .rate_limit import SubmissionRateThrottle, consume, get_submission_limits
+from .renderers import ORJSONRenderer
+from .runtimes import RuntimeCatalogue, UnsupportedLanguage, resolve_versions
+from .statements import render_statement, sanitize_html, statement_hash
+from .submission_export import ExportError, filter_submissions, iter_export, parse_columns
 
 
 class ProblemModelTests(TestCase):
@@ -14,4 +80,730 @@ class ProblemModelTests(TestCase):
             reference_solutions={"python": "def solution():\n    return True"}
         )
         self.assertEqual(problem.title, "Test Problem")
-        self.assertEqual(problem.slug, "test-problem") 
\ No newline at end of file
+        self.assertEqual(problem.slug, "test-problem")
+
+
+class EngineGuardTests(SimpleTestCase):
+    def test_breaker_opens_then_recovers_through_half_open_probe(self):
+        now = [0.0]
+        breaker = CircuitBreaker(error_threshold=0.5, window_size=4, min_calls=4,
+                                 reset_timeout=10, clock=lambda: now[0])
+        for success in (True, False, False, True):
+            breaker.before_call()
+            breaker.record(success)
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        with self.assertRaises(EngineUnavailable):
+            breaker.before_call()
+
+        now[0] = 10
+        breaker.before_call()  # the single half-open probe
+        with self.assertRaises(EngineUnavailable):
+            breaker.before_call()
+        breaker.record(True)
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_concurrency_limit_is_additive_increase_multiplicative_decrease(self):
+        limiter = AdaptiveConcurrencyLimit(initial=2, minimum=1, maximum=4, latency_target_ms=100)
+        self.assertTrue(limiter.try_acquire())
+        self.assertTrue(limiter.try_acquire())
+        self.assertFalse(limiter.try_acquire())
+        limiter.release(True, latency_ms=10)
+        self.assertAlmostEqual(limiter.limit, 2.5)
+        limiter.release(True, latency_ms=500)
+        self.assertAlmostEqual(limiter.limit, 1.25)
+
+    def test_guard_counts_exceptions_as_failures(self):
+        guard = EngineGuard(CircuitBreaker(min_calls=1, window_size=1), AdaptiveConcurrencyLimit(initial=4))
+        with self.assertRaises(ConnectionError):
+            with guard.call():
+                raise ConnectionError()
+        self.assertEqual(guard.breaker.state, CircuitBreaker.OPEN)
+        self.assertEqual(guard.limiter.in_flight, 0)
+        with self.assertRaises(EngineUnavailable):
+            with guard.call():
+                pass
+
+
+class SubmissionRateLimitTests(TestCase):
+    def test_bucket_rejects_when_drained_and_reports_retry_after(self):
+        self.assertEqual(consume("test-bucket", capacity=2, refill_per_second=0.01), (True, 0.0))
+        self.assertEqual(consume("test-bucket", capacity=2, refill_per_second=0.01), (True, 0.0))
+        allowed, retry_after = consume("test-bucket", capacity=2, refill_per_second=0.01)
+        self.assertFalse(allowed)
+        self.assertGreater(retry_after, 90)
+
+    @override_settings(SUBMISSION_RATE_LIMITS={
+        'regular': {'capacity': 2, 'refill_per_second': 0.001},
+        'global': {'capacity': 1, 'refill_per_second': 0.001},
+    })
+    def test_global_rejection_keeps_the_users_token(self):
+        request = type("Request", (), {"user": User.objects.create_user("limited", password="pw")})()
+        self.assertTrue(SubmissionRateThrottle().allow_request(request, None))
+        self.assertFalse(SubmissionRateThrottle().allow_request(request, None))
+        tokens = RateLimitBucket.objects.get(key=f"submissions:user:{request.user.pk}").tokens
+        self.assertGreaterEqual(tokens, 1)
+
+    @override_settings(SUBMISSION_RATE_LIMITS={'global': {'capacity': 10, 'refill_per_second': 0}})
+    def test_a_bucket_that_never_refills_is_rejected(self):
+        with self.assertRaises(ImproperlyConfigured):
+            get_submission_limits()
+
+
+class HedgingPolicyTests(SimpleTestCase):
+    def test_slow_primary_is_hedged_and_hedge_wins(self):
+        policy = HedgingPolicy(enabled=True, min_samples=1, min_delay_ms=10, max_hedge_rate=0.5)
+        policy.run(lambda url: url, "python", "primary", "hedge")
+
+        def call(url):
+            if url == "primary":
+                time.sleep(0.5)
+            return url
+
+        self.assertEqual(policy.run(call, "python", "primary", "hedge"), "hedge")
+        self.assertEqual(policy.hedge_rate, 0.5)
+
+    def test_hedge_budget_suppresses_further_hedges(self):
+        policy = HedgingPolicy(enabled=True, min_samples=1, min_delay_ms=10, max_hedge_rate=0.0)
+        policy.run(lambda url: url, "python", "primary", "hedge")
+
+        def call(url):
+            time.sleep(0.05)
+            return url
+
+        self.assertEqual(policy.run(call, "python", "primary", "hedge"), "primary")
+        self.assertEqual(policy.hedge_rate, 0.0)
+
+
+class ProblemNdjsonTests(TestCase):
+    def test_import_upserts_by_slug_and_export_round_trips(self):
+        record = {
+            "slug": "two-sum", "title": "Two Sum", "description_md": "Add them.",
+            "time_thresholds": [{"max_minutes": 5, "rank": "Wizard"}],
+            "solution_templates": {"python": ""}, "reference_solutions": {"python": ""},
+        }
+        lines = [json.dumps(record), "not json", json.dumps({**record, "title": "Two Sum II"})]
+        summary = import_problems_ndjson(lines, batch_size=1)
+        self.assertEqual((summary['created'], summary['updated'], summary['error_count']), (1, 1, 1))
+        self.assertEqual(summary['errors'][0]['line'], 2)
+
+        exported = [json.loads(line) for line in iter_problems_ndjson(Problem.objects.filter(slug="two-sum"))]
+        self.assertEqual(exported[0]['title'], "Two Sum II")
+        self.assertEqual(import_problems_ndjson(json.dumps(r) for r in exported)['updated'], 1)
+
+    def test_lines_with_wrong_types_are_reported_alone(self):
+        record = {
+            "slug": "three-sum", "title": "Three Sum", "description_md": "Add three.",
+            "time_thresholds": [{"max_minutes": 5, "rank": "Wizard"}],
+            "solution_templates": {"python": ""}, "reference_solutions": {"python": ""},
+        }
+        lines = [json.dumps({**record, "tags": "graphs"}), json.dumps({**record, "time_thresholds": {}}),
+                 json.dumps({**record, "tags": None})]
+        summary = import_problems_ndjson(lines)
+        self.assertEqual((summary['created'], summary['error_count']), (1, 2))
+        self.assertEqual([e['line'] for e in summary['errors']], [1, 2])
+        self.assertIn("tags must be", summary['errors'][0]['error'])
+        self.assertEqual(Problem.objects.get(slug="three-sum").tags, [])
+
+
+class ProblemConditionalGetTests(TestCase):
+    def test_unchanged_catalogue_returns_304_until_a_problem_changes(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(username="reader", password="x"))
+        first = client.get("/api/problems/", {"difficulty": "easy"})
+        self.assertEqual(first.status_code, 200)
+        etag = first["ETag"]
+
+        self.assertEqual(client.get("/api/problems/", {"difficulty": "easy"}, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertNotEqual(client.get("/api/problems/", {"difficulty": "hard"})["ETag"], etag)
+
+        problem = Problem.objects.filter(enabled=True, difficulty__iexact="easy").first()
+        problem.title += " (revised)"
+        with self.captureOnCommitCallbacks(execute=True):
+            problem.save()
+        self.assertEqual(client.get("/api/problems/", {"difficulty": "easy"}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        detail = client.get(f"/api/problems/{problem.pk}/")
+        self.assertEqual(
+            client.get(f"/api/problems/{problem.pk}/", HTTP_IF_NONE_MATCH=detail["ETag"]).status_code, 304)
+
+
+class ProblemCacheTests(TestCase):
+    def test_snapshots_are_reused_until_a_problem_changes(self):
+        cache = ProblemCache(max_entries=1)
+        problem = Problem.objects.get(slug="inplace-sort-with-quick-sort")
+        self.assertEqual(cache.get(slug=problem.slug).id, problem.id)
+        with self.assertNumQueries(1):  # Only the catalogue version
+            snapshot = cache.get(pk=problem.id)
+        snapshot.to_instance().time_thresholds.clear()
+        self.assertTrue(cache.get(pk=problem.id).to_instance().time_thresholds)
+
+        problem.title = "Quicksort, revisited"
+        with self.captureOnCommitCallbacks() as callbacks:
+            problem.save()
+        self.assertNotEqual(cache.get(pk=problem.id).title, "Quicksort, revisited")  # Not committed yet
+        for callback in callbacks:
+            callback()
+        self.assertEqual(cache.get(pk=problem.id).title, "Quicksort, revisited")
+        self.assertIsNone(cache.get(pk=-1))
+        self.assertEqual(len(cache), 1)
+        self.assertEqual((cache.hits, cache.misses), (3, 3))
+
+
+def file_cache(directory):
+    # A cache shared between processes, as Redis is in production.
+    return {"default": {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": directory}}
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    def test_user_is_cached_until_deactivated(self):
+        user = User.objects.create_user(username="cached-auth", password="x")
+        token = AccessToken.for_user(user)
+        auth = CachedJWTAuthentication()
+        with tempfile.TemporaryDirectory() as cache_dir, override_settings(CACHES=file_cache(cache_dir)):
+            auth.get_user(token)
+            with self.assertNumQueries(0):
+                cached = auth.get_user(token)
+            self.assertEqual((cached.pk, cached.username, cached.is_staff), (user.pk, "cached-auth", False))
+
+            user.is_active = False
+            user.save()
+            with self.assertRaises(AuthenticationFailed):
+                auth.get_user(token)
+
+    def test_bulk_updates_need_explicit_invalidation(self):
+        user = User.objects.create_user(username="bulk-auth", password="x", is_staff=True)
+        token = AccessToken.for_user(user)
+        auth = CachedJWTAuthentication()
+        with tempfile.TemporaryDirectory() as cache_dir, override_settings(CACHES=file_cache(cache_dir)):
+            auth.get_user(token)
+            User.objects.filter(pk=user.pk).update(is_staff=False)
+            self.assertTrue(auth.get_user(token).is_staff)  # No signal, still cached
+            invalidate_cached_users([user.pk])
+            self.assertFalse(auth.get_user(token).is_staff)
+
+    @override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+    def test_per_process_cache_is_not_used(self):
+        user = User.objects.create_user(username="uncached-auth", password="x")
+        token = AccessToken.for_user(user)
+        CachedJWTAuthentication().get_user(token)
+        with self.assertNumQueries(1):
+            CachedJWTAuthentication().get_user(token)
+
+
+class HealthEndpointTests(SimpleTestCase):
+    def test_liveness_needs_no_database_or_credentials(self):
+        response = self.client.get("/healthz")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"status": "ok"})
+
+
+class MetricsAggregationTests(SimpleTestCase):
+    def snapshot(self, requests, in_flight, circuit):
+        return [
+            {"name": "requests_total", "type": "counter", "documentation": "Requests.", "mode": None,
+             "samples": [["requests_total", {"route": "problem-list"}, requests]]},
+            {"name": "in_flight", "type": "gauge", "documentation": "In flight.", "mode": "sum",
+             "samples": [["in_flight", {}, in_flight]]},
+            {"name": "circuit", "type": "gauge", "documentation": "Circuit.", "mode": "max",
+             "samples": [["circuit", {}, circuit]]},
+        ]
+
+    def test_counters_sum_and_dead_workers_drop_gauges(self):
+        rendered = render_snapshots([self.snapshot(3, 2, 0), self.snapshot(4, 1, 2)])
+        self.assertIn('requests_total{route="problem-list"} 7', rendered)
+        self.assertIn("in_flight 3", rendered)
+        self.assertIn("circuit 2", rendered)
+
+        with tempfile.TemporaryDirectory() as directory:
+            for pid, requests in ((42, 5), (43, 2)):
+                with open(os.path.join(directory, f"metrics_{pid}.json"), "w") as f:
+                    json.dump(self.snapshot(requests, 9, 2), f)
+                mark_process_dead(directory, pid)
+            self.assertEqual(os.listdir(directory), ["metrics_dead.json"])
+            with open(os.path.join(directory, "metrics_dead.json")) as f:
+                rendered = render_snapshots([json.load(f), self.snapshot(1, 1, 0)])
+        self.assertIn('requests_total{route="problem-list"} 8', rendered)
+        self.assertIn("in_flight 1", rendered)
+        self.assertIn("circuit 0", rendered)
+
+
+class RequestProfilingTests(TestCase):
+    def test_staff_can_profile_a_request_and_download_the_report(self):
+        staff = User.objects.create_user(username="profiler", password="x", is_staff=True)
+        regular = User.objects.create_user(username="not-profiler", password="x")
+        with tempfile.TemporaryDirectory() as directory, override_settings(PROFILE_DIR=directory):
+            response = self.client.get("/healthz?profile=1",
+                                       HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(regular)}")
+            self.assertNotIn("X-Profile-Id", response)
+
+            response = self.client.get("/healthz", HTTP_X_PROFILE="1",
+                                       HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(staff)}")
+            profile_id = response["X-Profile-Id"]
+
+            client = APIClient()
+            client.force_authenticate(staff)
+            self.assertEqual(client.get("/api/profiles/").json()[0]["id"], profile_id)
+            report = json.loads(b"".join(client.get(f"/api/profiles/{profile_id}/").streaming_content))
+            self.assertEqual(report["path"], "/healthz")
+            self.assertIn("request thread only", report["scope"])
+            self.assertTrue(report["top_functions"])
+
+
+class SubmissionExportTests(TestCase):
+    def test_filters_and_selected_columns(self):
+        user = User.objects.create_user(username="analyst-subject", password="x")
+        digits = User.objects.create_user(username=str(user.pk + 1000), password="x")
+        problem = Problem.objects.get(slug="inplace-sort-with-quick-sort")
+        for day in (1, 2):
+            moment = timezone.make_aware(datetime.datetime(2025, 1, day, 12))
+            for owner in (user, digits):
+                Submission.objects.create(user=owner, problem=problem, language="python", code="pass",
+                                          started_at=moment, submitted_at=moment, passed=day == 2)
+
+        queryset = filter_submissions({"since": "2025-01-02", "username": "analyst-subject"})
+        lines = list(iter_export(queryset, parse_columns("username,passed"), "csv"))
+        self.assertEqual(lines, ["username,passed\r\n", "analyst-subject,True\r\n"])
+        self.assertEqual(filter_submissions({"username": digits.username}).count(), 2)
+        self.assertEqual(filter_submissions({"user_id": str(user.pk)}).count(), 2)
+        with self.assertRaises(ExportError):
+            filter_submissions({"user_id": "analyst-subject"})
+        with self.assertRaises(ExportError):
+            parse_columns("username,password")
+
+
+class EditorEventIngestTests(SimpleTestCase):
+    def test_gzip_batch_is_validated_into_rows(self):
+        now_ms = int(time.time() * 1000)
+        body = gzip.compress(json.dumps({
+            "problem": 7,
+            "attempt_id": "0b8f9c1e-5f5e-4c47-9a34-1f1f6cf0a9d1",
+            "events": [{"type": "keystroke", "t": now_ms, "data": {"key": "a"}}, {"type": "blur", "t": now_ms}],
+        }).encode())
+        problem_id, rows = build_rows(decode_body(body, "gzip"), user_id=3, max_events=10)
+        self.assertEqual(problem_id, 7)
+        self.assertEqual([(r[0], r[3], r[5]) for r in rows], [(3, "keystroke", '{"key":"a"}'), (3, "blur", None)])
+        with self.assertRaises(EventBatchError):
+            build_rows({"problem": 7, "attempt_id": "x", "events": []}, user_id=3, max_events=10)
+
+    def test_out_of_range_timestamps_are_rejected(self):
+        for t in (float("nan"), float("inf"), 1e20, -1e18):
+            with self.assertRaises(EventBatchError):
+                build_rows({"problem": 7, "attempt_id": "0b8f9c1e-5f5e-4c47-9a34-1f1f6cf0a9d1",
+                            "events": [{"type": "blur", "t": t}]}, user_id=3, max_events=10)
+
+    def test_full_buffer_pushes_back_until_flushed(self):
+        written = []
+        buffer = EventBuffer(max_rows=3, flush_size=100, flush_interval=60, writer=written.extend)
+        self.assertTrue(buffer.offer([1, 2]))
+        self.assertFalse(buffer.offer([3, 4]))
+        buffer.flush()
+        self.assertEqual(written, [1, 2])
+        self.assertTrue(buffer.offer([3, 4]))
+
+
+class SubmissionPartitioningTests(TestCase):
+    def test_recent_time_filter_prunes_old_partitions(self):
+        now = timezone.now()
+        old_month = now - datetime.timedelta(days=400)
+        create_partitions("submissions", "month", old_month, old_month)
+        plan = Submission.objects.filter(submitted_at__gte=period_start(now, "month")).explain()
+        self.assertIn(partition_name("submissions", period_start(now, "month"), "month"), plan)
+        self.assertNotIn(partition_name("submissions", period_start(old_month, "month"), "month"), plan)
+
+    def test_creating_a_partition_moves_its_rows_out_of_the_default(self):
+        problem = Problem.objects.get(slug="inplace-sort-with-quick-sort")
+        long_ago = timezone.now() - datetime.timedelta(days=800)
+        submission = Submission.objects.create(problem=problem, language="python", code="pass",
+                                               started_at=long_ago, submitted_at=long_ago, passed=False)
+        name = partition_name("submissions", period_start(long_ago, "month"), "month")
+        create_partitions("submissions", "month", long_ago, long_ago)
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT id FROM {name}")
+            self.assertEqual(cursor.fetchall(), [(submission.pk,)])
+            cursor.execute("SELECT count(*) FROM submissions_default WHERE id = %s", [submission.pk])
+            self.assertEqual(cursor.fetchone()[0], 0)
+
+    def test_archives_keep_the_code_of_dropped_partitions(self):
+        problem = Problem.objects.get(slug="inplace-sort-with-quick-sort")
+        long_ago = timezone.now() - datetime.timedelta(days=800)
+        code = 'print("archived, with a \\"quote\\"")\n'
+        create_partitions("submissions", "month", long_ago, long_ago)
+        submission = Submission.objects.create(problem=problem, language="python", code=code, status="",
+                                               started_at=long_ago, submitted_at=long_ago, passed=False)
+        name = partition_name("submissions", period_start(long_ago, "month"), "month")
+        with tempfile.TemporaryDirectory() as directory:
+            path = archive_partition(name, directory, code_column="code_sha256")
+            drop_partition("submissions", name)
+            CodeBlob.objects.delete_orphans(grace=datetime.timedelta(0))
+            self.assertFalse(CodeBlob.objects.filter(pk=submission.code_blob_id).exists())
+            self.assertEqual([row["code"] for row in iter_archive(path)], [code])
+            restore_archive("submissions", "month", path)
+        restored = Submission.objects.get(pk=submission.pk)
+        self.assertEqual((restored.code, restored.status, restored.rank), (code, "", None))
+
+
+class CodeBlobTests(TestCase):
+    def test_identical_code_is_stored_once_and_read_back_lazily(self):
+        problem = Problem.objects.get(slug="inplace-sort-with-quick-sort")
+        now = timezone.now()
+        code = problem.solution_templates["python"] * 20
+        first, second = (
+            Submission.objects.create(problem=problem, language="python", code=code,
+                                      started_at=now, submitted_at=now, passed=False)
+            for _ in range(2)
+        )
+        self.assertEqual(first.code_blob_id, second.code_blob_id)
+        blob = CodeBlob.objects.get(pk=first.code_blob_id)
+        self.assertEqual(blob.compression, "zlib")
+        self.assertLess(len(bytes(blob.data)), blob.size)
+        self.assertEqual(Submission.objects.get(pk=second.pk).code, code)
+
+
+class RankTableTests(SimpleTestCase):
+    table = RankTable.compile([
+        {"max_minutes": 10, "rank": "Senior"},
+        {"max_minutes": 3, "rank": "Wizard"},
+        {"rank": "Junior"},
+    ])
+
+    def test_bounds_are_inclusive_and_missing_max_minutes_catches_the_rest(self):
+        self.assertEqual(self.table.rank_for(True, 3 * 60 * 1000), "Wizard")
+        self.assertEqual(self.table.rank_for(True, 3 * 60 * 1000 + 1), "Senior")
+        self.assertEqual(self.table.rank_for(True, 10 ** 9), "Junior")
+
+    def test_failed_or_untimed_submissions_get_the_default_rank(self):
+        self.assertEqual(self.table.rank_for(False, 1000), DEFAULT_RANK)
+        self.assertEqual(self.table.rank_for(True, None), DEFAULT_RANK)
+        self.assertEqual(RankTable.compile(None).rank_for(True, 1000), DEFAULT_RANK)
+
+    def test_case_sql_mirrors_the_table(self):
+        sql, params = self.table.case_sql("d")
+        self.assertEqual(sql, "CASE WHEN d <= %s THEN %s WHEN d <= %s THEN %s "
+                              "WHEN d IS NOT NULL THEN %s ELSE %s END")
+        self.assertEqual(params, [180000, "Wizard", 600000, "Senior", "Junior", DEFAULT_RANK])
+
+
+class RerankTests(TestCase):
+    def test_rerank_rewrites_stored_ranks_from_current_thresholds(self):
+        problem = Problem.objects.get(slug="inplace-sort-with-quick-sort")
+        now = timezone.now()
+        fast, slow, failed = (
+            Submission.objects.create(problem=problem, language="python", code="pass", started_at=now,
+                                      submitted_at=now, passed=passed, duration_ms=duration, rank="Old")
+            for passed, duration in ((True, 60 * 1000), (True, 20 * 60 * 1000), (False, 1000))
+        )
+        Problem.objects.filter(pk=problem.pk).update(time_thresholds=[{"max_minutes": 2, "rank": "Wizard"}])
+        self.assertEqual(rerank_problem(problem.pk, chunk_size=1), 2)
+        ranks = dict(Submission.objects.filter(pk__in=[fast.pk, slow.pk, failed.pk]).values_list("pk", "rank"))
+        self.assertEqual(ranks, {fast.pk: "Wizard", slow.pk: DEFAULT_RANK, failed.pk: "Old"})
+
+
+class LeaderboardTests(TestCase):
+    def setUp(self):
+        self.problem = Problem.objects.get(slug="inplace-sort-with-quick-sort")
+        self.alice = User.objects.create_user("alice", password="pw")
+        self.bob = User.objects.create_user("bob", password="pw")
+
+    def submit(self, user, passed, rank):
+        now = timezone.now()
+        submission = Submission.objects.create(
+            user=user, problem=self.problem, language="python", code="pass", started_at=now,
+            submitted_at=now, passed=passed, duration_ms=60 * 1000, rank=rank)
+        return record_submission(submission)
+
+    def test_scores_match_the_scorecard(self):
+        self.assertEqual(submission_score(True, "Wizard"), 6)
+        self.assertEqual(submission_score(False, "Wizard"), 0)
+        self.assertEqual(scorecard_rank(6, 0.9), "Wizard")
+        self.assertEqual(scorecard_rank(6, 0.05), "Newbie")
+
+    def test_only_improvements_update_the_board_and_rebuild_agrees(self):
+        self.assertTrue(self.submit(self.alice, False, None))
+        self.assertTrue(self.submit(self.alice, True, "New Grad"))
+        self.assertFalse(self.submit(self.alice, False, None))
+        self.assertTrue(self.submit(self.bob, True, "Wizard"))
+
+        alice = LeaderboardEntry.objects.get(user=self.alice)
+        bob = LeaderboardEntry.objects.get(user=self.bob)
+        self.assertEqual((alice.avg_rank_score, alice.attempted_count, alice.passed_count), (3, 1, 1))
+        self.assertEqual((position_of(bob), position_of(alice)), (1, 2))
+
+        incremental = list(LeaderboardEntry.objects.order_by("user_id").values_list(
+            "user_id", "avg_rank_score", "attempted_count", "passed_count"))
+        self.assertEqual(rebuild(), 2)
+        self.assertEqual(list(LeaderboardEntry.objects.order_by("user_id").values_list(
+            "user_id", "avg_rank_score", "attempted_count", "passed_count")), incremental)
+
+    def test_leaderboard_endpoint_lists_best_first(self):
+        self.submit(self.alice, True, "New Grad")
+        self.submit(self.bob, True, "Wizard")
+        response = APIClient().get("/api/leaderboard/")
+        self.assertEqual([(r["position"], r["username"]) for r in response.json()["results"]],
+                         [(1, "bob"), (2, "alice")])
+
+    def test_pages_follow_the_cursor_and_ties_share_positions(self):
+        carol = User.objects.create_user("carol", password="pw")
+        self.submit(self.alice, True, "New Grad")
+        self.submit(self.bob, True, "Wizard")
+        self.submit(carol, True, "New Grad")
+        client, url, rows = APIClient(), "/api/leaderboard/?page_size=2", []
+        while url:
+            page = client.get(url).json()
+            rows += [(r["position"], r["username"]) for r in page["results"]]
+            url = page["next"]
+        self.assertEqual(rows, [(1, "bob"), (2, "carol"), (2, "alice")])
+        self.assertEqual(client.get("/api/leaderboard/?cursor=bogus").status_code, 400)
+
+    def test_disabling_a_problem_drops_its_totals(self):
+        self.submit(self.alice, True, "New Grad")
+        Problem.objects.filter(pk=self.problem.pk).update(enabled=False)
+        refresh_problem_users(self.problem.pk)
+        self.assertFalse(LeaderboardEntry.objects.filter(user=self.alice).exists())
+
+
+@override_settings(PROBLEM_LEADERBOARD_SIZE=1)
+class ProblemLeaderboardTests(TestCase):
+    def setUp(self):
+        self.problem = Problem.objects.get(slug="inplace-sort-with-quick-sort")
+        self.user = User.objects.create_user("runner", password="pw")
+        cache_dir = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(CACHES=file_cache(cache_dir)))
+
+    def solve(self, duration_ms, language="python"):
+        now = timezone.now()
+        submission = Submission.objects.create(
+            user=self.user, problem=self.problem, language=language, code="pass", started_at=now,
+            submitted_at=now, passed=True, duration_ms=duration_ms, rank="Wizard")
+        note_submission(submission)
+
+    def test_board_is_invalidated_only_by_solves_entering_the_top(self):
+        self.solve(9000)
+        self.assertEqual([r["duration_ms"] for r in get_leaderboard(self.problem.pk)], [9000])
+        self.solve(12000)
+        self.assertEqual([r["duration_ms"] for r in get_leaderboard(self.problem.pk)], [9000])
+        self.solve(7000, language="javascript")
+        self.assertEqual([r["duration_ms"] for r in get_leaderboard(self.problem.pk)], [7000])
+        self.assertEqual([r["duration_ms"] for r in get_leaderboard(self.problem.pk, language="python")], [9000])
+
+    def test_endpoint_rejects_unknown_windows(self):
+        response = APIClient().get(f"/api/problems/{self.problem.pk}/leaderboard/?window=decade")
+        self.assertEqual(response.status_code, 400)
+
+
+class ShardedExecutionTests(SimpleTestCase):
+    def result(self, status, duration_ms, memory_kb):
+        return {"status": status, "stdout": status, "stderr": "", "output": status, "duration_ms": duration_ms,
+                "memory_kb": memory_kb, "exit_code": 0 if status == "success" else 1,
+                "error_message": "", "engine_specific_response": {}}
+
+    def test_shards_are_read_from_the_manifest(self):
+        files = [{"filename": "eval_submission_codes.py", "content": ""},
+                 {"filename": "test_shards.json", "content": '["small", "large"]'}]
+        self.assertEqual(read_shards(files), ["small", "large"])
+        self.assertEqual(read_shards(files[:1]), [])
+        with self.assertRaises(ValueError):
+            read_shards([{"filename": "test_shards.json", "content": "{}"}])
+
+    def test_merge_sums_time_keeps_peak_memory_and_the_failing_verdict(self):
+        shards = ["a", "b", "c"]
+        passed = merge_shard_results(shards, {0: self.result("success", 300, 900),
+                                              1: self.result("success", 500, 700),
+                                              2: self.result("success", 100, 800)}, None)
+        self.assertEqual((passed["status"], passed["duration_ms"], passed["memory_kb"]), ("success", 900, 900))
+        self.assertEqual(passed["engine_specific_response"]["max_shard_duration_ms"], 500)
+
+        failed = merge_shard_results(shards, {1: self.result("Tests failed", 200, 500)}, 1)
+        self.assertEqual((failed["status"], failed["exit_code"]), ("Tests failed", 1))
+        self.assertEqual(failed["engine_specific_response"]["skipped_shards"], ["a", "c"])
+        self.assertIn("--- shard b ---", failed["stdout"])
+
+    def test_each_call_keeps_its_own_window_and_stops_at_a_failure(self):
+        lock, in_flight, peak, calls = threading.Lock(), [0], [0], []
+
+        def run(index):
+            with lock:
+                calls.append(index)
+                in_flight[0] += 1
+                peak[0] = max(peak[0], in_flight[0])
+            time.sleep(0.01)
+            with lock:
+                in_flight[0] -= 1
+            return self.result("Tests failed" if index == 4 else "success", 1, 1)
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results, failed = run_windowed(run, 8, 2, executor)
+        self.assertEqual(peak[0], 2)
+        self.assertEqual(failed, 4)
+        self.assertLess(len(calls), 8)
+
+
+class SubmissionIdempotencyTests(TestCase):
+    def setUp(self):
+        self.problem = Problem.objects.get(slug="inplace-sort-with-quick-sort")
+        self.user = User.objects.create_user("retrier", password="pw")
+
+    def test_only_the_first_claim_judges_and_repeats_get_its_submission(self):
+        self.assertTrue(claim("k" * 64, self.user.pk))
+        self.assertFalse(claim("k" * 64, self.user.pk))
+        self.assertIsNone(wait_for_submission("k" * 64, timeout=0))
+        now = timezone.now()
+        submission = Submission.objects.create(user=self.user, problem=self.problem, language="python",
+                                               code="pass", started_at=now, submitted_at=now, passed=False)
+        complete("k" * 64, submission)
+        self.assertEqual(wait_for_submission("k" * 64, timeout=0), submission)
+
+    def test_a_failed_request_releases_its_key(self):
+        self.assertTrue(claim("f" * 64, self.user.pk))
+        release("f" * 64)
+        self.assertTrue(claim("f" * 64, self.user.pk))
+
+    def test_derived_keys_depend_on_the_attempt(self):
+        request = type("Request", (), {"META": {}, "user": self.user})()
+        data = {"problem": self.problem, "language": "python", "code": "pass", "started_at": timezone.now()}
+        self.assertEqual(request_key(request, data), request_key(request, dict(data)))
+        self.assertNotEqual(request_key(request, data), request_key(request, dict(data, code="pass ")))
+        request.META = {"HTTP_IDEMPOTENCY_KEY": "abc"}
+        self.assertEqual(request_key(request, data), request_key(request, dict(data, code="x")))
+
+    def test_a_key_reused_for_another_payload_is_rejected(self):
+        self.assertTrue(claim("r" * 64, self.user.pk, "a" * 64))
+        self.assertFalse(claim("r" * 64, self.user.pk, "a" * 64))
+        with self.assertRaises(IdempotencyKeyReused):
+            claim("r" * 64, self.user.pk, "b" * 64)
+
+    @override_settings(IDEMPOTENCY_WINDOW=60)
+    def test_expired_keys_are_pruned(self):
+        claim("p" * 64, self.user.pk)
+        self.assertEqual(prune_expired(timezone.now()), 0)
+        self.assertEqual(prune_expired(timezone.now() + datetime.timedelta(minutes=2)), 1)
+        self.assertTrue(claim("p" * 64, self.user.pk))
+
+
+class RuntimeResolutionTests(SimpleTestCase):
+    runtimes = [
+        {"language": "python", "version": "3.9.4", "aliases": ["py"]},
+        {"language": "python", "version": "3.10.0", "aliases": ["py"]},
+        {"language": "c++", "version": "10.2.0", "aliases": ["cpp"]},
+    ]
+
+    def test_newest_version_unless_pinned(self):
+        self.assertEqual(resolve_versions(self.runtimes, {})["py"], "3.10.0")
+        self.assertEqual(resolve_versions(self.runtimes, {"python": "3.9.4"})["python"], "3.9.4")
+        self.assertIsNone(resolve_versions(self.runtimes, {"cpp": "12.0.0"})["cpp"])
+
+    def test_unknown_languages_are_rejected_once_the_list_is_loaded(self):
+        catalogue = RuntimeCatalogue()
+        catalogue.load(self.runtimes)
+        self.assertEqual(catalogue.resolve("cpp"), "10.2.0")
+        with self.assertRaises(UnsupportedLanguage):
+            catalogue.resolve("cobol")
+
+
+class ComplexityFitTests(SimpleTestCase):
+    def test_exponent_of_power_laws(self):
+        linear = [(n, n * 1e-6) for n in (1000, 2000, 4000, 8000)]
+        quadratic = [(n, n * n * 1e-9) for n in (1000, 2000, 4000, 8000)]
+        self.assertAlmostEqual(fit_exponent(linear), 1.0)
+        self.assertAlmostEqual(fit_exponent(quadratic), 2.0)
+        self.assertIsNone(fit_exponent([(1000, 0.1)]))
+        self.assertIsNone(fit_exponent([(1000, 0.1), (2000, 0.0)]))
+
+    def test_timings_are_parsed_from_driver_output(self):
+        stdout = "Correct\nCOMPLEXITY 1000 0.0012\nCOMPLEXITY 2000 2.5e-3\n"
+        self.assertEqual(parse_timings(stdout), [(1000, 0.0012), (2000, 0.0025)])
+
+    def test_mock_judged_submissions_are_not_benchmarked(self):
+        problem = Problem(complexity_sizes=[1000, 2000], reference_solutions={"java": "x"},
+                          harness_eval_files=[{"filename": "eval_submission_codes.py", "content": ""}])
+        self.assertIsNone(benchmark_submission(problem, "java", None, "class A {}"))
+
+
+class ReplicaRoutingTests(SimpleTestCase):
+    def test_lagging_and_failing_replicas_are_skipped(self):
+        lags = {"replica_0": 30.0, "replica_1": 0.5}
+        replicas = ReplicaSet(["replica_0", "replica_1"], lag_probe=lags.__getitem__)
+        self.assertEqual(replicas.pick(), "replica_1")
+
+        def unreachable(alias):
+            raise OperationalError("connection refused")
+
+        replicas = ReplicaSet(["replica_0"], lag_probe=unreachable)
+        self.assertIsNone(replicas.pick())
+        # Marked down, so it is not probed again until the retry interval passes.
+        replicas.lag_probe = lags.__getitem__
+        self.assertIsNone(replicas.pick())
+
+    def test_reads_use_the_primary_outside_replica_views(self):
+        router = ReadReplicaRouter()
+        self.assertEqual(router.db_for_read(Problem), "default")
+        with replica_reads():
+            # No replicas are configured here.
+            self.assertEqual(router.db_for_read(Problem), "default")
+            self.assertEqual(router.db_for_write(Problem), "default")
+        self.assertFalse(router.allow_migrate("replica_0", "api"))
+
+    def test_pins_are_visible_to_other_workers(self):
+        writer, reader = User(pk=42, username="writer"), User(pk=43, username="reader")
+        with tempfile.TemporaryDirectory() as cache_dir, override_settings(
+                DATABASE_REPLICAS=["replica_0"], CACHES=file_cache(cache_dir)):
+            request = RequestFactory().post("/api/submissions/")
+            request.user = writer
+            ReplicaPinMiddleware(lambda request: HttpResponse(status=201))(request)
+            # Another worker has its own client of the same cache.
+            self.assertTrue(FileBasedCache(cache_dir, {}).get("replica-pin:42"))
+            self.assertTrue(is_pinned(writer))
+            self.assertFalse(is_pinned(reader))
+
+    @override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+    def test_per_process_cache_keeps_users_on_the_primary(self):
+        self.assertTrue(is_pinned(User(pk=43, username="reader")))
+
+
+class FastSerializationTests(TestCase):
+    def test_values_rows_match_the_serializers(self):
+        problems = Problem.objects.order_by("id")
+        self.assertEqual(ProblemListSerializer.represent(ProblemListSerializer.values_queryset(problems)),
+                         ProblemListSerializer(problems, many=True).data)
+        problem = problems.first()
+        now = timezone.now()
+        Submission.objects.create(problem=problem, language="python", code="pass", started_at=now,
+                                  submitted_at=now, passed=True, duration_ms=6000, rank="Wizard")
+        submissions = Submission.objects.order_by("id")
+        self.assertEqual(
+            SubmissionResultSerializer.represent(SubmissionResultSerializer.values_queryset(submissions)),
+            SubmissionResultSerializer(submissions, many=True).data)
+
+    def test_renderer_output_matches_drf(self):
+        from rest_framework.renderers import JSONRenderer
+        data = {"at": timezone.now(), "items": [1, "two", None], "nested": {"x": 1.5}}
+        self.assertEqual(json.loads(ORJSONRenderer().render(data)), json.loads(JSONRenderer().render(data)))
+
+
+class StatementRenderingTests(SimpleTestCase):
+    def test_markdown_renders_with_code_and_tables(self):
+        rendered = render_statement("# Sort\n\n```python\nx = 1 < 2\n```\n\n| a | b |\n|:-|-:|\n| 1 | 2 |\n")
+        self.assertIn("<h1>Sort</h1>", rendered)
+        self.assertIn('<code class="language-python">x = 1 &lt; 2', rendered)
+        self.assertIn('<td style="text-align: left;">1</td>', rendered)
+
+    def test_unsafe_markup_is_removed(self):
+        dirty = ('<p onclick="x()">hi<script>alert(1)</script></p>'
+                 '<a href=" java\tscript:alert(1)">link</a><a href="https://ok">ok</a><img src=x onerror=y>')
+        self.assertEqual(sanitize_html(dirty),
+                         '<p>hi</p><a>link</a><a href="https://ok">ok</a><img src="x">')
+
+    def test_hash_covers_source_and_renderer(self):
+        self.assertNotEqual(statement_hash("a"), statement_hash("b"))
+        self.assertEqual(len(statement_hash("a")), 64)
+
+
+class ProblemStatementTests(TestCase):
+    def test_statement_is_rendered_on_save_and_served_immutable_by_hash(self):
+        problem = Problem.objects.get(slug="inplace-sort-with-quick-sort")
+        problem.description_md = "Sort **in place**."
+        with self.captureOnCommitCallbacks(execute=True):
+            problem.save()
+        self.assertEqual(problem.description_html, "<p>Sort <strong>in place</strong>.</p>")
+        response = APIClient().get(f"/api/problems/{problem.pk}/statement/?v={problem.description_hash}")
+        self.assertEqual(response.content.decode(), problem.description_html)
+        self.assertIn("immutable", response["Cache-Control"])
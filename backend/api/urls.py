@@ -3,7 +3,20 @@ from rest_framework import routers
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from django.views.decorators.csrf import csrf_exempt
 
-from .views import UserViewSet, ProblemViewSet, SubmissionViewSet, RegisterView, ScorecardView, ChangePasswordView
+from .views import (
+    UserViewSet,
+    ProblemViewSet,
+    SubmissionViewSet,
+    RegisterView,
+    ScorecardView,
+    LeaderboardView,
+    LeaderboardMeView,
+    ChangePasswordView,
+    MetricsView,
+    EditorEventIngestView,
+    ProfileListView,
+    ProfileDownloadView,
+)
 
 # Create a router and register our viewsets
 router = routers.DefaultRouter()
@@ -22,9 +35,23 @@ urlpatterns = [
     # Scorecard endpoint
     path('scorecard/', ScorecardView.as_view(), name='scorecard'),
     
+    # Global leaderboard
+    path('leaderboard/', LeaderboardView.as_view(), name='leaderboard'),
+    path('leaderboard/me/', LeaderboardMeView.as_view(), name='leaderboard-me'),
+    
     # Change password endpoint
     path('change-password/', ChangePasswordView.as_view(), name='change-password'),
     
+    # Editor interaction event ingestion
+    path('events/', EditorEventIngestView.as_view(), name='editor-events'),
+    
+    # Metrics endpoint
+    path('metrics/', MetricsView.as_view(), name='metrics'),
+    
+    # Request profiles captured with ?profile=1 (staff only)
+    path('profiles/', ProfileListView.as_view(), name='profile-list'),
+    path('profiles/<str:profile_id>/', ProfileDownloadView.as_view(), name='profile-download'),
+    
     # API endpoints - registered with router
     path('', include(router.urls)),
 ] 
\ No newline at end of file
@@ -1,7 +1,15 @@
+import os
+from collections import defaultdict
+
 from rest_framework import viewsets, permissions, status, mixins
 from rest_framework.decorators import action, api_view, permission_classes, authentication_classes
 from rest_framework.response import Response
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.utils.urls import replace_query_param
+from rest_framework.exceptions import APIException
+from rest_framework.exceptions import ValidationError as DRFValidationError
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.conf import settings
 from django.utils import timezone
 from django.db.models import F, ExpressionWrapper, fields, Avg
 from django.contrib.auth.models import User
@@ -13,7 +21,7 @@ from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
 
-from .models import Problem, Submission
+from .models import LeaderboardEntry, Problem, Submission
 from .serializers import (
     UserSerializer,
     UserRegistrationSerializer,
@@ -22,13 +30,66 @@ from .serializers import (
     ProblemAdminSerializer,
     SubmissionCreateSerializer,
     SubmissionResultSerializer,
-    SubmissionDetailSerializer
+    SubmissionDetailSerializer,
+    ValuesRowsMixin,
+)
+from .complexity import benchmark_submission
+from .code_runner_service import execute_code, ExecutionResult, judging_in_flight
+from .engine_guard import EngineUnavailable
+from .idempotency import IdempotencyError, IdempotencyKeyReused, wait_for_submission
+from .idempotency import claim as claim_idempotency_key
+from .idempotency import complete as complete_idempotency_key
+from .idempotency import release as release_idempotency_key
+from .idempotency import request_fingerprint as idempotency_request_fingerprint
+from .idempotency import request_key as idempotency_request_key
+from .health import probe_database, probe_engine
+from .metrics import registry
+from .rate_limit import SubmissionRateThrottle
+from .runtimes import UnsupportedLanguage, get_runtime_catalogue
+from .problem_cache import get_problem_cache
+from .profiling import artifact_path, list_profiles
+from .problem_leaderboard import get_leaderboard as get_problem_leaderboard
+from .problem_leaderboard import note_submission as note_problem_leaderboard_submission
+from .problem_io import iter_problems_ndjson, import_problems_ndjson
+from .ranking import rank_table
+from .leaderboard import (
+    InvalidCursor,
+    decode_cursor,
+    encode_cursor,
+    ordered_entries,
+    position_of,
+    record_submission,
+    scorecard_rank,
+    submission_score,
+)
+from .db_router import ReplicaReadMixin
+from .conditional import catalogue_validators, make_validators, not_modified_response, set_validators
+from .editor_events import EventBatchError, build_rows, decode_body, get_event_buffer
+from .submission_export import (
+    EXPORT_FORMATS,
+    ExportError,
+    filter_submissions,
+    iter_export,
+    parse_columns,
 )
-from .code_runner_service import execute_code, ExecutionResult
 
 User = get_user_model()
 
 
+class SandboxUnavailable(APIException):
+    """
+    The execution engine is overloaded or failing. Rendered as a 503 with a
+    Retry-After header (DRF adds it for any exception carrying ``wait``).
+    """
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'The code execution service is temporarily unavailable, please retry shortly.'
+    default_code = 'sandbox_unavailable'
+
+    def __init__(self, wait, detail=None, code=None):
+        super().__init__(detail, code)
+        self.wait = max(1, round(wait))
+
+
 class IsAdminOrReadOnly(permissions.BasePermission):
     """
     Custom permission to only allow admins to edit objects.
@@ -76,7 +137,8 @@ class UserViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=False, methods=['get'])
     def me(self, request):
         """Get current user information"""
-        serializer = self.get_serializer(request.user)
+        # request.user only carries the cached identity fields.
+        serializer = self.get_serializer(User.objects.get(pk=request.user.pk))
         return Response(serializer.data)
 
 
@@ -86,7 +148,23 @@ class StandardResultsSetPagination(PageNumberPagination):
     max_page_size = 1000
 
 
-class ProblemViewSet(viewsets.ModelViewSet):
+def values_list_response(view, queryset, serializer_class):
+    """
+    A (paginated) list response built with the serializer's ``.values()``
+    fast path (see ``ValuesRowsMixin``).
+    """
+    rows = serializer_class.values_queryset(queryset)
+    page = view.paginate_queryset(rows)
+    if page is not None:
+        return view.get_paginated_response(serializer_class.represent(page))
+    return Response(serializer_class.represent(rows))
+
+
+# Query params ProblemViewSet.get_queryset() filters on.
+PROBLEM_FILTER_PARAMS = frozenset(['tag', 'difficulty', 'slug', 'search'])
+
+
+class ProblemViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     """
     API endpoint for problems.
     Admin users can create/update/delete problems.
@@ -160,8 +238,122 @@ class ProblemViewSet(viewsets.ModelViewSet):
             
         return queryset.distinct()
 
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        etag, last_modified = catalogue_validators(request, queryset)
+        response = not_modified_response(request, etag, last_modified)
+        if response is not None:
+            return response
+        serializer_class = self.get_serializer_class()
+        if issubclass(serializer_class, ValuesRowsMixin):
+            response = values_list_response(self, queryset, serializer_class)
+        else:
+            response = super().list(request, *args, **kwargs)
+        return set_validators(response, etag, last_modified)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        if PROBLEM_FILTER_PARAMS.isdisjoint(request.query_params):
+            return self._retrieve_cached(request, kwargs[lookup_url_kwarg])
+        try:
+            queryset = self.filter_queryset(self.get_queryset()).filter(
+                **{self.lookup_field: kwargs[lookup_url_kwarg]})
+        except (TypeError, ValueError, ValidationError):
+            # Malformed lookup; let get_object() produce the usual 404.
+            return super().retrieve(request, *args, **kwargs)
+        etag, last_modified = catalogue_validators(request, queryset)
+        response = not_modified_response(request, etag, last_modified)
+        if response is not None:
+            return response
+        return set_validators(super().retrieve(request, *args, **kwargs), etag, last_modified)
+
+    def _retrieve_cached(self, request, lookup):
+        """
+        Serve a detail request from the problem cache. The cache does not
+        apply the list filters, so this is only used when none are given.
+        """
+        try:
+            snapshot = get_problem_cache().get(pk=int(lookup))
+        except ValueError:
+            snapshot = None
+        if snapshot is None or not (snapshot.enabled or request.user.is_staff):
+            raise Http404
+        etag, last_modified = make_validators(request, snapshot.updated_at, 1)
+        response = not_modified_response(request, etag, last_modified)
+        if response is not None:
+            return response
+        instance = snapshot.to_instance()
+        self.check_object_permissions(request, instance)
+        return set_validators(Response(self.get_serializer(instance).data), etag, last_modified)
+
+    @action(detail=True, methods=['get'])
+    def statement(self, request, pk=None):
+        """
+        The problem statement as sanitized HTML. Requested with
+        ?v=<description_hash>, the response can be cached indefinitely.
+        """
+        try:
+            snapshot = get_problem_cache().get(pk=int(pk))
+        except ValueError:
+            snapshot = None
+        if snapshot is None or not (snapshot.enabled or request.user.is_staff):
+            raise Http404
+        digest = snapshot.fields['description_hash']
+        etag = f'"{digest}"'
+        if request.META.get('HTTP_IF_NONE_MATCH') == etag:
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = HttpResponse(snapshot.fields['description_html'] or '', content_type='text/html; charset=utf-8')
+        response['ETag'] = etag
+        visibility = 'public' if snapshot.enabled else 'private'
+        if request.query_params.get('v') == digest:
+            response['Cache-Control'] = f'{visibility}, max-age=31536000, immutable'
+        else:
+            response['Cache-Control'] = f'{visibility}, no-cache'
+        return response
 
-class SubmissionViewSet(viewsets.ModelViewSet):
+    @action(detail=True, methods=['get'])
+    def leaderboard(self, request, pk=None):
+        """
+        Fastest passed solve per user on this problem.
+        Query params: language, window (day|week|month|all), limit.
+        """
+        try:
+            snapshot = get_problem_cache().get(pk=int(pk))
+        except ValueError:
+            snapshot = None
+        if snapshot is None or not (snapshot.enabled or request.user.is_staff):
+            raise Http404
+        try:
+            limit = max(0, int(request.query_params.get('limit', 0))) or None
+            results = get_problem_leaderboard(snapshot.id, language=request.query_params.get('language'),
+                                              window=request.query_params.get('window', 'all'), limit=limit)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'problem': snapshot.id, 'results': results})
+
+    @action(detail=False, methods=['get'], url_path='export', permission_classes=[permissions.IsAdminUser])
+    def export_ndjson(self, request):
+        """
+        Stream every problem, including harness files and reference solutions, as NDJSON.
+        """
+        response = StreamingHttpResponse(iter_problems_ndjson(), content_type='application/x-ndjson')
+        response['Content-Disposition'] = 'attachment; filename="problems.ndjson"'
+        return response
+
+    @action(detail=False, methods=['post'], url_path='import', permission_classes=[permissions.IsAdminUser])
+    def import_ndjson(self, request):
+        """
+        Upsert problems by slug from an NDJSON request body, read line by line.
+        """
+        stream = request.stream
+        if stream is None:
+            return Response({'error': 'Request body is empty'}, status=status.HTTP_400_BAD_REQUEST)
+        summary = import_problems_ndjson(stream)
+        return Response(summary)
+
+
+class SubmissionViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     """
     API endpoint for submissions.
     Users can create submissions and view their own submissions.
@@ -169,6 +361,8 @@ class SubmissionViewSet(viewsets.ModelViewSet):
     """
     permission_classes = [permissions.IsAuthenticated, IsOwnerOrAdmin]
     pagination_class = StandardResultsSetPagination
+    # A user's own recent submissions are read from the primary (see api/db_router.py).
+    replica_actions = {'stats'}
     
     def get_queryset(self):
         """
@@ -177,6 +371,9 @@ class SubmissionViewSet(viewsets.ModelViewSet):
         """
         user = self.request.user
         queryset = Submission.objects.all()
+        if self.action == 'retrieve':
+            # One query for the detail view; the code is only decompressed when serialized.
+            queryset = queryset.select_related('problem', 'user', 'code_blob')
 
         if not user.is_staff:
             queryset = queryset.filter(user=user)
@@ -191,6 +388,9 @@ class SubmissionViewSet(viewsets.ModelViewSet):
         
         return queryset.order_by('-submitted_at') # Order by most recent
     
+    def list(self, request, *args, **kwargs):
+        return values_list_response(self, self.filter_queryset(self.get_queryset()), SubmissionResultSerializer)
+
     def get_serializer_class(self):
         """
         Use different serializers based on action
@@ -200,7 +400,51 @@ class SubmissionViewSet(viewsets.ModelViewSet):
         if self.action == 'retrieve':
             return SubmissionDetailSerializer
         return SubmissionResultSerializer
+
+    def get_throttles(self):
+        """
+        Only submission creation consumes sandbox capacity, so only it is rate limited.
+        """
+        if self.action == 'create':
+            return [SubmissionRateThrottle()]
+        return super().get_throttles()
     
+    def create(self, request, *args, **kwargs):
+        """
+        Judge a submission once per idempotency key (see api/idempotency.py);
+        a repeated request gets the original submission back.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            key = idempotency_request_key(request, serializer.validated_data)
+            fingerprint = idempotency_request_fingerprint(serializer.validated_data)
+            claimed = claim_idempotency_key(key, request.user.pk, fingerprint)
+            if not claimed:
+                original = wait_for_submission(key)
+                if original is not None:
+                    return Response(self.get_serializer(original).data, status=status.HTTP_200_OK,
+                                    headers={'Idempotent-Replayed': 'true'})
+                # Either still being judged, or the original request failed and
+                # released the key, in which case this one takes over.
+                claimed = claim_idempotency_key(key, request.user.pk, fingerprint)
+        except IdempotencyKeyReused as e:
+            return Response({'error': str(e)}, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+        except IdempotencyError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if not claimed:
+            return Response({'error': 'A submission with this key is still being judged'},
+                            status=status.HTTP_409_CONFLICT, headers={'Retry-After': '1'})
+
+        try:
+            self.perform_create(serializer)
+        except BaseException:
+            release_idempotency_key(key)
+            raise
+        complete_idempotency_key(key, serializer.instance)
+        headers = self.get_success_headers(serializer.data)
+        return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
+
     def perform_create(self, serializer):
         """
         Set the user, submitted_at, process code execution, and determine rank.
@@ -216,14 +460,25 @@ class SubmissionViewSet(viewsets.ModelViewSet):
         # with 'filename' and 'content', which matches the expected ExecutionFile structure.
         harness_files = problem_instance.harness_eval_files or []
 
-        # Call the code execution service (currently mock)
-        # version is not explicitly stored in Submission model yet, passing None or a default.
-        execution_result: ExecutionResult = execute_code(
-            language=language,
-            version=None, # Or a default like "latest" if appropriate
-            code_to_execute=code_to_execute,
-            harness_eval_files=harness_files
-        )
+        # Pinned or newest engine version for the language; None lets the
+        # engine choose when the runtime list is unavailable.
+        try:
+            version = get_runtime_catalogue().resolve(language)
+        except UnsupportedLanguage as e:
+            raise DRFValidationError({'language': [str(e)]})
+
+        # Call the code execution service
+        try:
+            with judging_in_flight.track_in_progress():
+                execution_result: ExecutionResult = execute_code(
+                    language=language,
+                    version=version,
+                    code_to_execute=code_to_execute,
+                    harness_eval_files=harness_files
+                )
+        except EngineUnavailable as e:
+            # Nothing is saved, so the client can safely resubmit.
+            raise SandboxUnavailable(wait=e.retry_after)
 
         # Determine 'passed' status
         # For this mock, we'll consider 'success' status as passed.
@@ -235,17 +490,20 @@ class SubmissionViewSet(viewsets.ModelViewSet):
         if not (final_duration_ms >= 0 and final_duration_ms <= 24 * 60 *60 * 1000):
             final_duration_ms = 24 * 60 *60 * 1000 # 24 hours
 
-        # Determine rank based on duration and problem's time_thresholds
-        calculated_rank = "VP of Engineering" # Default rank
-        if passed_status and final_duration_ms is not None and problem_instance.time_thresholds:
-            # Sort thresholds by max_minutes to ensure correct rank assignment
-            # Assuming thresholds are like: [{ "max_minutes":3,"rank":"Wizard" }, ...]
-            sorted_thresholds = sorted(problem_instance.time_thresholds, key=lambda t: t.get('max_minutes', float('inf')))
-            duration_minutes = final_duration_ms / (1000 * 60)
-            for threshold in sorted_thresholds:
-                if duration_minutes <= threshold.get('max_minutes', float('inf')):
-                    calculated_rank = threshold.get('rank', calculated_rank)
-                    break
+        # Determine rank based on duration and problem's time_thresholds,
+        # compiled once per problem version
+        calculated_rank = rank_table(problem_instance).rank_for(passed_status, final_duration_ms)
+
+        # Problems with complexity_sizes also measure how a passing solution
+        # scales compared with the reference (see api/complexity.py).
+        complexity = None
+        if passed_status and problem_instance.complexity_sizes:
+            try:
+                with judging_in_flight.track_in_progress():
+                    complexity = benchmark_submission(problem_instance, language, version, code_to_execute)
+            except EngineUnavailable:
+                # The verdict stands; only the benchmark is skipped.
+                complexity = {'status': 'unavailable', 'exponent': None, 'verdict': None}
         
         # Create and save the submission instance
         submission = serializer.save(
@@ -256,11 +514,38 @@ class SubmissionViewSet(viewsets.ModelViewSet):
             memory_kb=execution_result['memory_kb'],
             passed=passed_status,
             rank=calculated_rank,
-            raw_results=execution_result # Store the entire result from the service
+            complexity_exponent=complexity and complexity['exponent'],
+            complexity_verdict=complexity and complexity['verdict'],
+            # Piston reports the version it ran; the mock engine does not.
+            runtime_version=execution_result['engine_specific_response'].get('version') or version,
+            raw_results={**execution_result, 'complexity': complexity} if complexity else execution_result
         )
-        
-        # Optionally, you might want to trigger other actions here,
-        # like sending notifications or updating user stats (in a future step).
+
+        # Keep the leaderboards current; no-ops unless the submission changes them.
+        record_submission(submission)
+        note_problem_leaderboard_submission(submission)
+
+    @action(detail=False, methods=['get'], url_path='export', permission_classes=[permissions.IsAdminUser])
+    def export(self, request):
+        """
+        Stream submissions as CSV or NDJSON for analytics.
+        Query params: output (csv|ndjson), columns (comma separated),
+        since/until (ISO date or datetime), problem_id, user_id, username.
+        """
+        export_format = request.query_params.get('output', 'csv')
+        if export_format not in EXPORT_FORMATS:
+            return Response({'error': f"output must be one of: {', '.join(EXPORT_FORMATS)}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            columns = parse_columns(request.query_params.get('columns'))
+            queryset = filter_submissions(request.query_params)
+        except ExportError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        response = StreamingHttpResponse(iter_export(queryset, columns, export_format),
+                                         content_type=EXPORT_FORMATS[export_format])
+        response['Content-Disposition'] = f'attachment; filename="submissions.{export_format}"'
+        return response
 
     @action(detail=False, methods=['get'])
     def stats(self, request):
@@ -289,7 +574,7 @@ class SubmissionViewSet(viewsets.ModelViewSet):
         })
 
 
-class ScorecardView(APIView):
+class ScorecardView(ReplicaReadMixin, APIView):
     # permission_classes = [IsAuthenticated]
     permission_classes = [permissions.AllowAny]
     
@@ -308,36 +593,29 @@ class ScorecardView(APIView):
         else:
             user_to_display = request.user
 
-        # Fetch latest 1000 submissions for the user_to_display
-        latest_1000_submissions = Submission.objects.filter(
+        # Fetch latest 1000 submissions for the user_to_display, only the
+        # columns the scorecard needs
+        latest_1000_submissions = list(Submission.objects.filter(
                 user=user_to_display,
                 duration_ms__gte=5000
-            ).order_by('-submitted_at')[:1000]
-
-        print(latest_1000_submissions, flush=True)
+            ).order_by('-submitted_at').values('problem_id', 'passed', 'rank')[:1000])
+        submissions_by_problem = defaultdict(list)
+        for s in latest_1000_submissions:
+            submissions_by_problem[s['problem_id']].append(s)
 
         # Get all enabled problems for coverage calculation
-        rank_to_score = {
-            'Wizard': 6,
-            'Senior Engineer': 5,
-            'Mid-Level Engineer': 4,
-            'New Grad': 3,
-            'Participation Trophy': 2,
-            'Newbie': 1
-        }
-        problems = Problem.objects.filter(enabled=True)
+        problems = get_problem_cache().enabled_problems()
         problems_and_status = []
         for problem in problems:
             attempted = False
             passed = False
             rank_scores = []
-            for s in latest_1000_submissions:
-                if s.problem_id != problem.id: continue
+            for s in submissions_by_problem.get(problem.id, ()):
                 attempted = True
                 rank_scores.append(0)
-                if not s.passed: continue
+                if not s['passed']: continue
                 passed = True
-                rank_scores.append(rank_to_score.get(s.rank, 0))
+                rank_scores.append(submission_score(s['passed'], s['rank']))
             problems_and_status.append({
                 "id": problem.id,
                 "title": problem.title,
@@ -351,26 +629,13 @@ class ScorecardView(APIView):
         passed_count = len([p for p in problems_and_status if p["status"] == "✅"])
         rank_scores = [p['rank_score'] for p in problems_and_status if p['rank_score'] is not None]
         avg_rank_score = sum(rank_scores) / len(rank_scores) if rank_scores else 0
-        scorecard_problem_coverage = attempted_count / problems.count()
-
-        scorecard_rank = "Newbie"
-        if avg_rank_score >= 5.5 and scorecard_problem_coverage >= 0.8:
-            scorecard_rank = "Wizard"
-        elif avg_rank_score >= 4.5 and scorecard_problem_coverage >= 0.7:
-            scorecard_rank = "Senior Engineer"
-        elif avg_rank_score >= 3.5 and scorecard_problem_coverage >= 0.5:
-            scorecard_rank = "Mid-Level Engineer"
-        elif avg_rank_score >= 2.5 and scorecard_problem_coverage >= 0.3:
-            scorecard_rank = "New Grad"
-        elif avg_rank_score >= 1.5 and scorecard_problem_coverage >= 0.1:
-            scorecard_rank = "Participation Trophy"
-            
+        scorecard_problem_coverage = attempted_count / len(problems)
 
         # Dummy scorecard data
         scorecard_data = {
             "username": user_to_display.username,
             "avg_rank_score": avg_rank_score,
-            "scorecard_rank": scorecard_rank,
+            "scorecard_rank": scorecard_rank(avg_rank_score, scorecard_problem_coverage),
             "scorecard_problem_coverage": scorecard_problem_coverage,
             "problems_and_status": problems_and_status,
             'passed_count': passed_count,
@@ -378,11 +643,169 @@ class ScorecardView(APIView):
         return Response(scorecard_data)
 
 
+def _leaderboard_row(entry, position, enabled_count):
+    coverage = entry['attempted_count'] / enabled_count if enabled_count else 0
+    return {
+        "position": position,
+        "username": entry['user__username'],
+        "avg_rank_score": entry['avg_rank_score'],
+        "scorecard_rank": scorecard_rank(entry['avg_rank_score'], coverage),
+        "scorecard_problem_coverage": coverage,
+        "passed_count": entry['passed_count'],
+    }
+
+
+LEADERBOARD_FIELDS = ('user__username', 'avg_rank_score', 'attempted_count', 'passed_count')
+
+
+class LeaderboardView(APIView):
+    """
+    Global leaderboard, best first. Pages follow ``next`` (a keyset cursor)
+    rather than page numbers, so deep pages cost the same as the first.
+    Users with equal scores share a position.
+    """
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request, *args, **kwargs):
+        paginator = StandardResultsSetPagination()
+        page_size = paginator.get_page_size(request)
+        after, position, seen, previous_key = None, 0, 0, None
+        cursor = request.query_params.get('cursor')
+        if cursor:
+            try:
+                after, position, seen = decode_cursor(cursor)
+            except InvalidCursor as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            previous_key = after[:3]
+        rows = list(ordered_entries(after).values('user_id', *LEADERBOARD_FIELDS)[:page_size + 1])
+        enabled_count = len(get_problem_cache().enabled_problems())
+        results = []
+        for entry in rows[:page_size]:
+            key = (entry['avg_rank_score'], entry['attempted_count'], entry['passed_count'])
+            seen += 1
+            if key != previous_key:
+                position = seen
+            previous_key = key
+            results.append(_leaderboard_row(entry, position, enabled_count))
+        next_url = None
+        if len(rows) > page_size:
+            last = rows[page_size - 1]
+            next_cursor = encode_cursor((*previous_key, last['user_id']), position, seen)
+            next_url = replace_query_param(request.build_absolute_uri(), 'cursor', next_cursor)
+        return Response({'next': next_url, 'results': results})
+
+
+class LeaderboardMeView(APIView):
+    """
+    The requesting user's leaderboard row and position; null if they have
+    no counted submissions yet.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        entry = LeaderboardEntry.objects.filter(user_id=request.user.pk).values(*LEADERBOARD_FIELDS).first()
+        if entry is None:
+            return Response(None)
+        position = position_of(LeaderboardEntry(**{k: entry[k] for k in LEADERBOARD_FIELDS[1:]}))
+        return Response(_leaderboard_row(entry, position, len(get_problem_cache().enabled_problems())))
+
+
+class EditorEventIngestView(APIView):
+    """
+    Accept a batch of editor interaction events for one problem attempt:
+    {"problem": id, "attempt_id": uuid, "events": [{"type": str, "t": epoch_ms, "data": {...}}]}.
+    The body may be sent with Content-Encoding: gzip or deflate.
+    Events are buffered and written asynchronously; a full buffer yields 503 + Retry-After.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        max_events = getattr(settings, 'EDITOR_EVENTS_MAX_BATCH', 5000)
+        try:
+            data = decode_body(request.body, request.META.get('HTTP_CONTENT_ENCODING', ''))
+            problem_id, rows = build_rows(data, request.user.id, max_events)
+        except EventBatchError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        snapshot = get_problem_cache().get(pk=problem_id)
+        if snapshot is None or not (snapshot.enabled or request.user.is_staff):
+            return Response({'error': 'Problem not found'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if not get_event_buffer().offer(rows):
+            return Response({'error': 'Event ingestion is overloaded, retry later'},
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            headers={'Retry-After': '1'})
+        return Response({'accepted': len(rows)}, status=status.HTTP_202_ACCEPTED)
+
+
+class MetricsView(APIView):
+    """
+    Expose this process's metrics in the Prometheus text format.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class ProfileListView(APIView):
+    """
+    Stored request profiles, newest first. See api/profiling.py.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return Response(list_profiles())
+
+
+class ProfileDownloadView(APIView):
+    """
+    Download a profile report (JSON: SQL queries and top functions), or with
+    ?output=pstats the raw cProfile dump for snakeviz/pstats.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, profile_id, *args, **kwargs):
+        raw = request.query_params.get('output') == 'pstats'
+        path = artifact_path(profile_id, 'prof' if raw else 'json')
+        if path is None or not os.path.exists(path):
+            raise Http404
+        return FileResponse(open(path, 'rb'), as_attachment=True, filename=os.path.basename(path),
+                            content_type='application/octet-stream' if raw else 'application/json')
+
+
+class HealthView(APIView):
+    """
+    Liveness: the process is up and serving requests. Touches no dependencies.
+    """
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request, *args, **kwargs):
+        return Response({'status': 'ok'})
+
+
+class ReadinessView(APIView):
+    """
+    Readiness: the database and the execution engine both answer. Returns 503
+    with the failing check otherwise. Each check reports its latency.
+    """
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request, *args, **kwargs):
+        checks = {'database': probe_database(), 'engine': probe_engine()}
+        ready = all(check['ok'] for check in checks.values())
+        return Response({'status': 'ready' if ready else 'not_ready', 'checks': checks},
+                        status=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE)
+
+
 class ChangePasswordView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request, *args, **kwargs):
-        user = request.user
+        # Load the full row: request.user is built from cached fields, which
+        # must not be written back. Saving invalidates the cached user.
+        user = User.objects.get(pk=request.user.pk)
         current_password = request.data.get('current_password')
         new_password = request.data.get('new_password')
 
@@ -0,0 +1,85 @@
+"""
+Measure storage saved by the deduplicated code blob store and the latency of
+submission detail reads (fetch + lazy decompression).
+
+Run from the backend directory against a migrated (disposable) database:
+
+    python benchmarks/bench_code_blobs.py [submissions]
+
+Seeds submissions for the first enabled problem with a realistic mix:
+unmodified templates, the reference solution submitted by many users, and
+lightly edited retries, then deletes them again.
+"""
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'speedruncoding.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.contrib.auth.models import User  # noqa: E402
+from django.db.models import Sum  # noqa: E402
+from django.db.models.functions import Length  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from api.models import CodeBlob, Problem, Submission  # noqa: E402
+
+
+def sample_code(problem: Problem, rng: random.Random, attempt: int) -> str:
+    language = rng.choice(['python', 'cpp'])
+    template = problem.solution_templates.get(language, '')
+    reference = problem.reference_solutions.get(language, template)
+    roll = rng.random()
+    if roll < 0.3:
+        return template
+    if roll < 0.7:
+        return reference
+    # A retry: the reference with a small edit
+    return reference + f"\n// attempt {attempt % 50}\n"
+
+
+def main(count: int) -> None:
+    rng = random.Random(42)
+    problem = Problem.objects.filter(enabled=True).order_by('id').first()
+    user, _ = User.objects.get_or_create(username='bench-code-blobs')
+    now = timezone.now()
+    blobs_before = set(CodeBlob.objects.values_list('sha256', flat=True))
+
+    logical_bytes = 0
+    ids = []
+    for i in range(count):
+        code = sample_code(problem, rng, i)
+        logical_bytes += len(code.encode('utf-8'))
+        submission = Submission.objects.create(
+            user=user, problem=problem, language='python', code=code,
+            started_at=now, submitted_at=now, passed=False,
+        )
+        ids.append(submission.id)
+
+    new_blobs = CodeBlob.objects.exclude(sha256__in=blobs_before)
+    stored_bytes = new_blobs.aggregate(total=Sum(Length('data')))['total'] or 0
+    print(f"submissions: {count}, distinct blobs: {new_blobs.count()}")
+    print(f"code bytes submitted: {logical_bytes:,}")
+    print(f"code bytes stored:    {stored_bytes:,} ({100 * (1 - stored_bytes / logical_bytes):.1f}% saved)")
+
+    timings = []
+    for pk in rng.sample(ids, min(1000, len(ids))):
+        started = time.perf_counter()
+        Submission.objects.select_related('code_blob').get(pk=pk).code
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    print(f"detail read: mean {statistics.mean(timings):.3f} ms, p99 {timings[int(len(timings) * 0.99)]:.3f} ms")
+
+    Submission.objects.filter(id__in=ids).delete()
+    new_blobs.filter(submissions__isnull=True).delete()
+    user.delete()
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
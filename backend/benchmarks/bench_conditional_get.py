@@ -0,0 +1,60 @@
+"""
+Measure what conditional GETs and gzip save on the problem catalogue.
+
+Run from the backend directory against a migrated database:
+
+    python benchmarks/bench_conditional_get.py [requests]
+
+Requests the problem list and one problem detail as a regular user three
+ways: plain, gzip-compressed, and revalidated with ``If-None-Match``.
+Reports bytes on the wire and server time per request for each.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'speedruncoding.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.contrib.auth.models import User  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from api.models import Problem  # noqa: E402
+
+USERNAME = 'bench-conditional-get'
+
+
+def measure(client: APIClient, label: str, path: str, count: int, **headers) -> None:
+    started = time.perf_counter()
+    size = 0
+    for _ in range(count):
+        response = client.get(path, **headers)
+        size = len(response.content)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<28} {response.status_code}  {size:>8,} bytes  {elapsed / count * 1000:7.2f} ms/request")
+
+
+def main(count: int) -> None:
+    user, _ = User.objects.get_or_create(username=USERNAME)
+    client = APIClient()
+    client.force_authenticate(user)
+    problem = Problem.objects.filter(enabled=True).first()
+    try:
+        paths = [('list', '/api/problems/?page_size=100')]
+        if problem is not None:
+            paths += [('detail', f'/api/problems/{problem.pk}/'), ('slug', f'/api/problems/?slug={problem.slug}')]
+        for name, path in paths:
+            etag = client.get(path)['ETag']
+            measure(client, f"{name} plain", path, count)
+            measure(client, f"{name} gzip", path, count, HTTP_ACCEPT_ENCODING='gzip')
+            measure(client, f"{name} If-None-Match", path, count, HTTP_IF_NONE_MATCH=etag)
+    finally:
+        user.delete()
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
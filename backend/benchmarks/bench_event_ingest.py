@@ -0,0 +1,61 @@
+"""
+Measure editor event ingestion throughput (validation + buffer + COPY).
+
+Run from the backend directory against a migrated (disposable) database:
+
+    python benchmarks/bench_event_ingest.py [total_events] [batch_size]
+
+The per-node target is a sustained 10k events/s.
+"""
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'speedruncoding.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from api.editor_events import EventBuffer, build_rows  # noqa: E402
+from api.models import EditorEvent  # noqa: E402
+
+BENCH_USER_ID = 0
+
+
+def main(total: int, batch_size: int) -> None:
+    buffer = EventBuffer(max_rows=total, flush_size=5000, flush_interval=0.2)
+    attempt_id = str(uuid.uuid4())
+    now_ms = int(time.time() * 1000)
+    batch = {
+        'problem': 0,
+        'attempt_id': attempt_id,
+        'events': [{'type': 'keystroke', 't': now_ms + i, 'data': {'key': 'a', 'line': i % 80, 'col': i % 120}}
+                   for i in range(batch_size)],
+    }
+
+    started = time.perf_counter()
+    accepted = 0
+    while accepted < total:
+        _, rows = build_rows(batch, BENCH_USER_ID, max_events=batch_size)
+        if buffer.offer(rows):
+            accepted += len(rows)
+        else:
+            time.sleep(0.001)
+    validated = time.perf_counter()
+    while buffer.pending:
+        time.sleep(0.01)
+    finished = time.perf_counter()
+
+    written = EditorEvent.objects.filter(attempt_id=attempt_id).count()
+    EditorEvent.objects.filter(attempt_id=attempt_id).delete()
+    print(f"events: {accepted} accepted, {written} written")
+    print(f"accept: {accepted / (validated - started):,.0f} events/s")
+    print(f"end-to-end: {written / (finished - started):,.0f} events/s")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 200)
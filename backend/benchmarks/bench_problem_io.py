@@ -0,0 +1,70 @@
+"""
+Measure NDJSON problem import/export throughput.
+
+Run from the backend directory against a migrated (disposable) database:
+
+    python benchmarks/bench_problem_io.py [count]
+
+Imports ``count`` synthetic problems (insert path), imports them again
+(update path), exports the whole table, then deletes the synthetic rows.
+"""
+import io
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'speedruncoding.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from api.models import Problem  # noqa: E402
+from api.problem_io import import_problems_ndjson, iter_problems_ndjson  # noqa: E402
+
+SLUG_PREFIX = 'bench-problem-io-'
+
+
+def synthetic_ndjson(count: int) -> str:
+    harness = "def check(solution):\n" + "    assert solution() is not None\n" * 50
+    lines = []
+    for i in range(count):
+        lines.append(json.dumps({
+            'slug': f'{SLUG_PREFIX}{i}',
+            'title': f'Benchmark problem {i}',
+            'description_md': 'Lorem ipsum dolor sit amet. ' * 40,
+            'tags': ['benchmark', f'group-{i % 10}'],
+            'difficulty': 'Easy',
+            'enabled': False,
+            'time_thresholds': [{'max_minutes': 5, 'rank': 'Wizard'}, {'max_minutes': 999999, 'rank': 'Slow Poke'}],
+            'solution_templates': {'python': 'class Solution:\n  pass\n'},
+            'reference_solutions': {'python': 'class Solution:\n  def solve(self):\n    return 1\n'},
+            'harness_eval_files': [{'filename': 'eval_submission_codes.py', 'content': harness}],
+        }))
+    return "\n".join(lines) + "\n"
+
+
+def timed(label: str, count: int, fn):
+    started = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<8} {count} problems in {elapsed:.2f}s ({count / elapsed:,.0f} problems/s)")
+    return result
+
+
+def main(count: int) -> None:
+    payload = synthetic_ndjson(count)
+    print(f"payload: {len(payload) / 1e6:.1f} MB")
+    try:
+        timed("insert", count, lambda: import_problems_ndjson(io.StringIO(payload)))
+        timed("update", count, lambda: import_problems_ndjson(io.StringIO(payload)))
+        exported = Problem.objects.filter(slug__startswith=SLUG_PREFIX)
+        timed("export", count, lambda: sum(1 for _ in iter_problems_ndjson(exported)))
+    finally:
+        Problem.objects.filter(slug__startswith=SLUG_PREFIX).delete()
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
@@ -0,0 +1,57 @@
+"""
+Measure the per-request cost of the submission token-bucket limiter.
+
+Run from the backend directory against a migrated database:
+
+    python benchmarks/bench_rate_limit.py [iterations]
+
+Each iteration is one ``SubmissionRateThrottle.allow_request`` call, i.e. a
+per-user and a global bucket update. The target is well under 1 ms.
+"""
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'speedruncoding.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from types import SimpleNamespace  # noqa: E402
+
+from django.test import override_settings  # noqa: E402
+
+from api.models import RateLimitBucket  # noqa: E402
+from api.rate_limit import SubmissionRateThrottle  # noqa: E402
+
+# Large buckets so every request is admitted and we time the common path.
+BENCH_LIMITS = {
+    'regular': {'capacity': 10 ** 9, 'refill_per_second': 10 ** 6},
+    'staff': None,
+    'global': {'capacity': 10 ** 9, 'refill_per_second': 10 ** 6},
+}
+
+
+def main(iterations: int) -> None:
+    request = SimpleNamespace(user=SimpleNamespace(pk='bench', is_staff=False))
+    throttle = SubmissionRateThrottle()
+    timings = []
+    with override_settings(SUBMISSION_RATE_LIMITS=BENCH_LIMITS):
+        for _ in range(iterations):
+            started = time.perf_counter()
+            throttle.allow_request(request, None)
+            timings.append((time.perf_counter() - started) * 1000)
+    RateLimitBucket.objects.filter(key__in=['submissions:user:bench', 'submissions:global']).delete()
+
+    timings.sort()
+    print(f"iterations: {iterations}")
+    print(f"mean: {statistics.mean(timings):.3f} ms")
+    print(f"p50:  {timings[len(timings) // 2]:.3f} ms")
+    print(f"p99:  {timings[int(len(timings) * 0.99)]:.3f} ms")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
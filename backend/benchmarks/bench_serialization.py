@@ -0,0 +1,73 @@
+"""
+Compare list serialization paths per 1000 rows.
+
+Run from the backend directory against a migrated database with some
+submissions (a throwaway user's rows are created if there are fewer than
+``rows``):
+
+    python benchmarks/bench_serialization.py [rows]
+
+For problems and submissions, times building the response body from model
+instances through the DRF serializer and the stdlib JSON renderer (the old
+path), then from ``.values()`` rows through ``ValuesRowsMixin`` and
+``ORJSONRenderer`` (the new one). Database time is included in both.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'speedruncoding.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.contrib.auth.models import User  # noqa: E402
+from django.utils import timezone  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from api.models import Problem, Submission  # noqa: E402
+from api.renderers import ORJSONRenderer  # noqa: E402
+from api.serializers import ProblemListSerializer, SubmissionResultSerializer  # noqa: E402
+
+USERNAME = 'bench-serialization'
+REPEAT = 5
+
+
+def measure(label: str, count: int, build) -> None:
+    best = float('inf')
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        build()
+        best = min(best, time.perf_counter() - started)
+    print(f"{label:<32} {best / max(count, 1) * 1000 * 1000:8.2f} ms per 1000 rows")
+
+
+def compare(name: str, queryset, serializer_class, count: int) -> None:
+    measure(f"{name} serializer + json", count,
+            lambda: JSONRenderer().render(serializer_class(queryset.all(), many=True).data))
+    measure(f"{name} values + orjson", count,
+            lambda: ORJSONRenderer().render(serializer_class.represent(serializer_class.values_queryset(queryset))))
+
+
+def main(rows: int) -> None:
+    user, _ = User.objects.get_or_create(username=USERNAME)
+    try:
+        problem = Problem.objects.first()
+        missing = rows - Submission.objects.count()
+        now = timezone.now()
+        for _ in range(max(missing, 0)):
+            Submission.objects.create(user=user, problem=problem, language='python', code='pass',
+                                      started_at=now, submitted_at=now, passed=True,
+                                      duration_ms=60000, rank='Wizard')
+        submissions = Submission.objects.select_related('problem').order_by('-submitted_at')[:rows]
+        compare('submissions', submissions, SubmissionResultSerializer, len(submissions))
+        problems = Problem.objects.order_by('title')
+        compare('problems', problems, ProblemListSerializer, problems.count())
+    finally:
+        user.delete()
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
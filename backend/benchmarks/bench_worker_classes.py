@@ -0,0 +1,151 @@
+"""
+Measure concurrent-submission capacity of each gunicorn worker class.
+
+Run from the backend directory against a migrated database:
+
+    python benchmarks/bench_worker_classes.py [concurrency] [engine_delay_seconds] [workers]
+
+Starts a stand-in execution engine that answers every run after
+``engine_delay_seconds``, then for each worker class (``sync``, ``gthread``
+and ``gevent`` if installed) serves the app with gunicorn.conf.py and fires
+``concurrency`` submissions at once. Reports wall time, throughput and
+latency percentiles. Rate limits and the engine concurrency limit are raised
+so only the serving layer is measured.
+"""
+import concurrent.futures
+import importlib.util
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'speedruncoding.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+import requests  # noqa: E402
+from django.contrib.auth.models import User  # noqa: E402
+from django.utils import timezone  # noqa: E402
+from rest_framework_simplejwt.tokens import AccessToken  # noqa: E402
+
+from api.models import Problem, Submission  # noqa: E402
+
+USERNAME = 'bench-worker-classes'
+ENGINE_RESPONSE = json.dumps({
+    'run': {'stdout': 'Correct', 'stderr': '', 'output': 'Correct', 'code': 0, 'time': 0.1, 'memory': 1024},
+}).encode()
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_fake_engine(delay: float) -> str:
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            time.sleep(delay)
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(ENGINE_RESPONSE)))
+            self.end_headers()
+            self.wfile.write(ENGINE_RESPONSE)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', free_port()), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}/api/v2/execute"
+
+
+def wait_for_port(port: int, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"gunicorn did not start listening on {port}")
+
+
+def run(worker_class: str, workers: int, engine_url: str, token: str, problem: Problem, concurrency: int) -> None:
+    port = free_port()
+    env = {
+        **os.environ,
+        'GUNICORN_WORKER_CLASS': worker_class,
+        'GUNICORN_WORKERS': str(workers),
+        'GUNICORN_BIND': f'127.0.0.1:{port}',
+        'GUNICORN_ACCESS_LOG': '',
+        'PISTON_API_URL': engine_url,
+        'ENGINE_CONCURRENCY_INITIAL': '1000',
+        'ENGINE_CONCURRENCY_MAX': '1000',
+        'SUBMISSION_RATE_CAPACITY': '1000000',
+        'SUBMISSION_GLOBAL_RATE_CAPACITY': '1000000',
+    }
+    server = subprocess.Popen(['gunicorn', '-c', 'gunicorn.conf.py', 'speedruncoding.wsgi'],
+                              cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_port(port)
+        url = f'http://127.0.0.1:{port}/api/submissions/'
+        body = {
+            'problem': problem.id,
+            'language': 'python',
+            'code': problem.reference_solutions.get('python', ''),
+            'started_at': timezone.now().isoformat(),
+        }
+
+        def submit() -> float:
+            started = time.perf_counter()
+            response = requests.post(url, json=body, headers={'Authorization': f'Bearer {token}'}, timeout=120)
+            response.raise_for_status()
+            return time.perf_counter() - started
+
+        started = time.perf_counter()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as pool:
+            futures = [pool.submit(submit) for _ in range(concurrency)]
+            latencies = sorted(f.result() for f in futures if f.exception() is None)
+        elapsed = time.perf_counter() - started
+        failed = concurrency - len(latencies)
+        p50 = latencies[len(latencies) // 2] if latencies else float('nan')
+        p95 = latencies[int(len(latencies) * 0.95)] if latencies else float('nan')
+        print(f"{worker_class:<8} {elapsed:6.2f}s wall  {len(latencies) / elapsed:6.1f} submissions/s  "
+              f"p50 {p50:5.2f}s  p95 {p95:5.2f}s  failed {failed}")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main(concurrency: int, delay: float, workers: int) -> None:
+    engine_url = start_fake_engine(delay)
+    user, _ = User.objects.get_or_create(username=USERNAME)
+    token = str(AccessToken.for_user(user))
+    problem = next(p for p in Problem.objects.filter(enabled=True)
+                   if any(f['filename'] == 'eval_submission_codes.py' for f in p.harness_eval_files or []))
+    worker_classes = ['sync', 'gthread'] + (['gevent'] if importlib.util.find_spec('gevent') else [])
+    print(f"{concurrency} concurrent submissions, engine delay {delay}s, {workers} workers")
+    try:
+        for worker_class in worker_classes:
+            run(worker_class, workers, engine_url, token, problem, concurrency)
+    finally:
+        Submission.objects.filter(user=user).delete()
+        user.delete()
+
+
+if __name__ == '__main__':
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 64,
+        float(sys.argv[2]) if len(sys.argv) > 2 else 2.5,
+        int(sys.argv[3]) if len(sys.argv) > 3 else 2,
+    )
@@ -1,27 +1,13 @@
 #!/bin/bash
+set -e
 
-# Wait for database to be ready
-echo "Waiting for database..."
-sleep 5
-
-# Apply database migrations
-echo "Applying migrations..."
-python manage.py migrate
-
-# Create superuser if not exists
-echo "Creating superuser..."
-python manage.py shell -c "
-from django.contrib.auth.models import User
-try:
-    if not User.objects.filter(username='admin').exists():
-        User.objects.create_superuser('admin', 'admin@example.com', 'admin')
-        print('Superuser created.')
-    else:
-        print('Superuser already exists.')
-except Exception as e:
-    print(f'Error creating superuser: {e}')   
-"
+# Wait for the database (with backoff), apply pending migrations if there are
+# any, create the current and next table partitions and the default superuser.
+# One Django process instead of several keeps replica startup fast; partition
+# retention and statement re-rendering run on a schedule instead.
+echo "Preparing backend..."
+python manage.py bootstrap
 
 # Start server
 echo "Starting server..."
-exec "$@" 
\ No newline at end of file
+exec "$@"
@@ -0,0 +1,84 @@
+"""
+Gunicorn configuration for production serving:
+
+    gunicorn -c gunicorn.conf.py speedruncoding.wsgi
+
+Submissions block for seconds waiting on the execution engine, so workers
+are threaded (``gthread``) by default: each waiting request holds a thread,
+not a process. ``gevent`` works too if it is installed (plus ``psycogreen``
+so database calls yield). Every value can be overridden with a
+``GUNICORN_*`` environment variable.
+"""
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8005')
+
+# Load the app once in the master so workers fork with it already imported.
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+# Concurrent requests per gthread worker. Judging is I/O bound, so this can
+# be well above the CPU count; the engine guard caps calls into the sandbox.
+threads = int(os.environ.get('GUNICORN_THREADS', '8'))
+# Concurrent requests per gevent worker.
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', '100'))
+
+# An engine call is bounded at a few seconds (see api/code_runner_service.py);
+# these leave room for compile steps and hedged retries before a worker is
+# killed or a shutdown cuts requests off.
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '30'))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', '5'))
+
+# Recycle workers now and then to bound memory growth.
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', '5000'))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', '500'))
+
+# Heartbeat files on tmpfs; a slow overlay filesystem can stall workers.
+worker_tmp_dir = os.environ.get('GUNICORN_WORKER_TMP_DIR', '/dev/shm' if os.path.isdir('/dev/shm') else None)
+
+# Set GUNICORN_ACCESS_LOG to an empty string to turn access logging off.
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-') or None
+errorlog = '-'
+
+
+# Workers publish metric snapshots here so /api/metrics/ can merge them.
+metrics_dir = os.environ.get('METRICS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'speedruncoding-metrics'))
+
+
+def on_starting(server):
+    # Counters restart from zero with a new master.
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+
+def post_fork(server, worker):
+    from api.metrics import registry
+    registry.share(metrics_dir)
+
+    # Resolve engine runtime versions before the first submission arrives.
+    from api.runtimes import get_runtime_catalogue
+    get_runtime_catalogue().refresh_in_background()
+
+    if worker_class == 'gevent':
+        try:
+            from psycogreen.gevent import patch_psycopg
+        except ImportError:
+            server.log.warning("psycogreen is not installed; database calls will block gevent workers")
+        else:
+            patch_psycopg()
+
+
+def worker_exit(server, worker):
+    from api.metrics import registry
+    registry.write_snapshot()
+
+
+def child_exit(server, worker):
+    # Keep the worker's totals but drop its gauges and snapshot file.
+    from api.metrics import mark_process_dead
+    mark_process_dead(metrics_dir, worker.pid)
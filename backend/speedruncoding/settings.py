@@ -1,7 +1,10 @@
+import json
 import os
 from pathlib import Path
 from datetime import timedelta
 
+from corsheaders.defaults import default_headers
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -31,14 +34,23 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Compresses responses for clients that accept gzip; must come first so
+    # it sees the final response body.
+    'django.middleware.gzip.GZipMiddleware',
+    # Per-route latency and query counts (see api/middleware.py)
+    'api.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # Read-your-writes for replica reads (see api/db_router.py)
+    'api.db_router.ReplicaPinMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # Staff-requested and sampled request profiling (see api/profiling.py)
+    'api.profiling.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'speedruncoding.urls'
@@ -65,15 +77,15 @@ WSGI_APPLICATION = 'speedruncoding.wsgi.application'
 # Parse database URL from environment variable
 DATABASE_URL = os.environ.get('DATABASE_URL', 'postgres://postgres:postgres@db:5432/speedruncoding')
 
-# Parse the components from the URL
-db_user = DATABASE_URL.split('://')[1].split(':')[0]
-db_password = DATABASE_URL.split(':')[2].split('@')[0]
-db_host = DATABASE_URL.split('@')[1].split(':')[0]
-db_port = DATABASE_URL.split(':')[3].split('/')[0]
-db_name = DATABASE_URL.split('/')[-1]
 
-DATABASES = {
-    'default': {
+def _database_from_url(url):
+    # Parse the components from the URL
+    db_user = url.split('://')[1].split(':')[0]
+    db_password = url.split(':')[2].split('@')[0]
+    db_host = url.split('@')[1].split(':')[0]
+    db_port = url.split(':')[3].split('/')[0]
+    db_name = url.split('/')[-1]
+    return {
         'ENGINE': 'django.db.backends.postgresql',
         'NAME': db_name,
         'USER': db_user,
@@ -81,8 +93,47 @@ DATABASES = {
         'HOST': db_host,
         'PORT': db_port,
     }
+
+
+DATABASES = {
+    'default': _database_from_url(DATABASE_URL),
 }
 
+# Cache shared by all workers, e.g. redis://redis:6379/0 (see api/shared_cache.py).
+# Without it each process gets its own in-memory cache.
+CACHE_URL = os.environ.get('CACHE_URL')
+if CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+        }
+    }
+
+# Streaming read replicas, comma-separated URLs in the same format as
+# DATABASE_URL (see api/db_router.py). Tests read them through the primary.
+# A blackholed replica must fail fast, since it is probed during requests.
+REPLICA_CONNECT_TIMEOUT = int(os.environ.get('REPLICA_CONNECT_TIMEOUT', '2'))
+REPLICA_STATEMENT_TIMEOUT_MS = int(os.environ.get('REPLICA_STATEMENT_TIMEOUT_MS', '5000'))
+DATABASE_REPLICAS = []
+for _index, _url in enumerate(u.strip() for u in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if u.strip()):
+    DATABASES[f'replica_{_index}'] = {
+        **_database_from_url(_url),
+        'OPTIONS': {
+            'connect_timeout': REPLICA_CONNECT_TIMEOUT,
+            'options': f'-c statement_timeout={REPLICA_STATEMENT_TIMEOUT_MS}',
+        },
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica_{_index}')
+
+DATABASE_ROUTERS = ['api.db_router.ReadReplicaRouter']
+REPLICA_MAX_LAG_SECONDS = float(os.environ.get('REPLICA_MAX_LAG_SECONDS', '5'))
+REPLICA_CHECK_INTERVAL = float(os.environ.get('REPLICA_CHECK_INTERVAL', '5'))
+REPLICA_RETRY_SECONDS = float(os.environ.get('REPLICA_RETRY_SECONDS', '30'))
+# How long a user reads from the primary after writing something.
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', '15'))
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -102,14 +153,20 @@ AUTH_PASSWORD_VALIDATORS = [
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
-        'rest_framework.renderers.BrowsableAPIRenderer',
+        'api.renderers.ORJSONRenderer',
+        # The HTML browser is a development aid; it also slows error responses.
+        *(['rest_framework.renderers.BrowsableAPIRenderer'] if DEBUG else []),
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ],
 }
 
@@ -165,4 +222,100 @@ CORS_ALLOWED_ORIGINS = eval(os.environ.get(
     'CORS_ALLOWED_ORIGINS',
     '["http://localhost:3000","http://YOUR_EC2_IP:3000"]'
 ))
+# Let browsers send Idempotency-Key with submissions (see api/idempotency.py)
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
+
+# Execution engine protection (see api/engine_guard.py)
+ENGINE_BREAKER_ERROR_THRESHOLD = float(os.environ.get('ENGINE_BREAKER_ERROR_THRESHOLD', '0.5'))
+ENGINE_BREAKER_WINDOW = int(os.environ.get('ENGINE_BREAKER_WINDOW', '20'))
+ENGINE_BREAKER_MIN_CALLS = int(os.environ.get('ENGINE_BREAKER_MIN_CALLS', '5'))
+ENGINE_BREAKER_RESET_SECONDS = float(os.environ.get('ENGINE_BREAKER_RESET_SECONDS', '10'))
+ENGINE_CONCURRENCY_INITIAL = int(os.environ.get('ENGINE_CONCURRENCY_INITIAL', '8'))
+ENGINE_CONCURRENCY_MIN = int(os.environ.get('ENGINE_CONCURRENCY_MIN', '1'))
+ENGINE_CONCURRENCY_MAX = int(os.environ.get('ENGINE_CONCURRENCY_MAX', '32'))
+ENGINE_LATENCY_TARGET_MS = float(os.environ.get('ENGINE_LATENCY_TARGET_MS', '2500'))
+
+# Submission admission control (see api/rate_limit.py). Each bucket allows a
+# burst of `capacity` submissions refilled at `refill_per_second`; None disables it.
+SUBMISSION_RATE_LIMITS = {
+    'regular': {
+        'capacity': int(os.environ.get('SUBMISSION_RATE_CAPACITY', '10')),
+        'refill_per_second': float(os.environ.get('SUBMISSION_RATE_REFILL_PER_SECOND', '0.2')),
+    },
+    'staff': {
+        'capacity': int(os.environ.get('SUBMISSION_STAFF_RATE_CAPACITY', '60')),
+        'refill_per_second': float(os.environ.get('SUBMISSION_STAFF_RATE_REFILL_PER_SECOND', '2')),
+    },
+    'global': {
+        'capacity': int(os.environ.get('SUBMISSION_GLOBAL_RATE_CAPACITY', '200')),
+        'refill_per_second': float(os.environ.get('SUBMISSION_GLOBAL_RATE_REFILL_PER_SECOND', '20')),
+    },
+}
+
+# Execution engine endpoint (see api/code_runner_service.py)
+PISTON_API_URL = os.environ.get('PISTON_API_URL', 'http://piston:2000/api/v2/execute')
+# Runtime list refresh and per-language version pins, e.g.
+# ENGINE_PINNED_VERSIONS='{"python": "3.10.0"}' (see api/runtimes.py)
+ENGINE_RUNTIMES_REFRESH_SECONDS = int(os.environ.get('ENGINE_RUNTIMES_REFRESH_SECONDS', '300'))
+ENGINE_RUNTIMES_TIMEOUT = float(os.environ.get('ENGINE_RUNTIMES_TIMEOUT', '2.0'))
+ENGINE_PINNED_VERSIONS = json.loads(os.environ.get('ENGINE_PINNED_VERSIONS', '{}'))
+# A submission "scales" when its fitted growth exponent is at most the
+# reference solution's plus this (see api/complexity.py).
+COMPLEXITY_TOLERANCE = float(os.environ.get('COMPLEXITY_TOLERANCE', '0.3'))
+# Engine runs in flight per submission for harnesses that declare test shards,
+# and the per-process pool they share. The pool defaults to one window per
+# request thread (GUNICORN_THREADS, see gunicorn.conf.py) so concurrent
+# submissions don't queue behind each other's shards.
+ENGINE_SHARD_PARALLELISM = int(os.environ.get('ENGINE_SHARD_PARALLELISM', '4'))
+ENGINE_SHARD_POOL_SIZE = int(os.environ.get(
+    'ENGINE_SHARD_POOL_SIZE', str(int(os.environ.get('GUNICORN_THREADS', '8')) * ENGINE_SHARD_PARALLELISM)))
+
+# Hedged engine requests (see api/hedging.py). Off by default; when on, runs
+# slower than the given latency percentile are re-dispatched to
+# PISTON_HEDGE_API_URL (or the primary endpoint if unset).
+ENGINE_HEDGING_ENABLED = os.environ.get('ENGINE_HEDGING_ENABLED', '0') == '1'
+PISTON_HEDGE_API_URL = os.environ.get('PISTON_HEDGE_API_URL')
+ENGINE_HEDGE_PERCENTILE = float(os.environ.get('ENGINE_HEDGE_PERCENTILE', '95'))
+ENGINE_HEDGE_MAX_RATE = float(os.environ.get('ENGINE_HEDGE_MAX_RATE', '0.1'))
+
+# Editor event ingestion (see api/editor_events.py)
+EDITOR_EVENTS_MAX_BATCH = int(os.environ.get('EDITOR_EVENTS_MAX_BATCH', '5000'))
+EDITOR_EVENTS_BUFFER_MAX = int(os.environ.get('EDITOR_EVENTS_BUFFER_MAX', '100000'))
+EDITOR_EVENTS_FLUSH_SIZE = int(os.environ.get('EDITOR_EVENTS_FLUSH_SIZE', '5000'))
+EDITOR_EVENTS_FLUSH_INTERVAL = float(os.environ.get('EDITOR_EVENTS_FLUSH_INTERVAL', '1.0'))
+
+# Submission partitioning and retention (see api/partitioning.py). Monthly
+# partitions older than SUBMISSION_RETENTION_MONTHS are exported to
+# SUBMISSION_ARCHIVE_DIR and dropped by `manage.py maintain_partitions`;
+# leave the retention unset to keep everything.
+SUBMISSION_PARTITIONS_AHEAD = int(os.environ.get('SUBMISSION_PARTITIONS_AHEAD', '3'))
+SUBMISSION_RETENTION_MONTHS = int(os.environ['SUBMISSION_RETENTION_MONTHS']) if os.environ.get('SUBMISSION_RETENTION_MONTHS') else None
+SUBMISSION_ARCHIVE_DIR = os.environ.get('SUBMISSION_ARCHIVE_DIR', os.path.join(BASE_DIR, 'archive', 'submissions'))
+
+# Per-process problem snapshot cache (see api/problem_cache.py)
+PROBLEM_CACHE_MAX_ENTRIES = int(os.environ.get('PROBLEM_CACHE_MAX_ENTRIES', '256'))
+
+# Seconds a JWT-authenticated user's id, username and flags are served from
+# the cache (see api/authentication.py).
+AUTH_USER_CACHE_TTL = int(os.environ.get('AUTH_USER_CACHE_TTL', '60'))
+
+# Per-problem fastest-solve leaderboards (see api/problem_leaderboard.py)
+PROBLEM_LEADERBOARD_SIZE = int(os.environ.get('PROBLEM_LEADERBOARD_SIZE', '100'))
+PROBLEM_LEADERBOARD_CACHE_TTL = int(os.environ.get('PROBLEM_LEADERBOARD_CACHE_TTL', '60'))
+
+# Idempotent submission creation (see api/idempotency.py)
+IDEMPOTENCY_WINDOW = int(os.environ.get('IDEMPOTENCY_WINDOW', str(24 * 60 * 60)))
+IDEMPOTENCY_WAIT_SECONDS = float(os.environ.get('IDEMPOTENCY_WAIT_SECONDS', '10'))
+IDEMPOTENCY_CLAIM_TIMEOUT = int(os.environ.get('IDEMPOTENCY_CLAIM_TIMEOUT', '120'))
+
+# Startup and readiness probes (see api/health.py)
+DB_WAIT_TIMEOUT = float(os.environ.get('DB_WAIT_TIMEOUT', '60'))
+ENGINE_PROBE_TIMEOUT = float(os.environ.get('ENGINE_PROBE_TIMEOUT', '1.0'))
 
+# Request profiling (see api/profiling.py). Staff can profile any request with
+# ?profile=1 or an `X-Profile: 1` header. PROFILE_SAMPLE_RATE > 0 also profiles
+# that fraction of all requests, keeping those slower than PROFILE_SLOW_MS.
+PROFILE_DIR = os.environ.get('PROFILE_DIR', os.path.join(BASE_DIR, 'profiles'))
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_SLOW_MS = float(os.environ.get('PROFILE_SLOW_MS', '1000'))
+PROFILE_MAX_ARTIFACTS = int(os.environ.get('PROFILE_MAX_ARTIFACTS', '200'))
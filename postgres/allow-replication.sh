@@ -0,0 +1,4 @@
+#!/bin/sh
+# Let the db-replica service in docker-compose.dev.yml stream from this server.
+# Runs once, when the data volume is first initialised.
+echo "host replication all all scram-sha-256" >> "$PGDATA/pg_hba.conf"